@@ -0,0 +1,146 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+def accepts_encoding(accept_encoding, coding):
+    """
+    Whether an Accept-Encoding header allows coding: listed with a
+    non-zero q-value, or not listed while '*' is. 'br;q=0' refuses it.
+    """
+    qvalues = {}
+    for item in accept_encoding.split(','):
+        name, *params = item.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qvalues[name] = quality
+    quality = qvalues.get(coding, qvalues.get('*', 0.0))
+    return quality > 0
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses under COMPRESSION_PATH_PREFIXES once they reach
+    COMPRESSION_MIN_SIZE bytes. Uses brotli when the client accepts it and
+    the brotli package is installed, gzip otherwise.
+    """
+    def process_response(self, request, response):
+        prefixes = getattr(settings, 'COMPRESSION_PATH_PREFIXES', ['/api/'])
+        if not request.path.startswith(tuple(prefixes)):
+            return response
+        # Ranged downloads must stay byte-addressable
+        if response.has_header('Content-Encoding') or response.has_header('Accept-Ranges'):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or response.streaming or not accepts_encoding(accept_encoding, 'br'):
+            # GZipMiddleware only looks for the word gzip, so 'gzip;q=0' would still get it
+            if not accepts_encoding(accept_encoding, 'gzip'):
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(
+            response.content,
+            quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+        )
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # Same ETag weakening as GZipMiddleware: the body is no longer byte-identical
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Shed API load before the database connection pool is exhausted.
+    Requests beyond API_MAX_CONCURRENT_REQUESTS in flight across all
+    workers get a 503, and a client with more than
+    API_MAX_CONCURRENT_REQUESTS_PER_CLIENT requests in flight gets a 429.
+    The counts live in the cache, so without a shared one (SHARED_CACHE)
+    each worker would only count its own requests and the middleware is
+    not used.
+    """
+    total_key = 'inflight_total'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHARED_CACHE', False):
+            raise MiddlewareNotUsed('API concurrency limits need a shared cache')
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(tuple(settings.API_PATH_PREFIXES)):
+            return self.get_response(request)
+
+        if not self.enter(self.total_key, settings.API_MAX_CONCURRENT_REQUESTS):
+            return self.reject('Server is busy, please retry shortly.', 503)
+        try:
+            key = self.client_key(request)
+            if not self.enter(key, settings.API_MAX_CONCURRENT_REQUESTS_PER_CLIENT):
+                return self.reject('Too many concurrent requests.', 429)
+            try:
+                return self.get_response(request)
+            finally:
+                self.leave(key)
+        finally:
+            self.leave(self.total_key)
+
+    def client_key(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user-{user.pk}'
+        elif request.META.get('HTTP_AUTHORIZATION'):
+            ident = hashlib.sha256(request.META['HTTP_AUTHORIZATION'].encode()).hexdigest()[:32]
+        else:
+            ident = request.META.get('REMOTE_ADDR', '')
+        return f'inflight_{ident}'
+
+    def enter(self, key, limit):
+        # The timeout only matters if a worker dies mid-request
+        cache.add(key, 0, timeout=60)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            return True
+        if count > limit:
+            self.leave(key)
+            return False
+        return True
+
+    def leave(self, key):
+        try:
+            if cache.decr(key) < 0:
+                # The key expired and was recreated while this request ran
+                cache.incr(key)
+        except ValueError:
+            pass
+
+    def reject(self, message, status):
+        response = JsonResponse({'detail': message}, status=status)
+        response['Retry-After'] = '1'
+        return response
@@ -58,11 +58,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add this for static files on Railway
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'HelpDesk.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'HelpDesk.middleware.ConcurrencyLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -124,6 +126,40 @@ else:
         }
 
 
+# Cache (used for throttling and other shared counters)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Whether all workers see the same cache. Cross-process limits (admission
+# control, throttle buckets) and cached authentication rely on it.
+SHARED_CACHE = bool(os.getenv('REDIS_URL'))
+
+
+# With a shared cache, sessions are read from the cache and written through
+# to the database, and request.user is resolved from the cache instead of
+# the users table. A per-process cache would keep serving logged-out
+# sessions and deactivated users from the other workers, so without one
+# both come from the database.
+if SHARED_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+USER_CACHE_TIMEOUT = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -168,6 +204,33 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Outside DEBUG, collectstatic writes content-hashed copies plus .gz/.br
+    # variants. Whitenoise serves the hashed names with far-future immutable
+    # cache headers.
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+    # Attachments are only served through the permission-checked download endpoint
+    'attachments': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': MEDIA_ROOT / 'attachments',
+            'base_url': None,
+        },
+    },
+}
+
+# Attachment uploads (bytes)
+ATTACHMENT_MAX_SIZE = int(os.getenv('ATTACHMENT_MAX_SIZE', str(25 * 1024 * 1024)))
+ATTACHMENT_CHUNK_SIZE = 5 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -176,6 +239,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.authentication.CachedTokenAuthentication' if SHARED_CACHE
+        else 'accounts.authentication.APITokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -184,12 +249,66 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson-backed when installed, stdlib json otherwise
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'tickets.renderers.FastJSONRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'tickets.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token buckets: '<burst>/<period>' refilled continuously over the period
+    'DEFAULT_THROTTLE_CLASSES': [
+        'tickets.throttling.UserTokenBucketThrottle',
+        'tickets.throttling.ScopedTokenBucketThrottle',
+        'tickets.throttling.SearchTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.getenv('THROTTLE_RATE_USER', '240/min'),
+        'search': os.getenv('THROTTLE_RATE_SEARCH', '30/min'),
+        'export': os.getenv('THROTTLE_RATE_EXPORT', '10/min'),
+    },
 }
 
+# Without a shared cache each worker has its own throttle buckets, holding
+# this share of the configured rates
+THROTTLE_PROCESSES = 1 if SHARED_CACHE else int(os.getenv('WEB_CONCURRENCY', '2'))
+
+# The browsable API is a development aid only
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('rest_framework.renderers.BrowsableAPIRenderer')
+
+# API response compression (brotli when installed, gzip otherwise)
+COMPRESSION_PATH_PREFIXES = ['/api/']
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_BROTLI_QUALITY = 5
+
+# API admission control: shed load before the DB connection pool runs dry.
+# Counted in the shared cache across workers; off without one.
+API_PATH_PREFIXES = ['/api/']
+API_MAX_CONCURRENT_REQUESTS = int(os.getenv('API_MAX_CONCURRENT_REQUESTS', '16'))
+API_MAX_CONCURRENT_REQUESTS_PER_CLIENT = int(os.getenv('API_MAX_CONCURRENT_REQUESTS_PER_CLIENT', '4'))
+
+# Ticket auto-assignment (off unless enabled, so existing installs keep manual assignment)
+TICKET_AUTO_ASSIGN = os.getenv('TICKET_AUTO_ASSIGN', 'False').lower() == 'true'
+TICKET_ASSIGNMENT_STRATEGY = os.getenv(
+    'TICKET_ASSIGNMENT_STRATEGY',
+    'tickets.assignment.LeastOpenTicketsStrategy'
+)
+
+# Saved queues: cached results expire after this many seconds even without
+# invalidation; queues with more tickets than the limit are not cached
+QUEUE_CACHE_TIMEOUT = 300
+QUEUE_MEMBERSHIP_LIMIT = 1000
+
+# Change feed page size limits
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 5000
+
+# Soft-deleted tickets and comments are purged after this many days
+SOFT_DELETE_RETENTION_DAYS = int(os.getenv('SOFT_DELETE_RETENTION_DAYS', '30'))
+
 # CORS settings
 if RAILWAY_ENVIRONMENT:
     # Production CORS settings for Railway
@@ -221,4 +340,3 @@ if RAILWAY_ENVIRONMENT:
     SECURE_SSL_REDIRECT = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
     CSRF_TRUSTED_ORIGINS = ['https://*.railway.app']
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -10,7 +10,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HelpDesk.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf, views and admin now instead of on the first request.
+# With gunicorn's preload_app this runs once in the master process and the
+# forked workers start warm.
+get_resolver().url_patterns
@@ -1,15 +1,78 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from django.core.cache import cache
+from .models import Organization, User, APIToken
+
+class TenantAdminMixin:
+    """
+    Limit a model admin to the staff member's organization; superusers see
+    all of them. tenant_field is the lookup path from the model to its
+    organization. Foreign key choices are narrowed to the organization too,
+    and new rows with an organization field are put into it.
+    """
+    tenant_field = 'organization'
+    
+    def has_own_organization_field(self):
+        return self.tenant_field == 'organization'
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.user.is_superuser:
+            return queryset
+        return queryset.filter(**{self.tenant_field: request.user.organization_id})
+    
+    def get_readonly_fields(self, request, obj=None):
+        fields = super().get_readonly_fields(request, obj)
+        if not request.user.is_superuser and self.has_own_organization_field():
+            fields = [*fields, 'organization']
+        return fields
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if not request.user.is_superuser:
+            related = db_field.related_model
+            organization_id = request.user.organization_id
+            if related is Organization:
+                kwargs['queryset'] = Organization.objects.filter(pk=organization_id)
+            elif any(field.name == 'organization' for field in related._meta.fields):
+                kwargs['queryset'] = related._default_manager.filter(organization_id=organization_id)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def save_model(self, request, obj, form, change):
+        if not change and not request.user.is_superuser and self.has_own_organization_field():
+            obj.organization_id = request.user.organization_id
+        super().save_model(request, obj, form, change)
+
+@admin.register(Organization)
+class OrganizationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'created_at']
+    search_fields = ['name', 'slug']
+    prepopulated_fields = {'slug': ['name']}
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
-    list_display = ['username', 'email', 'role', 'is_staff', 'is_active', 'date_joined']
+class CustomUserAdmin(TenantAdminMixin, UserAdmin):
+    list_display = ['username', 'email', 'organization', 'role', 'is_staff', 'is_active', 'date_joined']
     list_filter = ['role', 'is_staff', 'is_active', 'date_joined']
+    list_select_related = ['organization']
     search_fields = ['username', 'email']
     
     fieldsets = UserAdmin.fieldsets + (
-        ('Additional Info', {'fields': ('role', 'created_at', 'updated_at')}),
+        ('Additional Info', {'fields': ('organization', 'role', 'created_at', 'updated_at')}),
     )
     
     readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(APIToken)
+class APITokenAdmin(TenantAdminMixin, admin.ModelAdmin):
+    tenant_field = 'user__organization'
+    list_display = ['name', 'prefix', 'user', 'created_at', 'last_used_at']
+    list_select_related = ['user']
+    search_fields = ['name', 'prefix', 'user__username']
+    readonly_fields = ['prefix', 'created_at', 'last_used_at']
+    
+    def has_add_permission(self, request):
+        # Keys are only shown once, so tokens are created with the create_api_token command
+        return False
+    
+    def delete_queryset(self, request, queryset):
+        cache.delete_many([APIToken.cache_key(key_hash) for key_hash in queryset.values_list('key_hash', flat=True)])
+        super().delete_queryset(request, queryset)
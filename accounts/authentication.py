@@ -0,0 +1,56 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .backends import get_cached_user
+from .models import APIToken
+
+class APITokenAuthentication(TokenAuthentication):
+    """
+    Authenticate 'Authorization: Token <key>' (or 'Bearer <key>') headers
+    against APIToken
+    """
+    def authenticate(self, request):
+        auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(auth) == 2 and auth[0].lower() == 'bearer':
+            return self.authenticate_credentials(auth[1])
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        token = APIToken.objects.select_related('user').filter(key_hash=APIToken.hash_key(key)).first()
+        if token is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        # Recorded at most once per USER_CACHE_TIMEOUT, not on every request
+        now = timezone.now()
+        if token.last_used_at is None or now - token.last_used_at > timedelta(seconds=settings.USER_CACHE_TIMEOUT):
+            APIToken.objects.filter(pk=token.pk).update(last_used_at=now)
+        return (token.user, key)
+
+class CachedTokenAuthentication(APITokenAuthentication):
+    """
+    APITokenAuthentication that caches the token-to-user mapping, so a
+    polling integration costs a cache lookup rather than a database query.
+    Only enabled with a shared cache; see get_cached_user().
+    """
+    def authenticate_credentials(self, key):
+        key_hash = APIToken.hash_key(key)
+        cache_key = APIToken.cache_key(key_hash)
+
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            token = APIToken.objects.filter(key_hash=key_hash).only('pk', 'user_id').first()
+            if token is None:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            user_id = token.user_id
+            cache.set(cache_key, user_id, settings.USER_CACHE_TIMEOUT)
+            # Only touched on cache misses, so at most once per cache timeout
+            APIToken.objects.filter(pk=token.pk).update(last_used_at=timezone.now())
+
+        user = get_cached_user(user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (user, key)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from .models import User
+
+def get_cached_user(user_id):
+    """
+    Load a user through the cache. User.save(), User.delete() and user
+    queryset updates drop the cached copy, so changes (including password
+    changes and deactivation) take effect at once. That only holds when all
+    workers share the cache (SHARED_CACHE): with a per-process cache the
+    other workers keep their copy for up to USER_CACHE_TIMEOUT seconds.
+    """
+    key = User.cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User._default_manager.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that resolves the session user from the cache instead of
+    querying the users table on every request. Only enabled with a shared
+    cache; see get_cached_user().
+    """
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
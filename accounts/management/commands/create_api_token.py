@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User, APIToken
+
+class Command(BaseCommand):
+    help = 'Create an API token for a user and print its key (shown only once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='integration', help='What the token is used for')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist")
+
+        token, key = APIToken.create_token(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Created token {token} for {user.username}'))
+        self.stdout.write(key)
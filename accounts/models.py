@@ -1,5 +1,45 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.core.cache import cache
 from django.db import models
+from django.conf import settings
+from .signals import organizations_changed
+import hashlib
+import secrets
+
+class Organization(models.Model):
+    """
+    Tenant: a business unit with its own users, tickets and SLAs. Users
+    and rows without an organization form one more, unnamed tenant, which
+    is where single-tenant installs keep working.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=50, unique=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        ordering = ['name']
+
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Bulk updates bypass User.save(), so drop the cached copies here
+        pks = list(self.values_list('pk', flat=True))
+        moving = 'organization' in kwargs or 'organization_id' in kwargs
+        if moving:
+            previous = set(self.values_list('organization_id', flat=True))
+        result = super().update(**kwargs)
+        cache.delete_many([User.cache_key(pk) for pk in pks])
+        if moving and pks:
+            current = set(User.objects.filter(pk__in=pks).values_list('organization_id', flat=True))
+            organizations_changed.send(sender=User, user_ids=pks, organization_ids=previous | current)
+        return result
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
 
 class User(AbstractUser):
     """
@@ -19,12 +59,51 @@ class User(AbstractUser):
         help_text='User role determines access permissions'
     )
     
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='members'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserManager()
+    
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Compared on save, to tell when the user moves between organizations
+        if 'organization_id' in instance.__dict__:
+            instance._stored_organization_id = instance.organization_id
+        return instance
+    
+    def save(self, *args, **kwargs):
+        previous = getattr(self, '_stored_organization_id', self.organization_id)
+        super().save(*args, **kwargs)
+        cache.delete(self.cache_key(self.pk))
+        if previous != self.organization_id:
+            organizations_changed.send(
+                sender=User, user_ids=[self.pk], organization_ids={previous, self.organization_id}
+            )
+        self._stored_organization_id = self.organization_id
+    
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        cache.delete(self.cache_key(pk))
+        return result
+    
+    @staticmethod
+    def cache_key(pk):
+        """Cache key for the user object used by CachedModelBackend"""
+        return f'user:{pk}'
+    
     @property
     def is_agent(self):
         return self.role in ['agent', 'admin']
@@ -35,3 +114,43 @@ class User(AbstractUser):
     
     class Meta:
         db_table = 'auth_user'
+
+
+class APIToken(models.Model):
+    """
+    API token for integrations. Only a SHA-256 hash of the key is stored;
+    the key itself is shown once when the token is created.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, help_text='What this token is used for')
+    prefix = models.CharField(max_length=8, editable=False, help_text='First characters of the key, for identification')
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.prefix}...)"
+    
+    @classmethod
+    def create_token(cls, user, name):
+        """Create a token and return (token, key)"""
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(user=user, name=name, prefix=key[:8], key_hash=cls.hash_key(key))
+        return token, key
+    
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    @staticmethod
+    def cache_key(key_hash):
+        return f'apitoken:{key_hash}'
+    
+    def delete(self, *args, **kwargs):
+        cache.delete(self.cache_key(self.key_hash))
+        return super().delete(*args, **kwargs)
+    
+    class Meta:
+        verbose_name = "API Token"
+        verbose_name_plural = "API Tokens"
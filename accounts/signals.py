@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent with user_ids and organization_ids (where they were and where they
+# are now) when users move between organizations, by User.save() and by
+# bulk updates of User.organization
+organizations_changed = Signal()
@@ -1,3 +1,108 @@
-from django.test import TestCase
+from unittest import skipIf
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import CachedTokenAuthentication
+from .models import APIToken, User
 
-# Create your tests here.
+
+class AuthenticationTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('agent', password='pass', role='agent')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertLoggedIn(self, logged_in=True):
+        response = self.client.get(reverse('ticket_list'))
+        self.assertEqual(response.status_code, 200 if logged_in else 302)
+
+
+@override_settings(
+    SHARED_CACHE=True,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTHENTICATION_BACKENDS=['accounts.backends.CachedModelBackend'],
+)
+class CachedAuthenticationTests(AuthenticationTestMixin, TestCase):
+    """Cached users and tokens are dropped as soon as the user changes"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='agent', password='pass')
+        self.assertLoggedIn()
+
+    def test_user_is_cached(self):
+        self.assertIsNotNone(cache.get(User.cache_key(self.user.pk)))
+
+    def test_deactivation(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertLoggedIn(False)
+
+    def test_queryset_update(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(cache.get(User.cache_key(self.user.pk)))
+        self.assertLoggedIn(False)
+
+    def test_password_change(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('changed')
+        user.save()
+        self.assertLoggedIn(False)
+
+    def test_token(self):
+        token, key = APIToken.create_token(self.user, 'sync')
+        authentication = CachedTokenAuthentication()
+        self.assertEqual(authentication.authenticate_credentials(key)[0], self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(key)
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(key)
+
+
+@skipIf(settings.SHARED_CACHE, 'Uses the per-process cache fallback')
+class DatabaseAuthenticationTests(AuthenticationTestMixin, TestCase):
+    """Without a shared cache, every worker reads users and tokens from the database"""
+
+    def test_no_cached_backends(self):
+        self.assertEqual(settings.AUTHENTICATION_BACKENDS, ['django.contrib.auth.backends.ModelBackend'])
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+
+    def test_stale_cached_copy_is_ignored(self):
+        # What another worker's cache could still hold
+        cache.set(User.cache_key(self.user.pk), self.user)
+        self.client.login(username='agent', password='pass')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.set(User.cache_key(self.user.pk), self.user)
+        self.assertLoggedIn(False)
+
+    def test_password_change(self):
+        self.client.login(username='agent', password='pass')
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertLoggedIn(False)
+
+    def test_token(self):
+        token, key = APIToken.create_token(self.user, 'sync')
+        response = self.client.get(reverse('ticket-list'), HTTP_AUTHORIZATION=f'Bearer {key}')
+        self.assertEqual(response.status_code, 200)
+        token.refresh_from_db()
+        last_used_at = token.last_used_at
+        self.assertIsNotNone(last_used_at)
+        # Not rewritten on every request
+        self.client.get(reverse('ticket-list'), HTTP_AUTHORIZATION=f'Token {key}')
+        token.refresh_from_db()
+        self.assertEqual(token.last_used_at, last_used_at)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(reverse('ticket-list'), HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(reverse('ticket-list'), HTTP_AUTHORIZATION='Token wrong')
+        self.assertEqual(response.status_code, 401)
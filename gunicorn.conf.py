@@ -0,0 +1,19 @@
+"""
+Gunicorn settings, read automatically from the project root.
+
+Set GUNICORN_PRELOAD=False to have each worker import the app itself
+(e.g. to pick up code changes with a graceful HUP reload).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+
+# Load Django in the master so workers fork from a warmed process
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+def post_fork(server, worker):
+    # Connections opened while preloading must not be shared between workers
+    from django.db import connections
+    connections.close_all()
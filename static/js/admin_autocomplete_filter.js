@@ -0,0 +1,14 @@
+// Apply an autocomplete list filter as soon as a value is picked or cleared
+(function ($) {
+  $(document).on('change', 'select.autocomplete-filter', function () {
+    const params = new URLSearchParams(window.location.search);
+    const lookup = this.dataset.lookup;
+    if (this.value) {
+      params.set(lookup, this.value);
+    } else {
+      params.delete(lookup);
+    }
+    params.delete('p');
+    window.location.search = params.toString();
+  });
+})(django.jQuery);
@@ -0,0 +1,91 @@
+// Ticket list: swap only the results fragment on filter changes and page
+// flips, and poll for changed rows instead of reloading the page.
+(function () {
+  const REFRESH_INTERVAL = 30000;
+  const results = document.getElementById('ticket-results');
+  const form = document.getElementById('ticket-filters');
+  if (!results) {
+    return;
+  }
+
+  function fetchFragment(url) {
+    return fetch(url, {headers: {'HX-Request': 'true'}, credentials: 'same-origin'}).then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      const refreshedAt = response.headers.get('X-Refreshed-At');
+      if (refreshedAt) {
+        results.dataset.refreshedAt = refreshedAt;
+      }
+      return response.text().then(function (html) {
+        return {html: html, truncated: response.headers.get('X-Rows-Truncated') === 'true'};
+      });
+    });
+  }
+
+  function loadResults(search, push) {
+    return fetchFragment(window.location.pathname + search).then(function (fragment) {
+      results.innerHTML = fragment.html;
+      if (push) {
+        window.history.pushState(null, '', window.location.pathname + search);
+      }
+    });
+  }
+
+  function refreshRows() {
+    if (document.hidden) {
+      return;
+    }
+    const params = new URLSearchParams(window.location.search);
+    params.delete('page');
+    params.set('changed_since', results.dataset.refreshedAt);
+    // Rows on the page are checked even if unchanged, so tickets that left
+    // the user's scope (reassigned, deleted, merged) are dropped too
+    results.querySelectorAll('li.ticket-row').forEach(function (row) {
+      params.append('shown', row.id.replace('ticket-', ''));
+    });
+    fetchFragment(results.dataset.rowsUrl + '?' + params.toString()).then(function (fragment) {
+      const template = document.createElement('template');
+      template.innerHTML = fragment.html;
+      let reload = fragment.truncated;
+      template.content.querySelectorAll('li.ticket-row').forEach(function (row) {
+        const current = document.getElementById(row.id);
+        if (row.hasAttribute('data-removed')) {
+          if (current) {
+            current.remove();
+          }
+        } else if (current) {
+          current.replaceWith(row);
+        } else {
+          // A ticket that isn't on this page now matches: ordering changed
+          reload = true;
+        }
+      });
+      if (reload) {
+        return loadResults(window.location.search, false);
+      }
+    }).catch(function () {});
+  }
+
+  if (form) {
+    form.addEventListener('submit', function (event) {
+      event.preventDefault();
+      const params = new URLSearchParams(new FormData(form));
+      loadResults('?' + params.toString(), true);
+    });
+  }
+
+  results.addEventListener('click', function (event) {
+    const link = event.target.closest('a[href^="?"]');
+    if (link) {
+      event.preventDefault();
+      loadResults(link.getAttribute('href'), true);
+    }
+  });
+
+  window.addEventListener('popstate', function () {
+    loadResults(window.location.search, false);
+  });
+
+  window.setInterval(refreshRows, REFRESH_INTERVAL);
+})();
@@ -1,9 +1,15 @@
 /** @type {import('tailwindcss').Config} */
 module.exports = {
+  // Only classes found here end up in the built CSS
   content: [
     './templates/**/*.html',
     './*/templates/**/*.html',
-    './static/**/*.js',
+    './tickets/templatetags/**/*.py',
+    './static/js/**/*.js',
+  ],
+  // Built at render time by the priority_class filter
+  safelist: [
+    { pattern: /^priority-(low|medium|high|critical)$/ },
   ],
   theme: {
     extend: {
@@ -13,8 +19,15 @@ module.exports = {
         'help-yellow': '#F59E0B',
         'help-red': '#EF4444',
         'help-gray': '#6B7280',
+      },
+      backdropBlur: {
+        'xs': '2px',
+        'sm': '4px',
+        'md': '8px',
+        'lg': '16px',
+        'xl': '24px',
       }
     },
   },
   plugins: [],
-}
\ No newline at end of file
+}
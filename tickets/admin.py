@@ -1,47 +1,320 @@
+import json
+from django import forms
 from django.contrib import admin
-from .models import Ticket, Comment, Timeline, SLAConfiguration
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from accounts.admin import TenantAdminMixin
+from .models import (
+    Ticket, Comment, Timeline, SLAConfiguration, AgentWorkload,
+    DailyTicketStats, DailyAgentStats, SavedQueue, Attachment,
+    BusinessCalendar, BusinessHours, Holiday, TicketTransition
+)
+from .sla import recalculate_due_dates, tickets_using
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL, use the planner's row estimate instead of COUNT(*) once
+    the estimate is above exact_count_limit. Counting millions of rows is
+    what made the big changelists slow, and the page links only need a
+    rough total.
+    """
+    exact_count_limit = 10000
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and connections[queryset.db].vendor == 'postgresql':
+            estimate = self._estimate(queryset)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return super().count
+    
+    def _estimate(self, queryset):
+        with connections[queryset.db].cursor() as cursor:
+            if not queryset.query.where:
+                # Unfiltered: table statistics, kept current by autovacuum
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] >= 0 else None
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Foreign key list filter that picks the value with the admin's
+    autocomplete widget instead of rendering every related object
+    """
+    template = 'admin/autocomplete_filter.html'
+    
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        value = self.used_parameters.get(self.lookup_kwarg)
+        self.lookup_val = value[-1] if isinstance(value, list) else value
+        self.widget_attrs = AutocompleteSelect(field, model_admin.admin_site).build_attrs(
+            {}, {'class': 'autocomplete-filter', 'data-lookup': self.lookup_kwarg}
+        )
+    
+    @cached_property
+    def selected(self):
+        if not self.lookup_val:
+            return None
+        return self.field.remote_field.model._default_manager.filter(pk=self.lookup_val).first()
+    
+    def has_output(self):
+        return True
+    
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+    
+    def choices(self, changelist):
+        yield {
+            'selected': not self.lookup_val,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+        }
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows:
+    - estimated counts, with no second unfiltered count;
+    - autocomplete instead of full dropdowns;
+    - search limited to lookups an index can answer.
+    Substring search (LIKE '%term%') would scan the whole table.
+    
+    search_exact_fields are matched against the whole search term when it
+    is a valid value for them (ids, usernames). search_prefix_fields match
+    the start of the field, case-sensitively.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_exact_fields = []
+    search_prefix_fields = []
+    
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        # Shows the search box and enables autocomplete against this admin
+        self.search_fields = self.search_exact_fields + [f'{field}__startswith' for field in self.search_prefix_fields]
+    
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for path in self.search_exact_fields:
+            field = get_fields_from_path(self.model, path)[-1]
+            try:
+                condition |= Q(**{path: field.to_python(term)})
+            except ValidationError:
+                continue
+        for path in self.search_prefix_fields:
+            condition |= Q(**{f'{path}__startswith': term})
+        if not condition:
+            return queryset.none(), False
+        return queryset.filter(condition), False
+    
+    @property
+    def media(self):
+        media = super().media
+        for spec in self.list_filter:
+            if isinstance(spec, tuple) and issubclass(spec[1], AutocompleteFilter):
+                widget = AutocompleteSelect(self.model._meta.get_field(spec[0]), self.admin_site)
+                return media + widget.media + forms.Media(js=['js/admin_autocomplete_filter.js'])
+        return media
+
+class SoftDeleteAdmin(ScalableAdmin):
+    """
+    Deleting from the admin soft-deletes. Deleted rows stay listed (filter
+    on "deleted at") and can be restored until purge_deleted_tickets runs.
+    """
+    actions = ['restore_selected']
+    
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+    
+    def get_deleted_objects(self, objs, request):
+        # Nothing cascades on a soft delete, so skip collecting related rows
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, set(), []
+    
+    def delete_model(self, request, obj):
+        obj.soft_delete()
+    
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.filter(deleted_at__isnull=True):
+            obj.soft_delete()
+    
+    @admin.action(description='Restore selected deleted items')
+    def restore_selected(self, request, queryset):
+        for obj in queryset.filter(deleted_at__isnull=False):
+            obj.restore()
 
 @admin.register(Ticket)
-class TicketAdmin(admin.ModelAdmin):
-    list_display = ['title', 'status', 'priority', 'created_by', 'assigned_to', 'is_sla_breached', 'created_at']
-    list_filter = ['status', 'priority', 'is_sla_breached', 'created_at']
-    search_fields = ['title', 'description', 'created_by__username']
-    readonly_fields = ['version', 'created_at', 'updated_at', 'is_sla_breached']
+class TicketAdmin(TenantAdminMixin, SoftDeleteAdmin):
+    list_display = ['title', 'status', 'priority', 'created_by', 'assigned_to', 'is_sla_breached', 'created_at', 'deleted_at']
+    list_select_related = ['created_by', 'assigned_to']
+    list_filter = [
+        'status', 'priority', 'is_sla_breached', 'created_at', 'deleted_at',
+        ('assigned_to', AutocompleteFilter), ('created_by', AutocompleteFilter),
+    ]
+    search_exact_fields = ['id', 'created_by__username']
+    search_prefix_fields = ['title']
+    search_help_text = 'Ticket id, creator username, or the start of the title (case-sensitive)'
+    autocomplete_fields = ['created_by', 'assigned_to']
+    readonly_fields = ['version', 'created_at', 'updated_at', 'is_sla_breached', 'merged_into', 'deleted_at']
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('title', 'description', 'status', 'priority')
         }),
         ('Assignment', {
-            'fields': ('created_by', 'assigned_to')
+            'fields': ('organization', 'created_by', 'assigned_to')
         }),
         ('SLA Tracking', {
             'fields': ('sla_due_date', 'is_sla_breached')
         }),
         ('System Fields', {
-            'fields': ('version', 'created_at', 'updated_at'),
+            'fields': ('version', 'created_at', 'updated_at', 'merged_into', 'deleted_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        obj.changed_by = request.user
+        super().save_model(request, obj, form, change)
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ['ticket', 'author', 'content_preview', 'parent', 'created_at']
-    list_filter = ['created_at', 'author']
-    search_fields = ['content', 'ticket__title', 'author__username']
+class CommentAdmin(TenantAdminMixin, SoftDeleteAdmin):
+    tenant_field = 'ticket__organization'
+    list_display = ['ticket', 'author', 'content_preview', 'in_reply_to', 'created_at', 'deleted_at']
+    list_select_related = ['ticket', 'author']
+    list_filter = ['created_at', ('author', AutocompleteFilter), 'deleted_at']
+    search_exact_fields = ['id', 'ticket', 'author__username']
+    search_help_text = 'Comment id, ticket id or author username'
+    autocomplete_fields = ['ticket', 'author', 'parent']
+    ordering = ['-created_at', '-id']
     
     def content_preview(self, obj):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
+    
+    @admin.display(description='In reply to')
+    def in_reply_to(self, obj):
+        # The parent's own __str__ would cost two queries per row
+        return str(obj.parent_id)[:8] if obj.parent_id else ''
 
 @admin.register(Timeline)
-class TimelineAdmin(admin.ModelAdmin):
+class TimelineAdmin(TenantAdminMixin, ScalableAdmin):
+    tenant_field = 'ticket__organization'
     list_display = ['ticket', 'user', 'action', 'description', 'created_at']
-    list_filter = ['action', 'created_at']
+    list_select_related = ['ticket', 'user']
+    list_filter = ['action', 'created_at', ('user', AutocompleteFilter)]
     readonly_fields = ['created_at']
-    search_fields = ['ticket__title', 'user__username', 'description']
+    search_exact_fields = ['ticket', 'user__username']
+    search_help_text = 'Ticket id or username'
+    autocomplete_fields = ['ticket', 'user']
+    ordering = ['-created_at', '-id']
+
+@admin.register(TicketTransition)
+class TicketTransitionAdmin(TenantAdminMixin, ScalableAdmin):
+    list_display = ['ticket', 'field', 'from_value', 'to_value', 'from_user', 'to_user', 'changed_by', 'changed_at', 'duration']
+    list_select_related = ['ticket', 'from_user', 'to_user', 'changed_by']
+    list_filter = [
+        'field', 'changed_at', ('from_user', AutocompleteFilter), ('to_user', AutocompleteFilter),
+    ]
+    search_exact_fields = ['ticket']
+    search_help_text = 'Ticket id'
+    ordering = ['-changed_at', '-id']
+    
+    # Recorded by Ticket.save() and backfill_transitions only
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class RecalculateSLAMixin:
+    """Admin action that reapplies the SLA to the open tickets of some SLA configurations"""
+    def recalculate(self, request, configs):
+        checked, changed = recalculate_due_dates(tickets_using(configs))
+        self.message_user(request, f'Checked {checked} open ticket(s), updated the SLA of {changed}.')
+
+class BusinessHoursInline(admin.TabularInline):
+    model = BusinessHours
+    extra = 0
+
+class HolidayInline(admin.TabularInline):
+    model = Holiday
+    extra = 0
+
+@admin.register(BusinessCalendar)
+class BusinessCalendarAdmin(TenantAdminMixin, RecalculateSLAMixin, admin.ModelAdmin):
+    list_display = ['name', 'organization', 'timezone', 'updated_at']
+    list_select_related = ['organization']
+    inlines = [BusinessHoursInline, HolidayInline]
+    actions = ['recalculate_open_tickets']
+    
+    @admin.action(description='Recalculate SLA due dates of open tickets')
+    def recalculate_open_tickets(self, request, queryset):
+        self.recalculate(request, SLAConfiguration.objects.filter(calendar__in=queryset))
 
 @admin.register(SLAConfiguration)
-class SLAConfigurationAdmin(admin.ModelAdmin):
-    list_display = ['priority', 'response_hours', 'resolution_hours', 'updated_at']
-    list_editable = ['response_hours', 'resolution_hours']
+class SLAConfigurationAdmin(TenantAdminMixin, RecalculateSLAMixin, admin.ModelAdmin):
+    list_display = ['priority', 'organization', 'response_hours', 'resolution_hours', 'calendar', 'updated_at']
+    list_select_related = ['organization']
+    list_editable = ['response_hours', 'resolution_hours', 'calendar']
+    actions = ['recalculate_open_tickets']
+    
+    @admin.action(description='Recalculate SLA due dates of open tickets')
+    def recalculate_open_tickets(self, request, queryset):
+        self.recalculate(request, queryset)
+
+
+@admin.register(AgentWorkload)
+class AgentWorkloadAdmin(TenantAdminMixin, admin.ModelAdmin):
+    tenant_field = 'agent__organization'
+    list_display = ['agent', 'open_tickets', 'last_assigned_at']
+    readonly_fields = ['open_tickets', 'last_assigned_at']
+
+@admin.register(DailyTicketStats)
+class DailyTicketStatsAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ['date', 'organization', 'priority', 'created_count', 'resolved_count', 'breached_count']
+    list_select_related = ['organization']
+    list_filter = ['priority']
+    date_hierarchy = 'date'
+
+@admin.register(DailyAgentStats)
+class DailyAgentStatsAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ['date', 'agent', 'resolved_count']
+    list_select_related = ['agent']
+    date_hierarchy = 'date'
+
+@admin.register(SavedQueue)
+class SavedQueueAdmin(TenantAdminMixin, admin.ModelAdmin):
+    tenant_field = 'owner__organization'
+    list_display = ['name', 'owner', 'shared', 'updated_at']
+    list_filter = ['shared']
+    list_select_related = ['owner']
+    search_fields = ['name']
+
+@admin.register(Attachment)
+class AttachmentAdmin(TenantAdminMixin, admin.ModelAdmin):
+    tenant_field = 'ticket__organization'
+    list_display = ['filename', 'ticket', 'uploaded_by', 'content_type', 'created_at']
+    list_select_related = ['ticket', 'uploaded_by']
+    readonly_fields = ['blob', 'created_at']
+    search_fields = ['filename']
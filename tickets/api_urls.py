@@ -4,8 +4,16 @@ from . import api_views
 
 router = DefaultRouter()
 router.register(r'tickets', api_views.TicketViewSet)
+router.register(r'queues', api_views.SavedQueueViewSet, basename='queue')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('tickets/<uuid:ticket_id>/comments/', api_views.CommentListCreateView.as_view(), name='ticket-comments'),
+    path('tickets/<uuid:ticket_id>/attachments/', api_views.TicketAttachmentListView.as_view(), name='ticket-attachments'),
+    path('tickets/<uuid:ticket_id>/uploads/', api_views.UploadSessionCreateView.as_view(), name='ticket-uploads'),
+    path('uploads/<uuid:pk>/', api_views.UploadSessionView.as_view(), name='upload-session'),
+    path('attachments/<uuid:pk>/download/', api_views.AttachmentDownloadView.as_view(), name='attachment-download'),
+    path('changes/', api_views.ChangeFeedView.as_view(), name='change-feed'),
+    path('changes/export/', api_views.ChangeExportView.as_view(), name='change-export'),
+    path('reports/<str:report>/', api_views.ReportView.as_view(), name='ticket-reports'),
 ]
\ No newline at end of file
@@ -2,10 +2,29 @@ from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .models import Ticket, Comment, Timeline
-from .serializers import TicketSerializer, CommentSerializer, TimelineSerializer
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from .models import Ticket, Comment, Timeline, SavedQueue, Attachment, UploadSession
+from .serializers import (
+    TicketSerializer, CommentSerializer, TimelineSerializer, SavedQueueSerializer,
+    AttachmentSerializer, UploadSessionSerializer
+)
+from .similarity import find_similar, merge_tickets
+from .changefeed import changes_after, format_cursor, ndjson_lines, parse_cursor, serialize_change
+from .attachments import UploadError, download_response, discard_upload, parse_content_range, store_chunk
+from .assignment import create_ticket
+from .permissions import IsAgent
+from .renderers import CSVRenderer, NDJSONRenderer
+from .reports import REPORTS
+from .querysets import filter_tickets, shape_ticket_queryset
+from .queues import get_membership, queue_queryset
 
 class TicketViewSet(viewsets.ModelViewSet):
     """
@@ -16,43 +35,48 @@ class TicketViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Search functionality
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(comments__content__icontains=search)
-            ).distinct()
-        
-        # Filter by status
-        status_filter = self.request.query_params.get('status')
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        # Filter by priority
-        priority = self.request.query_params.get('priority')
-        if priority:
-            queryset = queryset.filter(priority=priority)
-        
-        # Filter by assigned user
-        assigned_to = self.request.query_params.get('assigned_to')
-        if assigned_to:
-            queryset = queryset.filter(assigned_to_id=assigned_to)
+        queryset = super().get_queryset().visible_to(self.request.user)
+        
+        queryset = filter_tickets(queryset, self.request.query_params, self.request.user)
+        # Merged duplicates live on as their canonical ticket, as in the web list,
+        # unless ?merged=true asks for them
+        if self.action == 'list' and self.request.query_params.get('merged') not in ('1', 'true'):
+            queryset = queryset.filter(merged_into=None)
+        
+        if self.action in ('list', 'retrieve'):
+            queryset = shape_ticket_queryset(queryset, self.get_requested_fields())
         
         return queryset.order_by('-created_at')
     
-    def perform_create(self, serializer):
-        ticket = serializer.save(created_by=self.request.user)
+    def get_requested_fields(self):
+        """
+        Fields to serialize for reads: ?fields= replaces the default set,
+        ?expand= adds to it. Lists default to the lean LIST_FIELDS.
+        """
+        available = TicketSerializer.Meta.fields
+        fields = self.request.query_params.get('fields')
+        expand = self.request.query_params.get('expand')
         
-        # Create timeline entry
-        Timeline.objects.create(
-            ticket=ticket,
-            user=self.request.user,
-            action='created',
-            description=f'Ticket created with priority {ticket.get_priority_display()}'
+        if fields:
+            selected = {name.strip() for name in fields.split(',')}
+        elif self.action == 'list':
+            selected = set(TicketSerializer.LIST_FIELDS)
+        else:
+            selected = set(available)
+        if expand:
+            selected |= {name.strip() for name in expand.split(',')}
+        
+        return [name for name in available if name in selected]
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs['fields'] = self.get_requested_fields()
+        return super().get_serializer(*args, **kwargs)
+    
+    def perform_create(self, serializer):
+        # Saved once, with the auto-assigned agent already set
+        serializer.instance = create_ticket(
+            Ticket(**serializer.validated_data, created_by=self.request.user), self.request.user
         )
     
     def perform_update(self, serializer):
@@ -73,6 +97,7 @@ class TicketViewSet(viewsets.ModelViewSet):
         original_assigned_to = instance.assigned_to
         
         # Update the ticket and increment version
+        serializer.instance.changed_by = self.request.user
         ticket = serializer.save(version=instance.version + 1)
         
         # Create timeline entries for changes
@@ -105,7 +130,12 @@ class TicketViewSet(viewsets.ModelViewSet):
                 user=self.request.user,
                 action='assigned',
                 description=f'Assigned to {new_user}',
-                metadata={'from': old_user, 'to': new_user}
+                metadata={
+                    'from': old_user,
+                    'to': new_user,
+                    'from_id': original_assigned_to.pk if original_assigned_to else None,
+                    'to_id': ticket.assigned_to_id,
+                }
             )
         
         if changes:
@@ -116,6 +146,57 @@ class TicketViewSet(viewsets.ModelViewSet):
                 description='; '.join(changes)
             )
     
+    def perform_destroy(self, instance):
+        # Soft delete; the rows are removed later by purge_deleted_tickets
+        instance.soft_delete()
+    
+    def similar_response(self, matches):
+        fields = TicketSerializer.LIST_FIELDS
+        data = []
+        for ticket, score in matches:
+            item = TicketSerializer(ticket, fields=fields, context=self.get_serializer_context()).data
+            item['similarity'] = score
+            data.append(item)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Tickets that look like duplicates of this one"""
+        ticket = self.get_object()
+        matches = find_similar(
+            ticket.title, ticket.description,
+            queryset=Ticket.objects.visible_to(request.user).filter(merged_into=None),
+            exclude=ticket
+        )
+        return self.similar_response(matches)
+    
+    @action(detail=False, methods=['post'], url_path='similar')
+    def similar_to_draft(self, request):
+        """Similar existing tickets for a title/description before it is submitted"""
+        matches = find_similar(
+            request.data.get('title', ''), request.data.get('description', ''),
+            queryset=Ticket.objects.visible_to(request.user).filter(merged_into=None)
+        )
+        return self.similar_response(matches)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsAgent])
+    def merge(self, request, pk=None):
+        """Merge this ticket into the ticket given as 'into'"""
+        duplicate = self.get_object()
+        into = request.data.get('into')
+        if not into:
+            raise ValidationError({'into': 'This field is required.'})
+        canonical = get_object_or_404(Ticket.objects.visible_to(request.user), pk=into)
+        if canonical.organization_id != duplicate.organization_id:
+            raise ValidationError({'into': 'Tickets of different organizations cannot be merged.'})
+        if canonical.pk == duplicate.pk or canonical.merged_into_id:
+            raise ValidationError({'into': 'Choose a different ticket that has not been merged itself.'})
+        if duplicate.merged_into_id:
+            raise ValidationError({'detail': 'This ticket has already been merged.'})
+        
+        merge_tickets(duplicate, canonical, request.user)
+        return Response(TicketSerializer(canonical, context=self.get_serializer_context()).data)
+    
     @action(detail=True, methods=['get'])
     def timeline(self, request, pk=None):
         """Get ticket timeline"""
@@ -124,6 +205,48 @@ class TicketViewSet(viewsets.ModelViewSet):
         serializer = TimelineSerializer(timeline, many=True)
         return Response(serializer.data)
 
+class SavedQueueViewSet(viewsets.ModelViewSet):
+    """
+    Saved ticket queues: the user's own plus shared ones, with cached counts
+    """
+    serializer_class = SavedQueueSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return SavedQueue.objects.for_user(self.request.user).select_related('owner')
+    
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+    
+    def perform_update(self, serializer):
+        self.check_owner(serializer.instance)
+        serializer.save()
+    
+    def perform_destroy(self, instance):
+        self.check_owner(instance)
+        instance.delete()
+    
+    def check_owner(self, queue):
+        if queue.owner_id != self.request.user.pk and not self.request.user.is_admin:
+            raise PermissionDenied('Only the owner can change this queue.')
+    
+    @action(detail=True, methods=['get'])
+    def tickets(self, request, pk=None):
+        """Tickets in the queue, paged from the cached membership"""
+        queue = self.get_object()
+        fields = TicketSerializer.LIST_FIELDS
+        membership = get_membership(queue, request.user)
+        
+        if membership['ids'] is None:
+            page = self.paginate_queryset(shape_ticket_queryset(queue_queryset(queue, request.user), fields))
+        else:
+            page_ids = self.paginate_queryset(membership['ids'])
+            tickets = shape_ticket_queryset(Ticket.objects.filter(pk__in=page_ids), fields).in_bulk()
+            page = [tickets[ticket_id] for ticket_id in page_ids if ticket_id in tickets]
+        
+        serializer = TicketSerializer(page, many=True, fields=fields, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
 class CommentListCreateView(generics.ListCreateAPIView):
     """
     API view for listing and creating comments on a ticket
@@ -133,11 +256,15 @@ class CommentListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         ticket_id = self.kwargs['ticket_id']
-        return Comment.objects.filter(ticket_id=ticket_id, parent=None).order_by('created_at')
+        return Comment.objects.filter(
+            ticket_id=ticket_id,
+            ticket__in=Ticket.objects.visible_to(self.request.user),
+            parent=None
+        ).order_by('created_at')
     
     def perform_create(self, serializer):
         ticket_id = self.kwargs['ticket_id']
-        ticket = get_object_or_404(Ticket, id=ticket_id)
+        ticket = get_object_or_404(Ticket.objects.visible_to(self.request.user), id=ticket_id)
         
         comment = serializer.save(
             ticket=ticket,
@@ -150,4 +277,177 @@ class CommentListCreateView(generics.ListCreateAPIView):
             user=self.request.user,
             action='commented',
             description=f'Added comment: {comment.content[:50]}...' if len(comment.content) > 50 else f'Added comment: {comment.content}'
-        )
\ No newline at end of file
+        )
+
+class ReportView(APIView):
+    """
+    Time-bucketed ticket metrics read from the daily rollup tables.
+    Add ?format=csv for a CSV download.
+    """
+    permission_classes = [IsAuthenticated, IsAgent]
+    throttle_scope = 'export'
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer]
+    
+    def get(self, request, report):
+        builder = REPORTS.get(report)
+        if builder is None:
+            raise NotFound(f'Unknown report. Choose one of: {", ".join(REPORTS)}')
+        
+        end = self._parse_date('end') or timezone.localdate()
+        start = self._parse_date('start') or end - timedelta(days=29)
+        if start > end:
+            raise ValidationError({'start': 'start must not be after end'})
+        
+        response = Response(builder(request.user, start, end))
+        if request.accepted_renderer.format == 'csv':
+            response['Content-Disposition'] = f'attachment; filename="{report}-{start}-{end}.csv"'
+        return response
+    
+    def _parse_date(self, param):
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValidationError({param: 'Use YYYY-MM-DD format'})
+        return parsed
+
+class ChangeFeedMixin:
+    permission_classes = [IsAuthenticated, IsAgent]
+    
+    def get_cursor(self):
+        value = self.request.query_params.get('after', '0')
+        try:
+            return parse_cursor(value)
+        except ValueError:
+            raise ValidationError({'after': 'Pass a next_cursor or X-Next-Cursor value from the feed'})
+
+class ChangeFeedView(ChangeFeedMixin, APIView):
+    """
+    Ticket and timeline changes after ?after=<cursor>, oldest first.
+    Pass next_cursor back as ?after= to resume; poll again while has_more.
+    """
+    def get(self, request):
+        cursor = self.get_cursor()
+        try:
+            limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': 'Limit must be an integer'})
+        limit = max(1, min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE))
+        
+        changes = list(changes_after(cursor, request.user)[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return Response({
+            'results': [serialize_change(change) for change in changes],
+            'next_cursor': format_cursor(changes[-1].txid, changes[-1].id) if changes else format_cursor(*cursor),
+            'has_more': has_more,
+        })
+
+class ChangeExportView(ChangeFeedMixin, APIView):
+    """
+    Stream every change after ?after=<cursor> as NDJSON. The cursor to
+    resume from is sent up front in the X-Next-Cursor header.
+    """
+    throttle_scope = 'export'
+    renderer_classes = [NDJSONRenderer]
+    
+    def perform_content_negotiation(self, request, force=False):
+        # NDJSON is the only format, whatever the client's Accept header says
+        return super().perform_content_negotiation(request, force=True)
+    
+    def get(self, request):
+        cursor = self.get_cursor()
+        # Fix the end of the export so the header matches the streamed rows
+        last = changes_after(cursor, request.user).only('txid', 'id').last()
+        end = (last.txid, last.id) if last else cursor
+        changes = changes_after(cursor, request.user, until=end)
+        
+        start, end = format_cursor(*cursor), format_cursor(*end)
+        response = StreamingHttpResponse(ndjson_lines(changes), content_type=NDJSONRenderer.media_type)
+        response['X-Next-Cursor'] = end
+        response['Content-Disposition'] = f'attachment; filename="changes-{start}-{end}.ndjson"'
+        return response
+
+class TicketAttachmentListView(generics.ListAPIView):
+    """
+    API view for listing a ticket's attachments
+    """
+    serializer_class = AttachmentSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return Attachment.objects.filter(
+            ticket_id=self.kwargs['ticket_id'],
+            ticket__in=Ticket.objects.visible_to(self.request.user)
+        ).select_related('blob', 'uploaded_by')
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """
+    Start a chunked upload: POST filename, size and content_type, then PUT
+    the bytes to /api/uploads/{id}/ in one or more chunks
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['ticket'] = get_object_or_404(
+            Ticket.objects.visible_to(self.request.user), id=self.kwargs['ticket_id']
+        )
+        return context
+    
+    def perform_create(self, serializer):
+        serializer.save(ticket=serializer.context['ticket'], user=self.request.user)
+
+class UploadSessionView(APIView):
+    """
+    GET reports the resume offset, PUT appends a chunk (raw body with an
+    optional 'Content-Range: bytes <start>-<end>/<total>' header), DELETE aborts
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get_session(self, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=self.request.user)
+    
+    def get(self, request, pk):
+        return Response(UploadSessionSerializer(self.get_session(pk)).data)
+    
+    def put(self, request, pk):
+        session = self.get_session(pk)
+        try:
+            start, length = parse_content_range(request.META.get('HTTP_CONTENT_RANGE'), session)
+            attachment = store_chunk(session, request.stream, start, length)
+        except UploadError as exc:
+            return Response({'error': exc.message, 'offset': session.offset}, status=exc.status)
+        
+        if attachment is None:
+            return Response(UploadSessionSerializer(session).data)
+        
+        Timeline.objects.create(
+            ticket=attachment.ticket,
+            user=request.user,
+            action='attached',
+            description=f'Attached {attachment.filename}',
+            metadata={'attachment_id': str(attachment.pk), 'size': attachment.blob.size}
+        )
+        serializer = AttachmentSerializer(attachment, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def delete(self, request, pk):
+        discard_upload(self.get_session(pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class AttachmentDownloadView(APIView):
+    """
+    Stream an attachment; supports single byte-range requests
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        attachment = get_object_or_404(
+            Attachment.objects.select_related('blob'),
+            pk=pk,
+            ticket__in=Ticket.objects.visible_to(request.user)
+        )
+        return download_response(attachment, request.META.get('HTTP_RANGE'))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tickets'
+
+    def ready(self):
+        # Connect signal handlers and register system checks
+        from . import changefeed, checks, queues, similarity  # noqa: F401
@@ -0,0 +1,111 @@
+"""
+Automatic ticket assignment with pluggable agent selection strategies
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from accounts.models import User
+from .models import AgentWorkload, Timeline
+
+DEFAULT_STRATEGY = 'tickets.assignment.LeastOpenTicketsStrategy'
+
+class AssignmentStrategy:
+    """
+    Base class for strategies that pick an agent for a ticket. Subclasses
+    set ordering, the AgentWorkload ordering that puts the best agent
+    first, or override select().
+    """
+    ordering = None
+
+    def candidates(self, ticket):
+        """Active agents of the ticket's organization"""
+        return User.objects.filter(
+            organization_id=ticket.organization_id, role__in=['agent', 'admin'], is_active=True
+        )
+
+    def workloads(self, ticket):
+        """Workload rows of the candidates, created for agents that have none yet"""
+        candidates = self.candidates(ticket)
+        missing = candidates.filter(workload=None).values_list('pk', flat=True)
+        AgentWorkload.objects.bulk_create(
+            [AgentWorkload(agent_id=pk) for pk in missing], ignore_conflicts=True
+        )
+        return AgentWorkload.objects.filter(agent__in=candidates)
+
+    def select(self, ticket):
+        """
+        The chosen agent, or None. Must run in a transaction: the agent's
+        workload row stays locked until it ends, and concurrent assignments
+        skip it instead of choosing the same agent.
+        """
+        workload = (
+            self.workloads(ticket).order_by(*self.ordering).select_related('agent')
+            .select_for_update(skip_locked=True, of=('self',)).first()
+        )
+        return workload.agent if workload else None
+
+class RoundRobinStrategy(AssignmentStrategy):
+    """Hand tickets out in turn, starting with the agent idle the longest"""
+    ordering = [F('last_assigned_at').asc(nulls_first=True), 'agent_id']
+
+class LeastOpenTicketsStrategy(AssignmentStrategy):
+    """Pick the agent with the fewest open tickets, read from AgentWorkload"""
+    ordering = ['open_tickets', F('last_assigned_at').asc(nulls_first=True), 'agent_id']
+
+def get_strategy():
+    path = getattr(settings, 'TICKET_ASSIGNMENT_STRATEGY', DEFAULT_STRATEGY)
+    return import_string(path)()
+
+def _record_assignment(ticket, agent, user):
+    AgentWorkload.objects.filter(agent=agent).update(last_assigned_at=timezone.now())
+    Timeline.objects.create(
+        ticket=ticket,
+        user=user,
+        action='assigned',
+        description=f'Automatically assigned to {agent.username}',
+        metadata={'from': 'Unassigned', 'to': agent.username, 'from_id': None, 'to_id': agent.pk, 'auto': True}
+    )
+
+def create_ticket(ticket, user):
+    """
+    Save a new ticket with its 'created' timeline entry. With
+    auto-assignment enabled, an unassigned ticket gets its agent before
+    that single save.
+    """
+    with transaction.atomic():
+        agent = None
+        if not ticket.assigned_to_id and getattr(settings, 'TICKET_AUTO_ASSIGN', False):
+            if ticket.organization_id is None:
+                ticket.organization_id = ticket.created_by.organization_id
+            agent = get_strategy().select(ticket)
+            ticket.assigned_to = agent
+        ticket.save()
+        Timeline.objects.create(
+            ticket=ticket,
+            user=user,
+            action='created',
+            description=f'Ticket created with priority {ticket.get_priority_display()}'
+        )
+        if agent is not None:
+            _record_assignment(ticket, agent, user)
+    return ticket
+
+def auto_assign(ticket, user):
+    """
+    Assign an existing, unassigned ticket to an agent if auto-assignment is
+    enabled. Returns the chosen agent, or None when the ticket was left
+    unassigned.
+    """
+    if ticket.assigned_to_id or not getattr(settings, 'TICKET_AUTO_ASSIGN', False):
+        return None
+
+    with transaction.atomic():
+        agent = get_strategy().select(ticket)
+        if agent is None:
+            return None
+        ticket.assigned_to = agent
+        ticket.save(update_fields=['assigned_to', 'updated_at'])
+        _record_assignment(ticket, agent, user)
+    return agent
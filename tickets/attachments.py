@@ -0,0 +1,199 @@
+"""
+Chunked attachment uploads and range-aware streamed downloads.
+
+Chunks are written to the attachments storage as they arrive, and the
+upload session's offset only advances when the chunk starts exactly at the
+current offset. That lets clients resume after a failure, and concurrent
+writers can't interleave. When the last chunk lands, the chunks are
+streamed into one file while it is hashed. Identical content is stored only
+once (AttachmentBlob is keyed by SHA-256). If that fails, the session keeps
+every chunk and the next PUT retries it.
+"""
+import hashlib
+import re
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from .models import Attachment, AttachmentBlob, UploadSession, attachment_storage
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+re_content_range = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+re_range = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+class UploadError(Exception):
+    """Rejected chunk; status is the HTTP status to answer with"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def parse_content_range(header, session):
+    """(start, length) of a chunk from its Content-Range header"""
+    if not header:
+        return session.offset, None
+    match = re_content_range.match(header.strip())
+    if not match:
+        raise UploadError('Content-Range must look like "bytes <start>-<end>/<total>"')
+    start, end, total = (int(value) for value in match.groups())
+    if total != session.size or end < start or end >= total:
+        raise UploadError(f'Content-Range does not fit an upload of {session.size} bytes', 416)
+    return start, end - start + 1
+
+def store_chunk(session, stream, start, length):
+    """
+    Write one chunk and advance the session offset. Returns the finished
+    Attachment when this was the last chunk, else None. For a session that
+    already has every chunk, only the finalization is retried.
+    """
+    if session.offset >= session.size:
+        return finalize_upload(session)
+    if start != session.offset:
+        raise UploadError(f'Expected chunk starting at byte {session.offset}', 409)
+
+    max_chunk = settings.ATTACHMENT_CHUNK_SIZE
+    remaining = session.size - start
+    limit = min(max_chunk, remaining) if length is None else length
+    if limit > max_chunk:
+        raise UploadError(f'Chunks may be at most {max_chunk} bytes', 413)
+
+    with tempfile.TemporaryFile() as chunk:
+        received = 0
+        while received < limit:
+            block = stream.read(min(STREAM_BLOCK_SIZE, limit - received)) if stream else b''
+            if not block:
+                break
+            chunk.write(block)
+            received += len(block)
+        if length is not None and received != length:
+            raise UploadError(f'Expected {length} bytes, received {received}')
+        if received == 0:
+            raise UploadError('Empty chunk')
+        chunk.seek(0)
+        # The storage picks another name if a file is left over from a
+        # crashed attempt, so the name it returns is the one recorded
+        name = attachment_storage().save(session.chunk_name(start), File(chunk, name='chunk'))
+
+    # Optimistic advance: only one writer can move the offset past this chunk
+    advanced = UploadSession.objects.filter(pk=session.pk, offset=start).update(
+        offset=F('offset') + received,
+        chunks=session.chunks + [name]
+    )
+    if not advanced:
+        attachment_storage().delete(name)
+        session.refresh_from_db(fields=['offset'])
+        raise UploadError(f'Expected chunk starting at byte {session.offset}', 409)
+
+    session.offset = start + received
+    session.chunks.append(name)
+
+    if session.offset >= session.size:
+        return finalize_upload(session)
+    return None
+
+def finalize_upload(session):
+    """Join the chunks, deduplicate by content hash and create the Attachment"""
+    storage = attachment_storage()
+    digest = hashlib.sha256()
+
+    with tempfile.TemporaryFile() as combined:
+        for name in session.chunks:
+            with storage.open(name, 'rb') as chunk:
+                for block in iter(lambda: chunk.read(STREAM_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    combined.write(block)
+        sha256 = digest.hexdigest()
+
+        blob = AttachmentBlob.objects.filter(sha256=sha256).first()
+        if blob is None:
+            combined.seek(0)
+            name = storage.save(f'blobs/{sha256[:2]}/{sha256}', File(combined, name=sha256))
+            try:
+                with transaction.atomic():
+                    blob = AttachmentBlob.objects.create(sha256=sha256, file=name, size=session.size)
+            except IntegrityError:
+                # Another upload stored the same content first
+                storage.delete(name)
+                blob = AttachmentBlob.objects.get(sha256=sha256)
+
+    with transaction.atomic():
+        # Deleting the session claims it, so a concurrent retry can't attach the file twice
+        claimed, _ = UploadSession.objects.filter(pk=session.pk).delete()
+        if not claimed:
+            raise UploadError('Upload already finished', 409)
+        attachment = Attachment.objects.create(
+            ticket_id=session.ticket_id,
+            comment_id=session.comment_id,
+            uploaded_by_id=session.user_id,
+            blob=blob,
+            filename=session.filename,
+            content_type=session.content_type,
+        )
+    _delete_chunks(session)
+    return attachment
+
+def discard_upload(session):
+    """Delete an upload session and its stored chunks"""
+    session.delete()
+    _delete_chunks(session)
+
+def _delete_chunks(session):
+    storage = attachment_storage()
+    for name in session.chunks:
+        storage.delete(name)
+
+def _iter_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        file.close()
+
+def download_response(attachment, range_header=None):
+    """
+    Stream an attachment, honouring a single 'Range: bytes=' request with a
+    206 partial response
+    """
+    size = attachment.blob.size
+    file = attachment_storage().open(attachment.blob.file.name, 'rb')
+
+    match = re_range.match(range_header.strip()) if range_header else None
+    if match and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start >= size or end < start:
+            file.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        response = StreamingHttpResponse(
+            _iter_range(file, start, end - start + 1),
+            status=206,
+            content_type=attachment.content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(file, content_type=attachment.content_type)
+        response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(True, attachment.filename)
+    response['ETag'] = f'"{attachment.blob.sha256}"'
+    return response
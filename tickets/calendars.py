@@ -0,0 +1,116 @@
+"""
+Business-hours arithmetic for SLA due dates.
+
+A calendar's weekly hours and holidays are expanded once into a sorted
+list of open intervals, stored as UTC timestamps. For each interval the
+business seconds elapsed before its start are kept too. Adding a duration
+to a moment is then two binary searches: one turns the moment into a
+business-time offset, the other turns offset + duration back into a
+moment. There is no walk over hours or days. The intervals cover a window
+of days that grows when a lookup falls outside it.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+# Days compiled around today on first use, and added when a lookup runs past the window
+DAYS_BEFORE = 31
+DAYS_AFTER = 400
+
+class NoBusinessHours(ValueError):
+    """The calendar has no open time left after a moment, e.g. only holidays ahead"""
+
+class CompiledCalendar:
+    """
+    Open intervals of a calendar. weekly_hours maps a weekday (0 = Monday)
+    to (start, end) local times; an end of midnight closes at the end of the
+    day. holidays are local dates with no business hours. A calendar
+    without any weekly hours counts every non-holiday day in full.
+
+    Empty spans (closing at or before opening, other than at midnight) are
+    ignored, so a calendar with only those counts as having no hours.
+
+    Instances are shared between threads, so the compiled window is
+    replaced as a whole and each lookup works on one snapshot of it.
+    """
+    def __init__(self, tz_name, weekly_hours, holidays=()):
+        self.tz = ZoneInfo(tz_name)
+        weekly_hours = {
+            weekday: sorted((start, end) for start, end in spans if end > start or end == time(0))
+            for weekday, spans in weekly_hours.items()
+        }
+        self.weekly_hours = {
+            weekday: spans for weekday, spans in weekly_hours.items() if spans
+        } or {weekday: [(time(0), time(0))] for weekday in range(7)}
+        self.holidays = frozenset(holidays)
+        self._window = None
+
+    def _intervals(self, first_day, last_day):
+        day = first_day
+        while day <= last_day:
+            if day not in self.holidays:
+                for start, end in self.weekly_hours.get(day.weekday(), ()):
+                    opens = datetime.combine(day, start, self.tz).timestamp()
+                    end_day = day + timedelta(days=1) if end == time(0) else day
+                    closes = datetime.combine(end_day, end, self.tz).timestamp()
+                    if closes > opens:
+                        yield opens, closes
+            day += timedelta(days=1)
+
+    def _build(self, first_day, last_day):
+        """(first_day, last_day, starts, ends, elapsed, total) for the days given"""
+        starts, ends, elapsed = [], [], []
+        total = 0.0
+        for opens, closes in self._intervals(first_day, last_day):
+            if ends and opens <= ends[-1]:
+                # Overlapping or touching spans are merged
+                if closes > ends[-1]:
+                    total += closes - ends[-1]
+                    ends[-1] = closes
+                continue
+            starts.append(opens)
+            ends.append(closes)
+            elapsed.append(total)
+            total += closes - opens
+        self._window = (first_day, last_day, starts, ends, elapsed, total)
+        return self._window
+
+    def _covering(self, moment):
+        """The compiled window, rebuilt if needed to include moment's day"""
+        window = self._window
+        day = moment.astimezone(self.tz).date()
+        first_day, last_day = window[:2] if window else (None, None)
+        if first_day is None or day <= first_day:
+            first_day = day - timedelta(days=DAYS_BEFORE)
+        if last_day is None or day >= last_day:
+            last_day = day + timedelta(days=DAYS_AFTER)
+        if window is None or (first_day, last_day) != window[:2]:
+            window = self._build(first_day, last_day)
+        return window
+
+    @staticmethod
+    def _offset(window, moment):
+        _, _, starts, ends, elapsed, _ = window
+        ts = moment.timestamp()
+        i = bisect_right(starts, ts) - 1
+        if i < 0:
+            return 0.0
+        return elapsed[i] + min(ts, ends[i]) - starts[i]
+
+    def add(self, moment, duration):
+        """The moment `duration` of business time after moment"""
+        seconds = duration.total_seconds()
+        if seconds <= 0:
+            return moment
+        window = self._covering(moment)
+        target = self._offset(window, moment) + seconds
+        while window[5] < target:
+            # Same first day, so offsets stay comparable
+            total = window[5]
+            window = self._build(window[0], window[1] + timedelta(days=DAYS_AFTER))
+            if window[5] == total:
+                raise NoBusinessHours('The calendar has no business hours')
+        _, _, starts, _, elapsed, _ = window
+        # bisect_left: a target landing exactly on a closing time stays there
+        i = max(bisect_left(elapsed, target) - 1, 0)
+        return datetime.fromtimestamp(starts[i] + target - elapsed[i], dt_timezone.utc)
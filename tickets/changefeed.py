@@ -0,0 +1,147 @@
+"""
+Change feed over tickets and their timeline, for incremental sync.
+
+Every timeline event, ticket save and ticket deletion appends a TicketChange
+row, and so does every merge (see similarity.merge_tickets). Consumers read
+the rows after the cursor they last got, so each poll touches only new rows
+instead of rescanning the tickets table.
+
+Ids are handed out when rows are inserted, not when they commit, so a
+plain id cursor could move past a row that commits later. On PostgreSQL
+each row records its writing transaction, and the feed only returns rows
+of transactions older than every one still running, in (txid, id) order.
+Other databases commit one writer at a time, so id order is commit order.
+"""
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import BigIntegerField, Func, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Ticket, TicketChange, Timeline
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+SNAPSHOT_FIELDS = [
+    'title', 'description', 'status', 'priority', 'created_by_id', 'assigned_to_id',
+    'created_at', 'updated_at', 'sla_due_date', 'is_sla_breached', 'resolved_at',
+    'version', 'merged_into_id', 'deleted_at', 'organization_id',
+]
+
+def ticket_snapshot(ticket):
+    """Current field values of a ticket, skipping deferred fields and pending F() updates"""
+    deferred = ticket.get_deferred_fields()
+    snapshot = {}
+    for field in SNAPSHOT_FIELDS:
+        if field in deferred:
+            continue
+        value = getattr(ticket, field)
+        if hasattr(value, 'resolve_expression'):
+            continue
+        snapshot[field] = value
+    return snapshot
+
+@receiver(post_save, sender=Timeline)
+def record_timeline_event(sender, instance, created, raw, **kwargs):
+    if raw or not created:
+        return
+    TicketChange.objects.create(
+        ticket_id=instance.ticket_id,
+        organization_id=instance.ticket.organization_id,
+        event='timeline',
+        created_at=instance.created_at,
+        payload={
+            'timeline_id': instance.pk,
+            'action': instance.action,
+            'description': instance.description,
+            'metadata': instance.metadata,
+            'user_id': instance.user_id,
+        }
+    )
+
+@receiver(post_save, sender=Ticket)
+def record_ticket_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    TicketChange.objects.create(
+        ticket_id=instance.pk,
+        organization_id=instance.organization_id,
+        event='ticket_saved',
+        payload={'created': created, 'ticket': ticket_snapshot(instance)}
+    )
+
+@receiver(post_delete, sender=Ticket)
+def record_ticket_deleted(sender, instance, **kwargs):
+    TicketChange.objects.create(
+        ticket_id=instance.pk, organization_id=instance.organization_id, event='ticket_deleted'
+    )
+
+class SnapshotXmin(Func):
+    """Oldest transaction still running; every older one has committed or rolled back"""
+    template = 'pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+    output_field = BigIntegerField()
+
+def parse_cursor(value):
+    """
+    (txid, id) from a cursor handed out by the feed. A bare id, the format
+    of earlier versions, reads as (None, id). Raises ValueError.
+    """
+    txid, _, pk = str(value).rpartition('.')
+    pk = int(pk)
+    txid = int(txid) if txid else None
+    if pk < 0 or (txid is not None and txid < 0):
+        raise ValueError(value)
+    return txid, pk
+
+def format_cursor(txid, pk):
+    return f'{txid}.{pk}' if txid is not None else str(pk)
+
+def changes_after(cursor, user, until=None):
+    """
+    Committed changes after cursor, up to and including until (both
+    (txid, id) pairs), oldest first, limited to the tickets the user can
+    see (admins also get events of their organization's deleted tickets)
+    """
+    txid, pk = cursor
+    if connection.vendor == 'postgresql':
+        changes = TicketChange.objects.filter(txid__lt=SnapshotXmin())
+        if txid is None:
+            changes = changes.filter(id__gt=pk)
+        else:
+            changes = changes.filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=pk))
+        if until is not None:
+            changes = changes.filter(Q(txid__lt=until[0]) | Q(txid=until[0], id__lte=until[1]))
+        ordering = ['txid', 'id']
+    else:
+        changes = TicketChange.objects.filter(id__gt=pk)
+        if until is not None:
+            changes = changes.filter(id__lte=until[1])
+        ordering = ['id']
+    if not user.is_superuser:
+        changes = changes.filter(organization_id=user.organization_id)
+        if not user.is_admin:
+            changes = changes.filter(ticket_id__in=Ticket.objects.visible_to(user).values('pk'))
+    return changes.order_by(*ordering)
+
+def serialize_change(change):
+    return {
+        'id': change.id,
+        'ticket_id': change.ticket_id,
+        'event': change.event,
+        'created_at': change.created_at,
+        'payload': change.payload,
+    }
+
+def ndjson_lines(changes, chunk_size=1000):
+    """Encode changes as newline-delimited JSON, streaming from a server-side cursor"""
+    for change in changes.iterator(chunk_size=chunk_size):
+        data = serialize_change(change)
+        if orjson is not None:
+            yield orjson.dumps(
+                data, default=DjangoJSONEncoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            ) + b'\n'
+        else:
+            yield (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode()
@@ -0,0 +1,72 @@
+"""
+System checks for static asset references in the project's templates.
+
+Assets must go through {% static %}, so they get hashed names and
+long-lived cache headers. With --deploy, every referenced asset must also
+be in the collectstatic manifest, or pages would fail to render.
+"""
+import re
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.checks import Error, Tags, register
+from django.template.utils import get_app_template_dirs
+
+re_asset_ref = re.compile(r'<(?:script|link)\b[^>]*?\b(?:src|href)=["\']([^"\']*)["\']', re.I)
+re_static_tag = re.compile(r'{%\s*static\s+["\']([^"\']+)["\']\s*%}')
+
+def project_templates():
+    """(path, source) of every template that lives in this project"""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    dirs = [Path(d) for engine in settings.TEMPLATES for d in engine.get('DIRS', [])]
+    dirs += [Path(d) for d in get_app_template_dirs('templates')]
+    seen = set()
+    for directory in dirs:
+        directory = directory.resolve()
+        if not directory.is_relative_to(base_dir):
+            continue
+        for path in sorted(directory.rglob('*.html')):
+            if path not in seen:
+                seen.add(path)
+                yield path, path.read_text(encoding='utf-8')
+
+def _relative(path):
+    return path.relative_to(Path(settings.BASE_DIR).resolve())
+
+@register(Tags.staticfiles)
+def check_unhashed_asset_references(app_configs, **kwargs):
+    static_url = settings.STATIC_URL.lstrip('/')
+    errors = []
+    for path, source in project_templates():
+        for url in re_asset_ref.findall(source):
+            if '{%' in url or '{{' in url:
+                continue
+            if url.lstrip('/').startswith(static_url) or url.startswith(('http://', 'https://', '//')):
+                errors.append(Error(
+                    f'{_relative(path)} references "{url}" directly.',
+                    hint="Serve the asset from static/ and reference it with {% static '...' %}.",
+                    id='helpdesk.E001',
+                ))
+    return errors
+
+@register(Tags.staticfiles, deploy=True)
+def check_assets_in_manifest(app_configs, **kwargs):
+    if not isinstance(staticfiles_storage, ManifestFilesMixin):
+        return []
+    manifest = staticfiles_storage.hashed_files
+    if not manifest:
+        return [Error(
+            'The static files manifest is missing or empty.',
+            hint='Run "npm run build" and "python manage.py collectstatic".',
+            id='helpdesk.E002',
+        )]
+    errors = []
+    for path, source in project_templates():
+        for name in re_static_tag.findall(source):
+            if name not in manifest:
+                errors.append(Error(
+                    f'{_relative(path)} uses "{name}", which has no hashed copy in the manifest.',
+                    hint='Build the asset and rerun collectstatic.',
+                    id='helpdesk.E003',
+                ))
+    return errors
@@ -0,0 +1,267 @@
+"""
+Email-to-ticket ingestion from a local mailbox (maildir or mbox).
+
+Messages are parsed in a pool of worker processes while the previous batch
+is written. Each batch is one transaction, and its tickets, comments,
+timeline rows, change feed entries and similarity fingerprints are inserted
+with one bulk INSERT per table instead of a round of saves per email. A
+reply becomes a comment on the ticket its In-Reply-To/References headers
+lead to, and bumps that ticket's updated_at. Every ingested Message-ID is
+recorded, so redelivered messages are skipped. Messages from addresses
+without an account in the organization are skipped unless create_users is
+set. New tickets are auto-assigned after the batch commits, each in its own
+short transaction, so the batch doesn't hold agent workload locks.
+"""
+import os
+import re
+import secrets
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from accounts.models import User
+from .assignment import auto_assign
+from .changefeed import ticket_snapshot
+from .email_parsing import parse_message
+from .models import Comment, InboundEmail, SavedQueue, SLAConfiguration, Ticket, TicketChange, Timeline
+from .similarity import index_new_tickets
+
+# Maildir file names start with the delivery time: seconds, then microseconds
+re_maildir_key = re.compile(r'^(\d+)\.(?:M(\d+))?')
+
+def _delivery_order(key):
+    """Sort key putting parents before replies; mbox keys are already in file order"""
+    if isinstance(key, int):
+        return (key, 0, '')
+    match = re_maildir_key.match(key)
+    if not match:
+        return (0, 0, key)
+    return (int(match[1]), int(match[2] or 0), key)
+
+def _senders(messages, organization, create_users=False):
+    """{address: User} for the known senders; with create_users, unknown addresses get accounts"""
+    names = {message['sender']: message['sender_name'] for message in messages}
+    users = {}
+    known = (
+        User.objects.annotate(address=Lower('email'))
+        .filter(organization=organization, address__in=names).order_by('pk')
+    )
+    for user in known:
+        users.setdefault(user.address, user)
+    if not create_users:
+        return users
+    usernames = [address[:150] for address in names if address not in users]
+    taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    new_users = []
+    for address, name in names.items():
+        if address in users:
+            continue
+        username = address[:150]
+        if username in taken:
+            username = f'{address[:141]}-{secrets.token_hex(4)}'
+        user = User(
+            username=username, email=address, first_name=name[:150], role='user', organization=organization
+        )
+        user.set_unusable_password()
+        users[address] = user
+        new_users.append(user)
+    User.objects.bulk_create(new_users)
+    return users
+
+def _threads(messages, organization):
+    """{Message-ID: ticket id} for the earlier messages these reply to, where the ticket still exists"""
+    references = {reference for message in messages for reference in message['references']}
+    if not references:
+        return {}
+    parents = dict(
+        InboundEmail.objects.filter(organization=organization, message_id__in=references)
+        .values_list('message_id', 'ticket_id')
+    )
+    # Replies to a merged duplicate go to the ticket it was merged into
+    live = dict(Ticket.objects.filter(pk__in=parents.values()).values_list('pk', 'merged_into_id'))
+    return {
+        message_id: live[ticket_id] or ticket_id
+        for message_id, ticket_id in parents.items() if ticket_id in live
+    }
+
+def _comment_description(content):
+    return f'Added comment: {content[:50]}...' if len(content) > 50 else f'Added comment: {content}'
+
+def _assign(tickets):
+    for ticket in tickets:
+        auto_assign(ticket, ticket.created_by)
+
+def ingest_batch(messages, organization=None, create_users=False, on_skip=None):
+    """
+    Create tickets and comments for parsed messages, in one transaction.
+    Senders without an account are skipped, calling on_skip(message's
+    'key', reason), unless create_users is set. Returns a Counter of
+    tickets, comments, duplicates and skipped messages.
+    """
+    counts = Counter()
+    seen = set(
+        InboundEmail.objects.filter(
+            organization=organization, message_id__in=[message['message_id'] for message in messages]
+        ).values_list('message_id', flat=True)
+    )
+    fresh = []
+    for message in messages:
+        if message['message_id'] in seen:
+            counts['duplicates'] += 1
+            continue
+        seen.add(message['message_id'])
+        fresh.append(message)
+    if not fresh:
+        return counts
+
+    organization_id = organization.pk if organization else None
+    now = timezone.now()
+    priority = Ticket._meta.get_field('priority').default
+    with transaction.atomic():
+        senders = _senders(fresh, organization, create_users)
+        threads = _threads(fresh, organization)
+        sla_due_date = SLAConfiguration.objects.due_date(priority, now, organization_id)
+
+        tickets, comments, records, timeline = [], [], [], []
+        for message in fresh:
+            author = senders.get(message['sender'])
+            if author is None:
+                counts['skipped'] += 1
+                if on_skip:
+                    on_skip(message.get('key'), f"unknown sender {message['sender']}")
+                continue
+            ticket_id = next((threads[ref] for ref in message['references'] if ref in threads), None)
+            metadata = {'message_id': message['message_id']}
+            if ticket_id is None:
+                ticket = Ticket(
+                    organization=organization, title=message['title'], description=message['body'],
+                    priority=priority, created_by=author, sla_due_date=sla_due_date
+                )
+                tickets.append(ticket)
+                ticket_id, comment_id = ticket.pk, None
+                timeline.append(Timeline(
+                    ticket=ticket, user=author, action='created', metadata=metadata,
+                    description=f'Ticket created from email with priority {ticket.get_priority_display()}'
+                ))
+            else:
+                comment = Comment(ticket_id=ticket_id, author=author, content=message['reply'])
+                comments.append(comment)
+                comment_id = comment.pk
+                timeline.append(Timeline(
+                    ticket_id=ticket_id, user=author, action='commented', metadata=metadata,
+                    description=_comment_description(comment.content)
+                ))
+            # Later messages of the batch may reply to this one
+            threads[message['message_id']] = ticket_id
+            records.append(InboundEmail(
+                organization=organization, message_id=message['message_id'],
+                ticket_id=ticket_id, comment_id=comment_id, created_at=now
+            ))
+
+        Ticket.objects.bulk_create(tickets)
+        Comment.objects.bulk_create(comments)
+        Timeline.objects.bulk_create(timeline)
+        InboundEmail.objects.bulk_create(records)
+        # What the change feed receivers would have recorded for each save
+        TicketChange.objects.bulk_create([
+            TicketChange(
+                ticket_id=ticket.pk, organization_id=organization_id, event='ticket_saved',
+                payload={'created': True, 'ticket': ticket_snapshot(ticket)}
+            )
+            for ticket in tickets
+        ] + [
+            TicketChange(
+                ticket_id=entry.ticket_id, organization_id=organization_id, event='timeline',
+                created_at=entry.created_at,
+                payload={
+                    'timeline_id': entry.pk, 'action': entry.action, 'description': entry.description,
+                    'metadata': entry.metadata, 'user_id': entry.user_id,
+                }
+            )
+            for entry in timeline
+        ])
+        index_new_tickets(tickets)
+
+        for ticket in tickets:
+            # As if loaded, so later saves see where the ticket came from
+            ticket._stored_state = ticket.tracked_state
+            ticket._stored_text = ticket._text_snapshot()
+        if tickets:
+            states = [ticket.tracked_state for ticket in tickets]
+            for pk, filters in SavedQueue.objects.definitions(organization_id):
+                if any(SavedQueue.filters_match(filters, state) for state in states):
+                    SavedQueue.objects.invalidate(pk)
+        if comments:
+            # Replies change their tickets like any other comment
+            Ticket.all_objects.filter(pk__in={comment.ticket_id for comment in comments}).update(updated_at=now)
+            SavedQueue.objects.invalidate_search(organization_id)
+        if tickets and getattr(settings, 'TICKET_AUTO_ASSIGN', False):
+            transaction.on_commit(partial(_assign, tickets))
+
+    counts['tickets'] += len(tickets)
+    counts['comments'] += len(comments)
+    return counts
+
+def ingest_mailbox(box, organization=None, batch_size=200, workers=None, keep=False, on_skip=None,
+                   create_users=False):
+    """
+    Ingest every message of a mailbox.Mailbox. Ingested and duplicate
+    messages are removed once their batch is committed unless keep is set;
+    kept ones are skipped as duplicates next time. Skipped messages (unknown
+    senders, unparsable mail) are always left in the mailbox. workers is the number of parser processes
+    (default: one per CPU; 1 parses in this process). on_skip(key, reason)
+    is called for messages that are not ingested. create_users gives
+    unknown senders an account instead of skipping them. Returns a Counter.
+    """
+    counts = Counter()
+    box.lock()
+    try:
+        keys = sorted(box.iterkeys(), key=_delivery_order)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(keys) <= batch_size:
+            counts += _ingest_keys(box, keys, map, organization, batch_size, keep, on_skip, create_users)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parse = partial(pool.map, chunksize=max(1, batch_size // (4 * workers)))
+                counts += _ingest_keys(box, keys, parse, organization, batch_size, keep, on_skip, create_users)
+        box.flush()
+    finally:
+        box.unlock()
+    return counts
+
+def _ingest_keys(box, keys, parse, organization, batch_size, keep, on_skip, create_users):
+    counts = Counter()
+    batches = [keys[start:start + batch_size] for start in range(0, len(keys), batch_size)]
+    pending = None
+    for batch_keys in batches + [None]:
+        submitted = None
+        if batch_keys:
+            # Submitted before the previous batch is written, so parsing overlaps the writes
+            submitted = (batch_keys, parse(parse_message, [box.get_bytes(key) for key in batch_keys]))
+        if pending:
+            done_keys, results = pending
+            messages, skipped = [], set()
+
+            def skip(key, reason):
+                skipped.add(key)
+                if on_skip:
+                    on_skip(key, reason)
+
+            for key, message in zip(done_keys, results):
+                if 'skip' in message:
+                    counts['skipped'] += 1
+                    skip(key, message['skip'])
+                else:
+                    message['key'] = key
+                    messages.append(message)
+            counts += ingest_batch(messages, organization, create_users, skip)
+            if not keep:
+                # Skipped messages stay, so they can be fixed up and ingested again
+                for key in done_keys:
+                    if key not in skipped:
+                        box.remove(key)
+        pending = submitted
+    return counts
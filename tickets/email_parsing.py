@@ -0,0 +1,94 @@
+"""
+Parsing of inbound emails into plain dicts.
+
+This runs in worker processes, so it only uses the standard library and
+must not import Django models: a spawned worker imports this module
+without setting Django up.
+"""
+import hashlib
+import html
+import re
+from email import policy
+from email.parser import BytesParser
+from email.utils import getaddresses
+
+# Longest Message-ID stored as is; longer ones are replaced by a digest
+MAX_MESSAGE_ID_LENGTH = 255
+# Longer bodies are cut, so one huge email can't bloat a batch
+MAX_BODY_LENGTH = 64 * 1024
+TITLE_LENGTH = 200
+
+re_message_id = re.compile(r'<[^<>\s]+>')
+re_reply_prefix = re.compile(r'^(\s*(re|fwd?|aw|sv)\s*(\[\d+\])?\s*:)+\s*', re.IGNORECASE)
+re_quote_header = re.compile(r'^(On .+ wrote:|-+ ?Original Message ?-+)\s*$', re.IGNORECASE)
+re_hidden_html = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+re_html_tag = re.compile(r'<[^>]+>')
+
+def _digest_id(data):
+    return f'<{hashlib.sha256(data).hexdigest()}@digest>'
+
+def _message_ids(value):
+    ids = []
+    for message_id in re_message_id.findall(str(value or '')):
+        if len(message_id) > MAX_MESSAGE_ID_LENGTH:
+            message_id = _digest_id(message_id.encode())
+        ids.append(message_id)
+    return ids
+
+def _text_body(message):
+    part = message.get_body(preferencelist=('plain', 'html'))
+    if part is None:
+        return ''
+    try:
+        text = part.get_content()
+    except (LookupError, UnicodeError):
+        # Unknown or wrong charset
+        text = part.get_payload(decode=True).decode('utf-8', 'replace')
+    if part.get_content_subtype() == 'html':
+        text = html.unescape(re_html_tag.sub('', re_hidden_html.sub('', text)))
+    return text.replace('\r\n', '\n').strip()[:MAX_BODY_LENGTH]
+
+def strip_quoted(text):
+    """The new part of a reply: quoted lines and everything after "On ... wrote:" are dropped"""
+    lines = []
+    for line in text.splitlines():
+        if re_quote_header.match(line.strip()):
+            break
+        if not line.startswith('>'):
+            lines.append(line)
+    return '\n'.join(lines).strip() or text
+
+def parse_message(raw):
+    """
+    The fields ingestion needs from a raw RFC 5322 message, or
+    {'skip': reason} for messages that must not become tickets.
+    """
+    try:
+        message = BytesParser(policy=policy.default).parsebytes(raw)
+        auto_submitted = str(message.get('Auto-Submitted') or 'no').strip().lower()
+        if auto_submitted != 'no' or message.get_content_type() == 'multipart/report':
+            # Out-of-office replies and bounces would loop with notifications
+            return {'skip': 'automatic reply'}
+        addresses = [
+            (name, address) for name, address in getaddresses([str(message.get('From') or '')]) if '@' in address
+        ]
+        if not addresses:
+            return {'skip': 'no sender address'}
+        sender_name, sender = addresses[0]
+        message_ids = _message_ids(message.get('Message-ID'))
+        subject = ' '.join(str(message.get('Subject') or '').split())
+        body = _text_body(message)
+        # Nearest ancestor first: In-Reply-To, then References from the end
+        references = _message_ids(message.get('In-Reply-To')) + _message_ids(message.get('References'))[::-1]
+    except Exception as error:  # malformed messages trip all kinds of parser errors
+        return {'skip': f'unparsable: {error}'}
+    return {
+        # Without a Message-ID, redelivery of the same bytes is still caught
+        'message_id': message_ids[0] if message_ids else _digest_id(raw),
+        'references': list(dict.fromkeys(references)),
+        'sender': sender.lower(),
+        'sender_name': sender_name,
+        'title': (re_reply_prefix.sub('', subject) or subject or body.split('\n', 1)[0] or '(no subject)')[:TITLE_LENGTH],
+        'body': body or subject,
+        'reply': strip_quoted(body) if body else subject,
+    }
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import slugify
+from accounts.models import Organization, User
+from tickets.models import (
+    BusinessCalendar, DailyAgentStats, DailyTicketStats, InboundEmail, SavedQueue, SLAConfiguration, Ticket, TicketChange,
+    TicketTransition
+)
+
+class Command(BaseCommand):
+    help = 'Move users, tickets and settings that belong to no organization into one, creating it if needed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Organization name')
+        parser.add_argument('--slug', help='Organization slug (default: derived from the name)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tickets moved per transaction')
+
+    def handle(self, *args, **options):
+        organization, created = Organization.objects.get_or_create(
+            name=options['name'], defaults={'slug': options['slug'] or slugify(options['name'])}
+        )
+
+        user_ids = list(User.objects.filter(organization=None).values_list('pk', flat=True))
+        with transaction.atomic():
+            User.objects.filter(pk__in=user_ids).update(organization=organization)
+            # Settings the organization already has its own version of stay behind
+            SLAConfiguration.objects.filter(organization=None).exclude(
+                priority__in=organization.sla_configurations.values('priority')
+            ).update(organization=organization)
+            BusinessCalendar.objects.filter(organization=None).exclude(
+                name__in=organization.business_calendars.values('name')
+            ).update(organization=organization)
+            DailyTicketStats.objects.filter(organization=None).update(organization=organization)
+            DailyAgentStats.objects.filter(organization=None).update(organization=organization)
+            # Replies keep threading onto the moved tickets
+            InboundEmail.objects.filter(organization=None).exclude(
+                message_id__in=organization.inboundemail_set.values('message_id')
+            ).update(organization=organization)
+        cache.delete_many([User.cache_key(pk) for pk in user_ids])
+
+        tickets = 0
+        while True:
+            ids = list(Ticket.all_objects.filter(organization=None).values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                Ticket.all_objects.filter(pk__in=ids).update(organization=organization)
+                TicketChange.objects.filter(ticket_id__in=ids, organization_id=None).update(organization_id=organization.pk)
+                TicketTransition.objects.filter(ticket_id__in=ids).update(organization=organization)
+            tickets += len(ids)
+        # Events of tickets purged before the move
+        TicketChange.objects.filter(organization_id=None).update(organization_id=organization.pk)
+
+        cache.delete_many([SavedQueue.definitions_key(None), SavedQueue.definitions_key(organization.pk)])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Created' if created else 'Updated'} {organization.name}: "
+            f'moved {len(user_ids)} user(s) and {tickets} ticket(s)'
+        ))
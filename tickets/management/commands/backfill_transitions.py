@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min
+from accounts.models import User
+from tickets.models import Ticket, TicketTransition, Timeline
+
+# Timeline action -> TicketTransition field
+ACTION_FIELDS = {'status_changed': 'status', 'priority_changed': 'priority', 'assigned': 'assigned_to'}
+
+class Command(BaseCommand):
+    help = (
+        'Create ticket transitions from the status, priority and assignment entries of the timeline. '
+        'Only history older than a ticket\'s first recorded transition is converted, so it can be rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Tickets converted per transaction')
+
+    def handle(self, *args, **options):
+        created = skipped = tickets = 0
+        last_pk = None
+        while True:
+            batch = Ticket.all_objects.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = {
+                pk: (created_at, organization_id)
+                for pk, created_at, organization_id
+                in batch.values_list('pk', 'created_at', 'organization_id')[:options['batch_size']]
+            }
+            if not batch:
+                break
+            last_pk = max(batch)
+            with transaction.atomic():
+                batch_created, batch_skipped = self.convert(batch)
+            created += batch_created
+            skipped += batch_skipped
+            tickets += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {tickets} ticket(s): created {created} transition(s), skipped {skipped} timeline entries'
+        ))
+
+    def convert(self, batch):
+        """Transitions for the timeline of tickets {pk: (created_at, organization_id)}"""
+        # Where recorded history begins; older timeline entries are converted
+        first_recorded = {
+            (ticket_id, field): changed_at
+            for ticket_id, field, changed_at in TicketTransition.objects.filter(ticket_id__in=batch)
+            .order_by().values('ticket_id', 'field').annotate(first=Min('changed_at'))
+            .values_list('ticket_id', 'field', 'first')
+        }
+        entries = list(
+            Timeline.objects.filter(ticket_id__in=batch, action__in=ACTION_FIELDS)
+            .order_by('ticket_id', 'created_at', 'id')
+            .values_list('ticket_id', 'user_id', 'action', 'metadata', 'created_at')
+        )
+        # Older assignment entries name users; newer ones carry ids too
+        usernames = {
+            metadata.get(key) for _, _, action, metadata, _ in entries if action == 'assigned'
+            for key in ('from', 'to')
+        }
+        user_ids = dict(
+            User.objects.filter(username__in=usernames - {None, 'Unassigned'}).values_list('username', 'pk')
+        )
+
+        transitions = []
+        entered = {}
+        skipped = 0
+        for ticket_id, user_id, action, metadata, created_at in entries:
+            field = ACTION_FIELDS[action]
+            key = (ticket_id, field)
+            if key in first_recorded and created_at >= first_recorded[key]:
+                continue
+            transition = TicketTransition(
+                ticket_id=ticket_id,
+                organization_id=batch[ticket_id][1],
+                field=field,
+                changed_by_id=user_id,
+                changed_at=created_at,
+            )
+            if field == 'assigned_to':
+                transition.from_user_id = self.user_id(metadata, 'from', user_ids)
+                transition.to_user_id = self.user_id(metadata, 'to', user_ids)
+                # Renamed or deleted users can't be told apart from unassigned
+                valid = transition.from_user_id != transition.to_user_id
+            else:
+                transition.from_value, transition.to_value = metadata.get('from'), metadata.get('to')
+                valid = bool(transition.from_value and transition.to_value)
+            transition.entered_at = entered.get(key, batch[ticket_id][0])
+            transition.duration = created_at - transition.entered_at
+            # The state still changed here, even if the entry can't be converted
+            entered[key] = created_at
+            if not valid:
+                skipped += 1
+                continue
+            transitions.append(transition)
+        TicketTransition.objects.bulk_create(transitions)
+
+        # The first recorded transition began at creation; it now follows the converted ones
+        for key, entered_at in entered.items():
+            if key in first_recorded:
+                changed_at = first_recorded[key]
+                TicketTransition.objects.filter(ticket_id=key[0], field=key[1], changed_at=changed_at).update(
+                    entered_at=entered_at, duration=changed_at - entered_at
+                )
+        return len(transitions), skipped
+
+    @staticmethod
+    def user_id(metadata, key, user_ids):
+        if f'{key}_id' in metadata:
+            return metadata[f'{key}_id']
+        # 'Unassigned' is not looked up, whoever may have that username now
+        return None if metadata.get(key) == 'Unassigned' else user_ids.get(metadata.get(key))
@@ -0,0 +1,85 @@
+import gzip
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from accounts.models import User
+from tickets.models import Ticket
+from tickets.renderers import FastJSONRenderer, orjson
+from tickets.serializers import TicketSerializer
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+class Command(BaseCommand):
+    help = 'Benchmark serialization, JSON rendering and compression of a large ticket page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Tickets per page')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per step (best is reported)')
+        parser.add_argument('--full', action='store_true', help='Serialize every field instead of the lean list fields')
+
+    def handle(self, *args, **options):
+        tickets = self.build_tickets(options['rows'])
+        fields = None if options['full'] else TicketSerializer.LIST_FIELDS
+
+        data, serialize_time = self.best_of(
+            options['repeat'], lambda: TicketSerializer(tickets, many=True, fields=fields).data
+        )
+        payload = {'count': len(data), 'next': None, 'previous': None, 'results': data}
+
+        self.stdout.write(f"{options['rows']} tickets, {'all' if fields is None else 'list'} fields")
+        self.stdout.write(f'  serializer          {serialize_time * 1000:8.2f} ms')
+
+        body, stock_time = self.best_of(options['repeat'], lambda: JSONRenderer().render(payload))
+        self.stdout.write(f'  JSONRenderer        {stock_time * 1000:8.2f} ms  {len(body):>9} bytes')
+
+        if orjson is not None:
+            _, fast_time = self.best_of(options['repeat'], lambda: FastJSONRenderer().render(payload))
+            self.stdout.write(f'  FastJSONRenderer    {fast_time * 1000:8.2f} ms')
+        else:
+            self.stdout.write('  FastJSONRenderer    orjson not installed, uses stdlib json')
+
+        compressed, gzip_time = self.best_of(options['repeat'], lambda: gzip.compress(body, compresslevel=6))
+        self.stdout.write(f'  gzip                {gzip_time * 1000:8.2f} ms  {len(compressed):>9} bytes')
+        if brotli is not None:
+            compressed, brotli_time = self.best_of(options['repeat'], lambda: brotli.compress(body, quality=5))
+            self.stdout.write(f'  brotli (q5)         {brotli_time * 1000:8.2f} ms  {len(compressed):>9} bytes')
+
+    def best_of(self, repeat, func):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
+
+    def build_tickets(self, rows):
+        """Unsaved tickets carrying the annotations TicketViewSet adds, so no queries run"""
+        now = timezone.now()
+        author = User(id=1, username='benchmark', email='benchmark@example.com', role='agent')
+        tickets = []
+        for i in range(rows):
+            ticket = Ticket(
+                id=uuid.uuid4(),
+                title=f'Benchmark ticket {i}',
+                description='Steps to reproduce the problem. ' * 20,
+                status='open',
+                priority='medium',
+                created_by=author,
+                assigned_to=author,
+                created_at=now,
+                updated_at=now,
+                sla_due_date=now + timedelta(hours=72),
+            )
+            ticket.num_comments = 3
+            ticket.latest_comment_content = 'Latest reply from the customer'
+            ticket.latest_comment_author = author.username
+            ticket.latest_comment_at = now
+            tickets.append(ticket)
+        return tickets
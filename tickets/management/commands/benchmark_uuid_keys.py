@@ -0,0 +1,82 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, models, transaction
+from tickets.models import uuid7
+
+KEY_FUNCTIONS = [('uuid4', uuid.uuid4), ('uuid7', uuid7)]
+
+class Command(BaseCommand):
+    help = 'Compare insert throughput and primary key index size of uuid4 and time-ordered uuid7 keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Rows inserted per key type')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT transaction')
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        self.stdout.write(f'{rows} rows per key type, {batch_size} per transaction, on {connection.vendor}')
+        for label, key_function in KEY_FUNCTIONS:
+            table = f'benchmark_{label}_keys'
+            self.create_table(table)
+            try:
+                elapsed, last_elapsed = self.fill(table, key_function, rows, batch_size)
+                size = self.index_size(table)
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.execute(f'DROP TABLE {editor.quote_name(table)}')
+            size_text = f'{size / 1024 / 1024:8.2f} MB' if size is not None else '     n/a'
+            self.stdout.write(
+                f'  {label}  {rows / elapsed:10.0f} rows/s overall  '
+                f'{batch_size / last_elapsed:10.0f} rows/s last batch  index {size_text}'
+            )
+
+    def create_table(self, table):
+        # Same column types as Timeline's key and description, without its
+        # foreign keys, so only the primary key index is measured
+        uuid_type = models.UUIDField().db_type(connection)
+        text_type = models.TextField().db_type(connection)
+        with connection.schema_editor() as editor:
+            editor.execute(
+                f'CREATE TABLE {editor.quote_name(table)} '
+                f'(id {uuid_type} NOT NULL PRIMARY KEY, payload {text_type} NOT NULL)'
+            )
+
+    def fill(self, table, key_function, rows, batch_size):
+        """Insert rows in committed batches; returns total and last batch seconds"""
+        field = models.UUIDField()
+        payload = 'Status changed from open to in progress by an agent. ' * 2
+        sql = f'INSERT INTO {connection.ops.quote_name(table)} (id, payload) VALUES (%s, %s)'
+        total = last = 0.0
+        for offset in range(0, rows, batch_size):
+            params = [
+                (field.get_db_prep_value(key_function(), connection), payload)
+                for _ in range(min(batch_size, rows - offset))
+            ]
+            start = time.perf_counter()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            last = time.perf_counter() - start
+            total += last
+        return total, last
+
+    def index_size(self, table):
+        """Bytes used by the primary key index, where the database reports it"""
+        with connection.cursor() as cursor:
+            try:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        'SELECT pg_relation_size(indexrelid) FROM pg_index '
+                        'WHERE indrelid = %s::regclass AND indisprimary', [table]
+                    )
+                elif connection.vendor == 'sqlite':
+                    # Needs SQLite built with the dbstat virtual table
+                    cursor.execute(
+                        'SELECT SUM(pgsize) FROM dbstat WHERE name LIKE %s', [f'sqlite_autoindex_{table}_%']
+                    )
+                else:
+                    return None
+            except DatabaseError:
+                return None
+            row = cursor.fetchone()
+        return row[0] if row else None
@@ -0,0 +1,43 @@
+import mailbox
+import os
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Organization
+from tickets.email_intake import ingest_mailbox
+
+class Command(BaseCommand):
+    help = 'Create tickets and comments from the messages of a maildir or mbox, which are removed once ingested; skipped messages are left in place'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Maildir directory or mbox file')
+        parser.add_argument('--organization', help='Slug of the organization the mailbox belongs to')
+        parser.add_argument('--workers', type=int, help='Parser processes (default: one per CPU)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Messages written per transaction')
+        parser.add_argument('--keep', action='store_true', help='Leave ingested messages in the mailbox')
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Create accounts for unknown senders instead of skipping their messages'
+        )
+
+    def handle(self, *args, **options):
+        organization = None
+        if options['organization']:
+            organization = Organization.objects.filter(slug=options['organization']).first()
+            if organization is None:
+                raise CommandError(f"Organization {options['organization']} does not exist")
+        path = options['path']
+        if os.path.isdir(path):
+            box = mailbox.Maildir(path, factory=None, create=False)
+        elif os.path.isfile(path):
+            box = mailbox.mbox(path, create=False)
+        else:
+            raise CommandError(f'{path} is neither a maildir nor an mbox file')
+
+        counts = ingest_mailbox(
+            box, organization, batch_size=options['batch_size'], workers=options['workers'],
+            keep=options['keep'], on_skip=lambda key, reason: self.stderr.write(f'Skipped {key}: {reason}'),
+            create_users=options['create_users']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['tickets']} ticket(s) and {counts['comments']} comment(s); "
+            f"skipped {counts['duplicates']} duplicate(s) and {counts['skipped']} other message(s)"
+        ))
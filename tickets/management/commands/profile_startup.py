@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under -X importtime. It times settings, app
+# registry population with each AppConfig.ready() and URLconf loading, then
+# prints the timings as JSON on stdout (import times go to stderr).
+PROFILE_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from django.apps.config import AppConfig
+ready_times = {}
+original_create = AppConfig.create.__func__
+
+def create(cls, entry):
+    config = original_create(cls, entry)
+    ready = config.ready
+    def timed_ready():
+        began = time.perf_counter()
+        ready()
+        ready_times[config.label] = time.perf_counter() - began
+    config.ready = timed_ready
+    return config
+
+AppConfig.create = classmethod(create)
+
+from django.conf import settings
+settings.INSTALLED_APPS
+settings_done = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+if %(load_urls)r:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+urls_done = time.perf_counter()
+json.dump({
+    'settings': settings_done - start,
+    'setup': setup_done - settings_done,
+    'urls': urls_done - setup_done,
+    'total': urls_done - start,
+    'ready': ready_times,
+}, sys.stdout)
+'''
+
+class Command(BaseCommand):
+    help = 'Profile cold start: import time per module, app ready() time and URLconf loading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Number of slowest modules to list')
+        parser.add_argument('--no-urls', action='store_true', help='Stop after django.setup(), as management commands do')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'HelpDesk.settings'))
+        script = PROFILE_SCRIPT % {'load_urls': not options['no_urls']}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'Profiling failed')
+
+        timings = json.loads(result.stdout)
+        modules = self.parse_importtime(result.stderr)
+
+        self.stdout.write('Startup phases')
+        self.stdout.write(f"  settings            {timings['settings'] * 1000:8.1f} ms")
+        self.stdout.write(f"  django.setup()      {timings['setup'] * 1000:8.1f} ms")
+        if not options['no_urls']:
+            self.stdout.write(f"  URLconf             {timings['urls'] * 1000:8.1f} ms")
+        self.stdout.write(f"  total               {timings['total'] * 1000:8.1f} ms")
+
+        self.stdout.write('\nAppConfig.ready()')
+        for label, seconds in sorted(timings['ready'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {label:<20}{seconds * 1000:8.1f} ms')
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write('\nImport time by top-level package (self time)')
+        for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {package:<30}{micros / 1000:8.1f} ms')
+
+        self.stdout.write(f"\nSlowest {options['top']} modules (cumulative)")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda item: -item[2])[:options['top']]:
+            self.stdout.write(f'  {name:<45}{cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:.1f} ms)')
+
+    def parse_importtime(self, output):
+        """(module, self us, cumulative us) from -X importtime output"""
+        modules = []
+        for line in output.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        return modules
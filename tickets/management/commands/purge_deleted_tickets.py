@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tickets.purge import purge_comments, purge_orphan_blobs, purge_tickets
+
+class Command(BaseCommand):
+    help = 'Permanently delete tickets and comments that were soft-deleted long enough ago'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SOFT_DELETE_RETENTION_DAYS,
+            help='Keep soft-deleted rows this many days before purging them'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per transaction')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        tickets = purge_tickets(before, options['batch_size'])
+        comments = purge_comments(before, options['batch_size'])
+        blobs = purge_orphan_blobs(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {tickets} ticket(s), {comments} comment(s) and {blobs} unused attachment file(s)'
+        ))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tickets.attachments import discard_upload
+from tickets.models import UploadSession
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were never completed, along with their stored chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Age after which an unfinished upload is stale')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(created_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            discard_upload(session)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Discarded {count} stale upload(s)'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from tickets.models import Ticket, AgentWorkload
+
+class Command(BaseCommand):
+    help = 'Recompute the per-agent open ticket counters from the tickets table'
+
+    def handle(self, *args, **options):
+        counts = dict(
+            Ticket.objects.exclude(status__in=Ticket.CLOSED_STATUSES)
+            .exclude(assigned_to=None)
+            .values_list('assigned_to')
+            .annotate(total=Count('id'))
+        )
+
+        with transaction.atomic():
+            AgentWorkload.objects.exclude(agent_id__in=counts).update(open_tickets=0)
+            existing = set(
+                AgentWorkload.objects.filter(agent_id__in=counts).values_list('agent_id', flat=True)
+            )
+            for agent_id in existing:
+                AgentWorkload.objects.filter(agent_id=agent_id).update(open_tickets=counts[agent_id])
+            AgentWorkload.objects.bulk_create([
+                AgentWorkload(agent_id=agent_id, open_tickets=total)
+                for agent_id, total in counts.items()
+                if agent_id not in existing
+            ])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt workload for {len(counts)} agents'))
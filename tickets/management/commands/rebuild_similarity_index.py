@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from tickets.models import Ticket
+from tickets.similarity import index_ticket
+
+class Command(BaseCommand):
+    help = 'Compute similarity fingerprints for every ticket that has not been merged'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        tickets = Ticket.objects.filter(merged_into=None).only('id', 'title', 'description')
+        count = 0
+        for ticket in tickets.iterator(chunk_size=options['batch_size']):
+            index_ticket(ticket)
+            count += 1
+            if count % options['batch_size'] == 0:
+                self.stdout.write(f'Indexed {count} tickets')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} tickets'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from tickets.models import BusinessCalendar, SLAConfiguration, Ticket
+from tickets.sla import recalculate_due_dates, tickets_using
+
+class Command(BaseCommand):
+    help = 'Recompute SLA due dates of open tickets, e.g. after editing a business calendar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calendar', type=int, help='Only tickets whose SLA runs on the calendar with this id')
+        parser.add_argument('--organization', help='Only tickets of the organization with this slug')
+        parser.add_argument(
+            '--priority', action='append', choices=[value for value, _ in Ticket.PRIORITY_CHOICES],
+            help='Only this priority (repeatable)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tickets per transaction')
+
+    def handle(self, *args, **options):
+        tickets = Ticket.objects.all()
+        if options['calendar']:
+            if not BusinessCalendar.objects.filter(pk=options['calendar']).exists():
+                raise CommandError(f"Calendar {options['calendar']} does not exist")
+            tickets = tickets_using(SLAConfiguration.objects.filter(calendar_id=options['calendar']))
+        if options['organization']:
+            tickets = tickets.filter(organization__slug=options['organization'])
+        if options['priority']:
+            tickets = tickets.filter(priority__in=options['priority'])
+        checked, changed = recalculate_due_dates(tickets, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} open ticket(s), updated {changed}'))
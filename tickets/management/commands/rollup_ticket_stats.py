@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from tickets.models import Ticket, DailyTicketStats
+from tickets.reports import rollup_stats
+
+class Command(BaseCommand):
+    help = 'Refresh the daily reporting rollups, starting from the last rolled-up day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to recompute (YYYY-MM-DD)')
+        parser.add_argument('--full', action='store_true', help='Recompute from the first ticket')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+
+        if options['since']:
+            start = parse_date(options['since'])
+            if start is None:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+        else:
+            last = None if options['full'] else (
+                DailyTicketStats.objects.order_by('-date').values_list('date', flat=True).first()
+            )
+            if last is not None:
+                # The last rolled-up day may have been partial, so redo it
+                start = last
+            else:
+                first = Ticket.objects.order_by('created_at').values_list('created_at', flat=True).first()
+                if first is None:
+                    self.stdout.write('No tickets to roll up')
+                    return
+                start = timezone.localtime(first).date()
+
+        days = (today - start).days + 1
+        ticket_rows, agent_rows = rollup_stats(start, today)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {days} day(s) from {start}: {ticket_rows} ticket rows, {agent_rows} agent rows'
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('tickets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentWorkload',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_tickets', models.PositiveIntegerField(default=0)),
+                ('last_assigned_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['open_tickets', 'last_assigned_at'], name='tickets_age_open_ti_691106_idx')],
+            },
+        ),
+    ]
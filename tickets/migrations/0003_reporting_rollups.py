@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_resolved_at(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Timeline = apps.get_model('tickets', 'Timeline')
+    closing_event = Timeline.objects.filter(
+        ticket=OuterRef('pk'),
+        action='status_changed',
+        metadata__to__in=['resolved', 'closed'],
+    ).order_by('-created_at').values('created_at')[:1]
+    Ticket.objects.filter(status__in=['resolved', 'closed'], resolved_at=None).update(
+        resolved_at=Coalesce(Subquery(closing_event), 'updated_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_agentworkload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAgentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('resolved_count', models.PositiveIntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily agent stats',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTicketStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=10)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('resolved_count', models.PositiveIntegerField(default=0)),
+                ('breached_count', models.PositiveIntegerField(default=0, help_text='Resolved after the SLA due date')),
+                ('resolution_seconds', models.BigIntegerField(default=0, help_text='Total time to resolve for resolved tickets')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily ticket stats',
+                'ordering': ['date', 'priority'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_resolved_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['created_at'], name='tickets_tic_created_5dd600_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['resolved_at'], name='tickets_tic_resolve_854474_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyagentstats',
+            name='agent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyticketstats',
+            unique_together={('date', 'priority')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyagentstats',
+            unique_together={('date', 'agent')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_reporting_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_created_d1df98_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_assigne_bcac0e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['created_by', '-created_at'], name='tickets_tic_created_80af85_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['assigned_to', '-created_at'], name='tickets_tic_assigne_91c8ec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True)), fields=['-created_at'], name='ticket_unassigned_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_attachments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketFingerprint',
+            fields=[
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='tickets.ticket')),
+                ('signature', models.JSONField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='merged_into',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='tickets.ticket'),
+        ),
+        migrations.AlterField(
+            model_name='timeline',
+            name='action',
+            field=models.CharField(choices=[('created', 'Ticket Created'), ('updated', 'Ticket Updated'), ('status_changed', 'Status Changed'), ('assigned', 'Ticket Assigned'), ('commented', 'Comment Added'), ('priority_changed', 'Priority Changed'), ('attached', 'Attachment Added'), ('merged', 'Tickets Merged')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TicketSimilarityBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_bands', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'ticket'], name='tickets_tic_bucket_5e49bc_idx')],
+            },
+        ),
+    ]
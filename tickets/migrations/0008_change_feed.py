@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:05
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_timeline(apps, schema_editor):
+    """Seed the feed with existing timeline history, oldest first"""
+    Timeline = apps.get_model('tickets', 'Timeline')
+    TicketChange = apps.get_model('tickets', 'TicketChange')
+    batch = []
+    for entry in Timeline.objects.order_by('created_at', 'id').iterator(chunk_size=2000):
+        batch.append(TicketChange(
+            ticket_id=entry.ticket_id,
+            event='timeline',
+            created_at=entry.created_at,
+            payload={
+                'timeline_id': str(entry.pk),
+                'action': entry.action,
+                'description': entry.description,
+                'metadata': entry.metadata,
+                'user_id': entry.user_id,
+            },
+        ))
+        if len(batch) >= 2000:
+            TicketChange.objects.bulk_create(batch)
+            batch = []
+    TicketChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_similarity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ticket_id', models.UUIDField(db_index=True)),
+                ('event', models.CharField(choices=[('timeline', 'Timeline Event'), ('ticket_saved', 'Ticket Saved'), ('ticket_deleted', 'Ticket Deleted')], max_length=20)),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
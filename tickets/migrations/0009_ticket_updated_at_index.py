@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_change_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['updated_at'], name='tickets_tic_updated_c8331d_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_ticket_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_created_80af85_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_assigne_91c8ec_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_unassigned_queue_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['ticket', 'created_at'], name='comment_active_ticket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='comment_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['created_by', '-created_at'], name='ticket_creator_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['assigned_to', '-created_at'], name='ticket_assignee_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('deleted_at__isnull', True)), fields=['-created_at'], name='ticket_unassigned_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='ticket_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# (table, column, referenced table, ON DELETE action) for the foreign keys
+# that purge_deleted_tickets relies on the database to follow. Django keeps
+# its own on_delete handling for ORM deletes; these only matter for the raw
+# batch deletes. A later AlterField on one of these columns recreates the
+# constraint without the action, so rerun this after such changes.
+DB_CASCADES = [
+    ('tickets_comment', 'ticket_id', 'tickets_ticket', 'CASCADE'),
+    ('tickets_comment', 'parent_id', 'tickets_comment', 'CASCADE'),
+    ('tickets_timeline', 'ticket_id', 'tickets_ticket', 'CASCADE'),
+    ('tickets_attachment', 'ticket_id', 'tickets_ticket', 'CASCADE'),
+    ('tickets_attachment', 'comment_id', 'tickets_comment', 'CASCADE'),
+    ('tickets_uploadsession', 'ticket_id', 'tickets_ticket', 'CASCADE'),
+    ('tickets_uploadsession', 'comment_id', 'tickets_comment', 'CASCADE'),
+    ('tickets_ticketfingerprint', 'ticket_id', 'tickets_ticket', 'CASCADE'),
+    ('tickets_ticketsimilarityband', 'ticket_id', 'tickets_ticket', 'CASCADE'),
+    ('tickets_ticket', 'merged_into_id', 'tickets_ticket', 'SET NULL'),
+]
+
+
+def set_delete_actions(schema_editor, use_actions):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        # Other databases get their children deleted explicitly by the purge
+        return
+    with connection.cursor() as cursor:
+        for table, column, target, action in DB_CASCADES:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            for name, info in constraints.items():
+                if info['foreign_key'] and info['columns'] == [column]:
+                    on_delete = f' ON DELETE {action}' if use_actions else ''
+                    schema_editor.execute(
+                        f'ALTER TABLE {schema_editor.quote_name(table)} '
+                        f'DROP CONSTRAINT {schema_editor.quote_name(name)}, '
+                        f'ADD CONSTRAINT {schema_editor.quote_name(name)} '
+                        f'FOREIGN KEY ({schema_editor.quote_name(column)}) '
+                        f'REFERENCES {schema_editor.quote_name(target)} ("id"){on_delete} '
+                        f'DEFERRABLE INITIALLY DEFERRED'
+                    )
+
+
+def add_cascades(apps, schema_editor):
+    set_delete_actions(schema_editor, True)
+
+
+def remove_cascades(apps, schema_editor):
+    set_delete_actions(schema_editor, False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_cascades, remove_cascades),
+    ]
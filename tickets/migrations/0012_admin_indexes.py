@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_database_cascades'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='comment_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['title'], name='ticket_title_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['ticket', '-created_at'], name='timeline_ticket_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['-created_at', '-id'], name='timeline_recent_idx'),
+        ),
+    ]
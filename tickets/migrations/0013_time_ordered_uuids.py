@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:19
+
+import tickets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_admin_indexes'),
+    ]
+
+    # The key default is applied in Python, so only the migration state
+    # changes. Existing rows keep their uuid4 keys; running the operations
+    # against the database would rebuild the tables on SQLite for nothing.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='comment',
+                    name='id',
+                    field=models.UUIDField(default=tickets.models.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='ticket',
+                    name='id',
+                    field=models.UUIDField(default=tickets.models.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='timeline',
+                    name='id',
+                    field=models.UUIDField(default=tickets.models.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
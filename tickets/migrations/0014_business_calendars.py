@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_time_ordered_uuids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('timezone', models.CharField(default='UTC', help_text='IANA time zone, e.g. Europe/London', max_length=64)),
+                ('revision', models.PositiveIntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='slaconfiguration',
+            name='calendar',
+            field=models.ForeignKey(blank=True, help_text='Business hours the SLA clock runs on; empty for 24/7', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sla_configurations', to='tickets.businesscalendar'),
+        ),
+        migrations.CreateModel(
+            name='BusinessHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField(help_text='00:00 closes at midnight')),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours', to='tickets.businesscalendar')),
+            ],
+            options={
+                'verbose_name_plural': 'Business hours',
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='tickets.businesscalendar')),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'date'), name='holiday_calendar_date_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,166 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_organizations'),
+        ('tickets', '0014_business_calendars'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='businesscalendar',
+            options={'ordering': ['name']},
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_status_0e5646_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_priorit_0bec9b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_is_sla__34985c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_tic_updated_c8331d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_creator_active_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_assignee_active_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_unassigned_queue_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_title_prefix_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyticketstats',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='businesscalendar',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='business_calendars', to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='dailyagentstats',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='dailyticketstats',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='slaconfiguration',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sla_configurations', to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='organization',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tickets', to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='ticketchange',
+            name='organization_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='businesscalendar',
+            name='name',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='savedqueue',
+            name='shared',
+            field=models.BooleanField(default=False, help_text='Visible to everyone in the organization, not just the owner'),
+        ),
+        migrations.AlterField(
+            model_name='slaconfiguration',
+            name='priority',
+            field=models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=10),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyticketstats',
+            unique_together={('organization', 'date', 'priority')},
+        ),
+        migrations.AddIndex(
+            model_name='dailyagentstats',
+            index=models.Index(fields=['organization', 'date'], name='agentstats_org_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['organization', 'status'], name='ticket_org_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['organization', 'priority'], name='ticket_org_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['organization', 'is_sla_breached'], name='ticket_org_breached_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['organization', 'updated_at'], name='ticket_org_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['organization', '-created_at'], name='ticket_org_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['organization', 'created_by', '-created_at'], name='ticket_creator_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['organization', 'assigned_to', '-created_at'], name='ticket_assignee_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('deleted_at__isnull', True)), fields=['organization', '-created_at'], name='ticket_unassigned_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['organization', 'title'], name='ticket_title_prefix_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='ticketchange',
+            index=models.Index(fields=['organization_id', 'id'], name='change_org_cursor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='businesscalendar',
+            constraint=models.UniqueConstraint(fields=('organization', 'name'), name='calendar_org_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='businesscalendar',
+            constraint=models.UniqueConstraint(condition=models.Q(('organization__isnull', True)), fields=('name',), name='calendar_name_unique_without_org'),
+        ),
+        migrations.AddConstraint(
+            model_name='slaconfiguration',
+            constraint=models.UniqueConstraint(fields=('organization', 'priority'), name='sla_org_priority_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='slaconfiguration',
+            constraint=models.UniqueConstraint(condition=models.Q(('organization__isnull', True)), fields=('priority',), name='sla_priority_unique_without_org'),
+        ),
+    ]
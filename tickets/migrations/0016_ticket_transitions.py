@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_ticket_cascade(schema_editor, use_action):
+    # Like migration 0011: purge_deleted_tickets relies on PostgreSQL to
+    # delete a purged ticket's transitions
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    table, column = 'tickets_tickettransition', 'ticket_id'
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, info in constraints.items():
+        if info['foreign_key'] and info['columns'] == [column]:
+            on_delete = ' ON DELETE CASCADE' if use_action else ''
+            schema_editor.execute(
+                f'ALTER TABLE {schema_editor.quote_name(table)} '
+                f'DROP CONSTRAINT {schema_editor.quote_name(name)}, '
+                f'ADD CONSTRAINT {schema_editor.quote_name(name)} '
+                f'FOREIGN KEY ({schema_editor.quote_name(column)}) '
+                f'REFERENCES "tickets_ticket" ("id"){on_delete} '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
+
+
+def add_cascade(apps, schema_editor):
+    set_ticket_cascade(schema_editor, True)
+
+
+def remove_cascade(apps, schema_editor):
+    set_ticket_cascade(schema_editor, False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_organizations'),
+        ('tickets', '0015_organizations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketTransition',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('field', models.CharField(choices=[('status', 'Status'), ('priority', 'Priority'), ('assigned_to', 'Assignee')], max_length=20)),
+                ('from_value', models.CharField(blank=True, max_length=20, null=True)),
+                ('to_value', models.CharField(blank=True, max_length=20, null=True)),
+                ('entered_at', models.DateTimeField()),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration', models.DurationField()),
+                ('changed_by', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('from_user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.organization')),
+                ('ticket', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='tickets.ticket')),
+                ('to_user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['changed_at', 'id'],
+                'indexes': [models.Index(fields=['ticket', 'field', 'changed_at'], name='transition_ticket_idx'), models.Index(fields=['organization', 'field', 'from_value', 'changed_at'], name='transition_from_state_idx'), models.Index(fields=['organization', 'field', 'to_value', 'changed_at'], name='transition_to_state_idx'), models.Index(condition=models.Q(('from_user__isnull', False)), fields=['organization', 'from_user', 'changed_at'], name='transition_from_agent_idx'), models.Index(condition=models.Q(('to_user__isnull', False)), fields=['organization', 'to_user', 'changed_at'], name='transition_to_agent_idx')],
+            },
+        ),
+        migrations.RunPython(add_cascade, remove_cascade),
+    ]
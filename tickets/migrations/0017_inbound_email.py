@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_organizations'),
+        ('tickets', '0016_ticket_transitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundEmail',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('message_id', models.CharField(max_length=255)),
+                ('ticket_id', models.UUIDField()),
+                ('comment_id', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('organization', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.organization')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('organization', 'message_id'), name='inbound_org_message_unique'), models.UniqueConstraint(condition=models.Q(('organization__isnull', True)), fields=('message_id',), name='inbound_message_unique_without_org')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def chunk_names(apps, schema_editor):
+    # Sessions in progress stored offsets; their chunks have the default names
+    UploadSession = apps.get_model('tickets', 'UploadSession')
+    for session in UploadSession.objects.iterator():
+        session.chunks = [f'uploads/{session.id}/{offset:020d}' for offset in sorted(session.chunk_offsets)]
+        session.save(update_fields=['chunks'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0017_inbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='chunks',
+            field=models.JSONField(blank=True, default=list, help_text='Storage names of the received chunks, in order'),
+        ),
+        migrations.RunPython(chunk_names, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='chunk_offsets',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0018_upload_chunk_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticketchange',
+            name='event',
+            field=models.CharField(choices=[('timeline', 'Timeline Event'), ('ticket_saved', 'Ticket Saved'), ('ticket_deleted', 'Ticket Deleted'), ('ticket_merged', 'Tickets Merged')], max_length=20),
+        ),
+    ]
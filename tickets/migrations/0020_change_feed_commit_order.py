@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:57
+
+import tickets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0019_ticket_merged_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketchange',
+            name='txid',
+            field=models.BigIntegerField(db_default=tickets.models.CurrentTransactionId(), editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticketchange',
+            index=models.Index(fields=['organization_id', 'txid', 'id'], name='change_org_commit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketchange',
+            index=models.Index(fields=['txid', 'id'], name='change_commit_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_queryset_invalidation'),
+        ('tickets', '0020_change_feed_commit_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailyagentstats',
+            unique_together={('organization', 'date', 'agent')},
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['title'], name='ticket_any_title_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
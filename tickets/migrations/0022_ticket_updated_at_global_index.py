@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_queryset_invalidation'),
+        ('tickets', '0021_tenant_stats_and_title_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['updated_at'], name='ticket_updated_idx'),
+        ),
+    ]
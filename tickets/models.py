@@ -1,9 +1,68 @@
 from django.db import models
+from django.db.models import F, Q
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import storages
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from .calendars import CompiledCalendar, NoBusinessHours
+from collections import defaultdict
 from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import os
+import time
 import uuid
 
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): a 48-bit Unix millisecond
+    timestamp followed by random bits. New keys sort after older ones, so
+    inserts append to the right edge of the primary key index instead of
+    splitting pages all over it.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    # Version 7 in bits 48-51, RFC variant (0b10) in bits 64-65
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
+
+# Marker for tickets loaded with deferred status/priority/assignee fields
+_STATE_UNKNOWN = object()
+
+class SoftDeleteManager(models.Manager):
+    """Default manager for soft-deletable models: hides rows with deleted_at set"""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+class TicketQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Tenant and role-based scoping: superusers see every ticket. Everyone
+        else only sees their organization's tickets, where admins see all of
+        them, agents see tickets assigned to them plus the unassigned queue
+        and users see their own.
+        """
+        if user.is_superuser:
+            return self
+        queryset = self.filter(organization_id=user.organization_id)
+        if user.is_admin:
+            return queryset
+        if user.is_agent:
+            return queryset.filter(Q(assigned_to=user) | Q(assigned_to__isnull=True))
+        return queryset.filter(created_by=user)
+    
+    def held_by(self, agent, start, end):
+        """Tickets assigned to agent at any time between start and end"""
+        ended = TicketTransition.objects.held_by(agent, start, end).values('ticket_id')
+        # A current assignment began before end unless the assignee changed since
+        reassigned = TicketTransition.objects.filter(
+            ticket=models.OuterRef('pk'), field='assigned_to', changed_at__gte=end
+        )
+        return self.filter(
+            Q(pk__in=ended) | Q(assigned_to=agent, created_at__lt=end) & ~models.Exists(reassigned)
+        )
+
 class Ticket(models.Model):
     """
     Main ticket model with SLA tracking and optimistic locking
@@ -22,8 +81,23 @@ class Ticket(models.Model):
         ('critical', 'Critical'),
     ]
     
+    # Statuses that no longer count towards an agent's workload
+    CLOSED_STATUSES = ['resolved', 'closed']
+    
+    # Fields whose changes update agent workload and saved queue caches
+    TRACKED_FIELDS = ('status', 'priority', 'assigned_to_id')
+    
     # Basic fields
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    # Tenant; taken from the creator. Indexed as the leading column of the composite indexes below.
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='tickets',
+        db_index=False
+    )
     title = models.CharField(max_length=200)
     description = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
@@ -47,6 +121,9 @@ class Ticket(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Set when the ticket enters a closed status, cleared if it is reopened
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    
     # SLA tracking
     sla_due_date = models.DateTimeField(null=True, blank=True)
     is_sla_breached = models.BooleanField(default=False)
@@ -54,45 +131,198 @@ class Ticket(models.Model):
     # Optimistic locking
     version = models.IntegerField(default=1)
     
+    # Set when this ticket was closed as a duplicate of another
+    merged_into = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates'
+    )
+    
+    # Soft delete: hidden from the default manager until purged
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = SoftDeleteManager.from_queryset(TicketQuerySet)()
+    all_objects = TicketQuerySet.as_manager()
+    
+    # User making the current change, set by callers before save() and
+    # stored on the transitions it records
+    changed_by = None
+    
     def save(self, *args, **kwargs):
         # Check if this is a new instance (either no pk or created_at is None)
         is_new = self.pk is None or self.created_at is None
         
+        if is_new and self.organization_id is None:
+            self.organization_id = self.created_by.organization_id
+        
         # Calculate SLA due date for new tickets
         if is_new and not self.sla_due_date and self.status == 'open':
-            hours_map = {
-                'critical': 4,
-                'high': 24,
-                'medium': 72,
-                'low': 168,  # 1 week
-            }
-            # Use timezone.now() as the base time for new tickets
-            self.sla_due_date = timezone.now() + timedelta(hours=hours_map[self.priority])
+            self.sla_due_date = SLAConfiguration.objects.due_date(self.priority, timezone.now(), self.organization_id)
+        
+        # Track resolution time for reporting
+        if self.status in self.CLOSED_STATUSES:
+            if not self.resolved_at:
+                self.resolved_at = timezone.now()
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = set(kwargs['update_fields']) | {'resolved_at'}
+        elif self.resolved_at:
+            self.resolved_at = None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'resolved_at'}
         
         # Check SLA breach
-        if self.sla_due_date and timezone.now() > self.sla_due_date and self.status not in ['resolved', 'closed']:
+        if self.sla_due_date and timezone.now() > self.sla_due_date and self.status not in self.CLOSED_STATUSES:
             self.is_sla_breached = True
         
+        previous_state = None if is_new else getattr(self, '_stored_state', None)
         super().save(*args, **kwargs)
+        
+        current_state = self.tracked_state
+        # Deleted tickets no longer count anywhere, whatever their state
+        if previous_state != current_state and self.deleted_at is None:
+            self._tracked_state_changed(previous_state, current_state)
+            # Without the stored state (new or deferred) there is no from-value
+            if previous_state and previous_state is not _STATE_UNKNOWN:
+                TicketTransition.objects.record(self, previous_state, current_state, self.changed_by)
+        self._stored_state = current_state
+        self._stored_text = self._text_snapshot()
+    
+    def delete(self, *args, **kwargs):
+        state = self._current_stored_state()
+        result = super().delete(*args, **kwargs)
+        if self.deleted_at is None:
+            self._tracked_state_changed(state, None)
+        return result
+    
+    def soft_delete(self):
+        """Hide the ticket; purge_deleted_tickets removes the rows later"""
+        if self.deleted_at is not None:
+            return
+        state = self._current_stored_state()
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at', 'updated_at'])
+        self._tracked_state_changed(state, None)
+    
+    def restore(self):
+        if self.deleted_at is None:
+            return
+        self.deleted_at = None
+        self.save(update_fields=['deleted_at', 'updated_at'])
+        self._tracked_state_changed(None, self.tracked_state)
+    
+    def _current_stored_state(self):
+        state = getattr(self, '_stored_state', _STATE_UNKNOWN)
+        if state is _STATE_UNKNOWN:
+            state = self.tracked_state
+        return state
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status/priority/assignee so save() can update
+        # derived data (workload counters, queue caches) without re-reading the row
+        if all(name in instance.__dict__ for name in cls.TRACKED_FIELDS):
+            instance._stored_state = instance.tracked_state
+        else:
+            instance._stored_state = _STATE_UNKNOWN
+        instance._stored_text = instance._text_snapshot()
+        return instance
+    
+    def _text_snapshot(self):
+        # Deferred fields show up as None and are not written by save()
+        return (self.__dict__.get('title'), self.__dict__.get('description'))
+    
+    @property
+    def text_changed(self):
+        """Whether title/description differ from what was loaded or last saved"""
+        stored = getattr(self, '_stored_text', None)
+        return stored is None or stored != self._text_snapshot()
+    
+    @property
+    def tracked_state(self):
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+    
+    @classmethod
+    def _workload_agent_for(cls, state):
+        """Id of the agent a ticket in this state counts against, if any"""
+        if not state or state['status'] in cls.CLOSED_STATUSES:
+            return None
+        return state['assigned_to_id']
+    
+    def _tracked_state_changed(self, previous, current):
+        """
+        Propagate a status/priority/assignee change. previous/current are
+        None for a ticket that did not exist before or no longer exists.
+        """
+        if previous is not _STATE_UNKNOWN:
+            previous_agent_id = self._workload_agent_for(previous)
+            current_agent_id = self._workload_agent_for(current)
+            if previous_agent_id != current_agent_id:
+                AgentWorkload.objects.shift(previous_agent_id, current_agent_id)
+        SavedQueue.objects.invalidate_for_ticket(self.organization_id, previous, current)
     
     def __str__(self):
         return f"#{self.id} - {self.title}"
     
     class Meta:
         ordering = ['-created_at']
+        # Indexes serving tenant queries lead with the organization, so each
+        # tenant's lookups stay within its own slice of the index
         indexes = [
-            models.Index(fields=['status']),
-            models.Index(fields=['priority']),
-            models.Index(fields=['created_by']),
-            models.Index(fields=['assigned_to']),
-            models.Index(fields=['is_sla_breached']),
+            models.Index(fields=['organization', 'status'], name='ticket_org_status_idx'),
+            models.Index(fields=['organization', 'priority'], name='ticket_org_priority_idx'),
+            models.Index(fields=['organization', 'is_sla_breached'], name='ticket_org_breached_idx'),
+            models.Index(fields=['organization', 'updated_at'], name='ticket_org_updated_idx'),
+            # Superusers' row refreshes poll updated_at across all tenants
+            models.Index(fields=['updated_at'], name='ticket_updated_idx'),
+            # One index per visibility scope, matching the list ordering.
+            # Partial, so soft-deleted tickets don't bloat them.
+            models.Index(
+                fields=['organization', '-created_at'],
+                condition=Q(deleted_at__isnull=True),
+                name='ticket_org_active_idx'
+            ),
+            models.Index(
+                fields=['organization', 'created_by', '-created_at'],
+                condition=Q(deleted_at__isnull=True),
+                name='ticket_creator_active_idx'
+            ),
+            models.Index(
+                fields=['organization', 'assigned_to', '-created_at'],
+                condition=Q(deleted_at__isnull=True),
+                name='ticket_assignee_active_idx'
+            ),
+            models.Index(
+                fields=['organization', '-created_at'],
+                condition=Q(assigned_to__isnull=True, deleted_at__isnull=True),
+                name='ticket_unassigned_queue_idx'
+            ),
+            # Date ranges across all tenants, for the stats rollup
+            models.Index(fields=['created_at']),
+            models.Index(fields=['resolved_at']),
+            # Case-sensitive prefix search on the title (admin search), within
+            # an organization and, for superusers, across all of them
+            models.Index(
+                fields=['organization', 'title'],
+                name='ticket_title_prefix_idx',
+                opclasses=['int8_ops', 'varchar_pattern_ops']
+            ),
+            models.Index(fields=['title'], name='ticket_any_title_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # Tombstones only, for the purge
+            models.Index(
+                fields=['deleted_at'],
+                condition=Q(deleted_at__isnull=False),
+                name='ticket_deleted_idx'
+            ),
         ]
 
 class Comment(models.Model):
     """
     Threaded comments for tickets
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
@@ -100,12 +330,64 @@ class Comment(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.ticket.title}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            self._touch_ticket()
+    
+    def _touch_ticket(self):
+        # Lists refreshing on updated_at pick the ticket up again
+        Ticket.all_objects.filter(pk=self.ticket_id).update(updated_at=timezone.now())
+    
+    def soft_delete(self):
+        """Hide the comment and every reply below it"""
+        now = timezone.now()
+        Comment.objects.filter(pk__in=self._thread_ids(Comment.objects)).update(deleted_at=now, updated_at=now)
+        self.deleted_at = now
+        self._touch_ticket()
+        SavedQueue.objects.invalidate_search(self.ticket.organization_id)
+    
+    def restore(self):
+        """Bring back the comment and the replies deleted along with it"""
+        deleted = Comment.all_objects.filter(deleted_at=self.deleted_at)
+        Comment.all_objects.filter(pk__in=self._thread_ids(deleted)).update(deleted_at=None, updated_at=timezone.now())
+        self.deleted_at = None
+        self._touch_ticket()
+        SavedQueue.objects.invalidate_search(self.ticket.organization_id)
+    
+    def _thread_ids(self, queryset):
+        ids = [self.pk]
+        frontier = ids
+        while frontier:
+            frontier = list(queryset.filter(parent_id__in=frontier).values_list('pk', flat=True))
+            ids += frontier
+        return ids
+    
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['ticket', 'created_at'],
+                condition=Q(deleted_at__isnull=True),
+                name='comment_active_ticket_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=Q(deleted_at__isnull=False),
+                name='comment_deleted_idx'
+            ),
+            # Admin changelist order
+            models.Index(fields=['-created_at', '-id'], name='comment_recent_idx'),
+        ]
 
 class Timeline(models.Model):
     """
@@ -118,9 +400,11 @@ class Timeline(models.Model):
         ('assigned', 'Ticket Assigned'),
         ('commented', 'Comment Added'),
         ('priority_changed', 'Priority Changed'),
+        ('attached', 'Attachment Added'),
+        ('merged', 'Tickets Merged'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='timeline')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
@@ -134,21 +418,709 @@ class Timeline(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A ticket's history, newest first
+            models.Index(fields=['ticket', '-created_at'], name='timeline_ticket_recent_idx'),
+            # Admin changelist order
+            models.Index(fields=['-created_at', '-id'], name='timeline_recent_idx'),
+        ]
+
+class TicketTransitionQuerySet(models.QuerySet):
+    def held_by(self, agent, start, end):
+        """Ended assignments of agent that overlap start..end"""
+        return self.filter(
+            organization_id=agent.organization_id, from_user=agent,
+            changed_at__gt=start, entered_at__lt=end
+        )
+    
+    def left(self, organization_id, field, value, start, end):
+        """
+        Changes away from a status or priority value between start and end;
+        their duration is the time spent in it, e.g. aggregate(Avg('duration'))
+        """
+        return self.filter(
+            organization_id=organization_id, field=field, from_value=value,
+            changed_at__gte=start, changed_at__lt=end
+        )
+
+class TicketTransitionManager(models.Manager.from_queryset(TicketTransitionQuerySet)):
+    def record(self, ticket, previous, current, changed_by=None):
+        """Store one transition per field that differs between two tracked states"""
+        fields = [
+            field for field, key in TicketTransition.STATE_KEYS.items() if previous[key] != current[key]
+        ]
+        if not fields:
+            return []
+        # Each from-state began at the field's previous transition, or at creation
+        entered = dict(
+            self.filter(ticket=ticket, field__in=fields).order_by()
+            .values('field').annotate(last=models.Max('changed_at')).values_list('field', 'last')
+        )
+        now = timezone.now()
+        transitions = []
+        for field in fields:
+            key = TicketTransition.STATE_KEYS[field]
+            entered_at = entered.get(field) or ticket.created_at
+            transition = TicketTransition(
+                ticket=ticket,
+                organization_id=ticket.organization_id,
+                field=field,
+                changed_by_id=getattr(changed_by, 'pk', None),
+                entered_at=entered_at,
+                changed_at=now,
+                duration=now - entered_at,
+            )
+            if field == 'assigned_to':
+                transition.from_user_id, transition.to_user_id = previous[key], current[key]
+            else:
+                transition.from_value, transition.to_value = previous[key], current[key]
+            transitions.append(transition)
+        return self.bulk_create(transitions)
+
+class TicketTransition(models.Model):
+    """
+    Structured status/priority/assignee history: one row per change of a
+    field, with the time the ticket spent in the state it left. Assignees
+    are stored as user ids, so per-agent and per-state history can be
+    queried by index instead of parsing Timeline metadata.
+    """
+    FIELD_CHOICES = [
+        ('status', 'Status'),
+        ('priority', 'Priority'),
+        ('assigned_to', 'Assignee'),
+    ]
+    # Field -> key in Ticket.tracked_state
+    STATE_KEYS = {'status': 'status', 'priority': 'priority', 'assigned_to': 'assigned_to_id'}
+
+    id = models.BigAutoField(primary_key=True)
+    # Indexed by transition_ticket_idx
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='transitions', db_index=False)
+    # Ticket's tenant, copied so the indexes below can lead with it
+    organization = models.ForeignKey(
+        'accounts.Organization', on_delete=models.CASCADE, null=True, blank=True, db_index=False
+    )
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    # Status and priority changes
+    from_value = models.CharField(max_length=20, null=True, blank=True)
+    to_value = models.CharField(max_length=20, null=True, blank=True)
+    # Assignee changes; null is unassigned
+    from_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', db_index=False
+    )
+    to_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', db_index=False
+    )
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', db_index=False
+    )
+
+    # The from-state lasted from entered_at until changed_at
+    entered_at = models.DateTimeField()
+    changed_at = models.DateTimeField(default=timezone.now)
+    duration = models.DurationField()
+
+    objects = TicketTransitionManager()
+
+    def __str__(self):
+        if self.field == 'assigned_to':
+            return f"{self.ticket_id} assigned_to {self.from_user_id} -> {self.to_user_id}"
+        return f"{self.ticket_id} {self.field} {self.from_value} -> {self.to_value}"
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [
+            # A ticket's history per field; also finds where each state began
+            models.Index(fields=['ticket', 'field', 'changed_at'], name='transition_ticket_idx'),
+            # Time spent in a status or priority, by when it was left
+            models.Index(
+                fields=['organization', 'field', 'from_value', 'changed_at'],
+                name='transition_from_state_idx'
+            ),
+            # Tickets entering a status or priority
+            models.Index(
+                fields=['organization', 'field', 'to_value', 'changed_at'],
+                name='transition_to_state_idx'
+            ),
+            # An agent's holds, by when they ended or began
+            models.Index(
+                fields=['organization', 'from_user', 'changed_at'],
+                condition=Q(from_user__isnull=False),
+                name='transition_from_agent_idx'
+            ),
+            models.Index(
+                fields=['organization', 'to_user', 'changed_at'],
+                condition=Q(to_user__isnull=False),
+                name='transition_to_agent_idx'
+            ),
+        ]
+
+# Compiled calendars per process: {calendar pk: (revision, CompiledCalendar)}
+_compiled_calendars = {}
+
+class BusinessCalendar(models.Model):
+    """
+    Working hours and holidays that SLA clocks run on. Any change to the
+    calendar or its hours and holidays bumps revision, which tells every
+    process to recompile it.
+    """
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='business_calendars'
+    )
+    name = models.CharField(max_length=100)
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE, help_text="IANA time zone, e.g. Europe/London")
+    revision = models.PositiveIntegerField(default=0, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        try:
+            ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({'timezone': f'Unknown time zone "{self.timezone}".'})
+    
+    def save(self, *args, **kwargs):
+        self.revision += 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'revision'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def touch(cls, pk):
+        cls.objects.filter(pk=pk).update(revision=F('revision') + 1, updated_at=timezone.now())
+    
+    def compiled(self):
+        """The calendar's business-time index, compiled once per revision"""
+        cached = _compiled_calendars.get(self.pk)
+        if cached is not None and cached[0] == self.revision:
+            return cached[1]
+        weekly_hours = defaultdict(list)
+        for hours in self.hours.all():
+            weekly_hours[hours.weekday].append((hours.start_time, hours.end_time))
+        holidays = self.holidays.values_list('date', flat=True)
+        compiled = CompiledCalendar(self.timezone, weekly_hours, holidays)
+        _compiled_calendars[self.pk] = (self.revision, compiled)
+        return compiled
+    
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'name'], name='calendar_org_name_unique'),
+            models.UniqueConstraint(
+                fields=['name'], condition=Q(organization__isnull=True), name='calendar_name_unique_without_org'
+            ),
+        ]
+
+class BusinessHours(models.Model):
+    """
+    Opening hours of a calendar on one weekday. A day may have several
+    spans, e.g. around a lunch break.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    calendar = models.ForeignKey(BusinessCalendar, on_delete=models.CASCADE, related_name='hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField(help_text="00:00 closes at midnight")
+    
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+    
+    def clean(self):
+        closes_at_midnight = (self.end_time.hour, self.end_time.minute, self.end_time.second) == (0, 0, 0)
+        if self.end_time <= self.start_time and not closes_at_midnight:
+            raise ValidationError({'end_time': 'Closing time must be after the opening time.'})
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        BusinessCalendar.touch(self.calendar_id)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        BusinessCalendar.touch(self.calendar_id)
+        return result
+    
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        verbose_name_plural = "Business hours"
+
+class Holiday(models.Model):
+    """A date with no business hours in a calendar"""
+    calendar = models.ForeignKey(BusinessCalendar, on_delete=models.CASCADE, related_name='holidays')
+    date = models.DateField()
+    name = models.CharField(max_length=100, blank=True)
+    
+    def __str__(self):
+        return f"{self.date} {self.name}".strip()
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        BusinessCalendar.touch(self.calendar_id)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        BusinessCalendar.touch(self.calendar_id)
+        return result
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'date'], name='holiday_calendar_date_unique'),
+        ]
+
+class SLAConfigurationManager(models.Manager):
+    def due_date(self, priority, start, organization_id):
+        """Resolution due date of an organization's ticket with this priority opened at start"""
+        config = self.select_related('calendar').filter(organization_id=organization_id, priority=priority).first()
+        return (config or SLAConfiguration.default(priority)).resolution_due(start)
 
 class SLAConfiguration(models.Model):
     """
-    SLA configuration for different priorities
+    SLA configuration for different priorities. Hours count on the calendar
+    when one is set, around the clock otherwise (and when the calendar has
+    no open time left).
     """
-    priority = models.CharField(max_length=10, choices=Ticket.PRIORITY_CHOICES, unique=True)
+    # Used for priorities without a configuration
+    DEFAULT_RESOLUTION_HOURS = {
+        'critical': 4,
+        'high': 24,
+        'medium': 72,
+        'low': 168,  # 1 week
+    }
+    
+    organization = models.ForeignKey(
+        'accounts.Organization',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='sla_configurations'
+    )
+    priority = models.CharField(max_length=10, choices=Ticket.PRIORITY_CHOICES)
     response_hours = models.IntegerField(help_text="Hours for initial response")
     resolution_hours = models.IntegerField(help_text="Hours for resolution")
+    calendar = models.ForeignKey(
+        BusinessCalendar,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sla_configurations',
+        help_text="Business hours the SLA clock runs on; empty for 24/7"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = SLAConfigurationManager()
+    
     def __str__(self):
         return f"SLA for {self.get_priority_display()}"
     
+    @classmethod
+    def default(cls, priority):
+        """Unsaved around-the-clock configuration for a priority nobody configured"""
+        return cls(priority=priority, response_hours=0, resolution_hours=cls.DEFAULT_RESOLUTION_HOURS[priority])
+    
+    def resolution_due(self, start):
+        duration = timedelta(hours=self.resolution_hours)
+        if self.calendar is None:
+            return start + duration
+        try:
+            return self.calendar.compiled().add(start, duration)
+        except NoBusinessHours:
+            # A calendar closed for good must not block ticket creation
+            return start + duration
+    
     class Meta:
         verbose_name = "SLA Configuration"
         verbose_name_plural = "SLA Configurations"
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'priority'], name='sla_org_priority_unique'),
+            models.UniqueConstraint(
+                fields=['priority'], condition=Q(organization__isnull=True), name='sla_priority_unique_without_org'
+            ),
+        ]
+
+
+class AgentWorkloadManager(models.Manager):
+    def shift(self, from_agent_id, to_agent_id):
+        """Move one open ticket from one agent's counter to another's"""
+        if from_agent_id:
+            self.filter(agent_id=from_agent_id, open_tickets__gt=0).update(
+                open_tickets=F('open_tickets') - 1
+            )
+        if to_agent_id:
+            updated = self.filter(agent_id=to_agent_id).update(open_tickets=F('open_tickets') + 1)
+            if not updated:
+                _, created = self.get_or_create(agent_id=to_agent_id, defaults={'open_tickets': 1})
+                if not created:
+                    self.filter(agent_id=to_agent_id).update(open_tickets=F('open_tickets') + 1)
+
+class AgentWorkload(models.Model):
+    """
+    Maintained per-agent count of open tickets used by the assignment engine.
+    Ticket.save() keeps it current; code that changes status or assignee
+    with queryset updates or bulk writes must call
+    AgentWorkload.objects.shift() itself or run rebuild_agent_workload.
+    """
+    agent = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='workload'
+    )
+    open_tickets = models.PositiveIntegerField(default=0)
+    last_assigned_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = AgentWorkloadManager()
+    
+    def __str__(self):
+        return f"{self.agent.username}: {self.open_tickets} open"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['open_tickets', 'last_assigned_at']),
+        ]
+
+
+class DailyTicketStats(models.Model):
+    """
+    Per-day, per-priority ticket rollup maintained by the rollup_ticket_stats command
+    """
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+    priority = models.CharField(max_length=10, choices=Ticket.PRIORITY_CHOICES)
+    created_count = models.PositiveIntegerField(default=0)
+    resolved_count = models.PositiveIntegerField(default=0)
+    breached_count = models.PositiveIntegerField(default=0, help_text="Resolved after the SLA due date")
+    resolution_seconds = models.BigIntegerField(default=0, help_text="Total time to resolve for resolved tickets")
+    
+    def __str__(self):
+        return f"{self.date} {self.priority}"
+    
+    class Meta:
+        ordering = ['date', 'priority']
+        unique_together = ['organization', 'date', 'priority']
+        verbose_name_plural = "Daily ticket stats"
+
+class DailyAgentStats(models.Model):
+    """
+    Per-day, per-agent resolution rollup maintained by the rollup_ticket_stats command
+    """
+    organization = models.ForeignKey('accounts.Organization', on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+    agent = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_stats')
+    resolved_count = models.PositiveIntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.date} {self.agent.username}"
+    
+    class Meta:
+        ordering = ['date']
+        # An agent who changed organizations has a row in each on that day
+        unique_together = ['organization', 'date', 'agent']
+        indexes = [
+            models.Index(fields=['organization', 'date'], name='agentstats_org_date_idx'),
+        ]
+        verbose_name_plural = "Daily agent stats"
+
+
+class SavedQueueManager(models.Manager):
+    def for_user(self, user):
+        """The user's own queues plus those shared within their organization"""
+        return self.filter(Q(owner=user) | Q(shared=True, owner__organization_id=user.organization_id))
+    
+    def definitions(self, organization_id):
+        """(pk, filters) for an organization's queues, cached until one of them is saved or deleted"""
+        key = SavedQueue.definitions_key(organization_id)
+        definitions = cache.get(key)
+        if definitions is None:
+            definitions = list(self.filter(owner__organization_id=organization_id).values_list('pk', 'filters'))
+            cache.set(key, definitions, None)
+        return definitions
+    
+    def invalidate_for_ticket(self, organization_id, previous, current):
+        """
+        Drop cached results of the organization's queues a ticket entered
+        or left. previous/current are tracked ticket states, None or unknown.
+        """
+        for pk, filters in self.definitions(organization_id):
+            if any(SavedQueue.filters_match(filters, state) for state in (previous, current)):
+                self.invalidate(pk)
+    
+    def invalidate_search(self, organization_id):
+        """
+        Drop cached results of the organization's queues with a search
+        filter, after ticket or comment text they may match has changed
+        """
+        for pk, filters in self.definitions(organization_id):
+            if filters.get('search'):
+                self.invalidate(pk)
+    
+    def invalidate(self, pk):
+        key = SavedQueue.generation_key(pk)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+class SavedQueue(models.Model):
+    """
+    Saved ticket filter shown as a queue, private to its owner or shared
+    with the owner's organization. Counts and membership are cached per viewer and
+    invalidated when a matching ticket changes, or for search queues, when
+    ticket or comment text changes.
+    """
+    FILTER_KEYS = ['status', 'priority', 'assigned_to', 'search']
+    
+    name = models.CharField(max_length=100)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_queues')
+    shared = models.BooleanField(default=False, help_text='Visible to everyone in the organization, not just the owner')
+    filters = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Ticket list filters: status, priority, assigned_to (user id, "me" or "none"), search'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = SavedQueueManager()
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(self.definitions_key(self.owner.organization_id))
+        SavedQueue.objects.invalidate(self.pk)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete(self.definitions_key(self.owner.organization_id))
+        return result
+    
+    @staticmethod
+    def generation_key(pk):
+        return f'queue_generation:{pk}'
+    
+    @staticmethod
+    def definitions_key(organization_id):
+        return f'saved_queue_definitions:{organization_id}'
+    
+    @staticmethod
+    def filters_match(filters, state):
+        """Whether a ticket in this tracked state may belong to a queue with these filters"""
+        if state is None:
+            return False
+        if state is _STATE_UNKNOWN or filters.get('search'):
+            # Search also matches comment text, so it can't be decided here
+            return True
+        if filters.get('status') and filters['status'] != state['status']:
+            return False
+        if filters.get('priority') and filters['priority'] != state['priority']:
+            return False
+        assigned_to = str(filters.get('assigned_to') or '')
+        if assigned_to == 'none':
+            return state['assigned_to_id'] is None
+        if assigned_to == 'me':
+            return state['assigned_to_id'] is not None
+        if assigned_to:
+            return str(state['assigned_to_id']) == assigned_to
+        return True
+    
+    class Meta:
+        ordering = ['name']
+
+
+def attachment_storage():
+    """Storage backend for attachments, configured as STORAGES['attachments']"""
+    return storages['attachments']
+
+class AttachmentBlob(models.Model):
+    """
+    Attachment contents, stored once per distinct SHA-256 and shared by
+    every Attachment with identical content
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(storage=attachment_storage, max_length=255)
+    size = models.BigIntegerField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.sha256
+
+class Attachment(models.Model):
+    """
+    File attached to a ticket, optionally via one of its comments
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='attachments')
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='attachments'
+    )
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, related_name='attachments')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.filename
+    
+    class Meta:
+        ordering = ['created_at']
+
+class UploadSession(models.Model):
+    """
+    In-progress chunked upload. Chunks live in the attachments storage
+    until the last one arrives and the Attachment is created.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='upload_sessions')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    size = models.BigIntegerField(help_text="Total size of the file in bytes")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received so far")
+    chunks = models.JSONField(default=list, blank=True, help_text="Storage names of the received chunks, in order")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+    
+    def chunk_name(self, offset):
+        """Name asked of the storage for the chunk at offset; see chunks for the name it got"""
+        return f'uploads/{self.id}/{offset:020d}'
+
+
+class TicketFingerprint(models.Model):
+    """
+    MinHash signature of a ticket's text, maintained by tickets.similarity
+    """
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    signature = models.JSONField()
+    
+    def __str__(self):
+        return f"Fingerprint of {self.ticket_id}"
+
+class TicketSimilarityBand(models.Model):
+    """
+    LSH bucket of one band of a ticket's MinHash signature; tickets sharing
+    a bucket are similarity candidates
+    """
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='similarity_bands')
+    bucket = models.BigIntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['bucket', 'ticket']),
+        ]
+
+
+class CurrentTransactionId(models.Func):
+    """
+    Id of the transaction writing the row on PostgreSQL (13+), NULL on
+    databases that commit one writer at a time
+    """
+    template = 'NULL'
+    output_field = models.BigIntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return 'pg_current_xact_id()::text::bigint', []
+
+
+class TicketChange(models.Model):
+    """
+    Append-only change feed for incremental sync: one row per timeline
+    event, ticket save, ticket deletion or merge. A merge row lists the
+    comments, timeline entries and attachments that moved between the two
+    tickets. Rows are read in commit-safe order: by (txid, id) on
+    PostgreSQL, by id where writers commit one at a time.
+    """
+    EVENT_CHOICES = [
+        ('timeline', 'Timeline Event'),
+        ('ticket_saved', 'Ticket Saved'),
+        ('ticket_deleted', 'Ticket Deleted'),
+        ('ticket_merged', 'Tickets Merged'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    # Plain values rather than foreign keys: events outlive deleted tickets
+    ticket_id = models.UUIDField(db_index=True)
+    organization_id = models.BigIntegerField(null=True, blank=True)
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Writing transaction, set by the database
+    txid = models.BigIntegerField(null=True, editable=False, db_default=CurrentTransactionId())
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"#{self.id} {self.event} {self.ticket_id}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # An organization's feed, in cursor order
+            models.Index(fields=['organization_id', 'id'], name='change_org_cursor_idx'),
+            models.Index(fields=['organization_id', 'txid', 'id'], name='change_org_commit_idx'),
+            models.Index(fields=['txid', 'id'], name='change_commit_idx'),
+        ]
+
+
+class InboundEmail(models.Model):
+    """
+    Message-ID of every ingested email: a redelivered message is skipped,
+    and a reply (In-Reply-To/References) is added to the ticket its parent
+    message created or commented on.
+    """
+    id = models.BigAutoField(primary_key=True)
+    organization = models.ForeignKey(
+        'accounts.Organization', on_delete=models.CASCADE, null=True, blank=True, db_index=False
+    )
+    message_id = models.CharField(max_length=255)
+    # Plain values rather than foreign keys: dedup outlives purged tickets
+    ticket_id = models.UUIDField()
+    comment_id = models.UUIDField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return self.message_id
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'message_id'], name='inbound_org_message_unique'),
+            models.UniqueConstraint(
+                fields=['message_id'], condition=Q(organization__isnull=True),
+                name='inbound_message_unique_without_org'
+            ),
+        ]
@@ -0,0 +1,21 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import orjson
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    JSON parser backed by orjson when it is installed
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding).encode('utf-8')
+            return orjson.loads(data)
+        except (ValueError, UnicodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,8 @@
+from rest_framework.permissions import BasePermission
+
+class IsAgent(BasePermission):
+    """
+    Allow access only to agents and admins
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_agent)
@@ -0,0 +1,90 @@
+"""
+Batch hard-deletion of soft-deleted tickets and comments.
+
+Django's delete() fetches every related row into Python to cascade it,
+which is slow and holds locks for the whole walk on big tickets. The purge
+instead issues plain DELETE statements one batch at a time, each in its own
+short transaction. On PostgreSQL the foreign keys cascade in the database
+(see migrations 0011 and 0016), so one statement per batch removes the
+tickets with their comments, timeline, transitions and attachments. Other databases get the children
+deleted explicitly, bottom-up, also without loading any rows.
+"""
+from django.db import connection, transaction
+from .attachments import discard_upload
+from .models import (
+    Attachment, AttachmentBlob, Comment, Ticket, TicketChange, TicketFingerprint,
+    TicketSimilarityBand, TicketTransition, Timeline, UploadSession, attachment_storage
+)
+
+def _raw_delete(queryset):
+    # Single DELETE ... WHERE, skipping the collector and delete signals
+    return queryset._raw_delete(queryset.db)
+
+def _database_cascades():
+    return connection.vendor == 'postgresql'
+
+def purge_tickets(before, batch_size=500):
+    """Hard-delete tickets soft-deleted before the given time. Returns the count."""
+    purged = 0
+    while True:
+        organizations = dict(
+            Ticket.all_objects.filter(deleted_at__lt=before)
+            .order_by('deleted_at').values_list('pk', 'organization_id')[:batch_size]
+        )
+        if not organizations:
+            return purged
+        ids = list(organizations)
+        # Chunks live in storage, so unfinished uploads are discarded first
+        for session in UploadSession.objects.filter(ticket_id__in=ids):
+            discard_upload(session)
+        with transaction.atomic():
+            if not _database_cascades():
+                Ticket.all_objects.filter(merged_into__in=ids).update(merged_into=None)
+                for model in (Attachment, TicketSimilarityBand, TicketFingerprint, TicketTransition, Timeline):
+                    _raw_delete(model.objects.filter(ticket_id__in=ids))
+                _raw_delete(Comment.all_objects.filter(ticket_id__in=ids))
+            _raw_delete(Ticket.all_objects.filter(pk__in=ids))
+            TicketChange.objects.bulk_create([
+                TicketChange(ticket_id=pk, organization_id=organizations[pk], event='ticket_deleted')
+                for pk in ids
+            ])
+        purged += len(ids)
+
+def purge_comments(before, batch_size=500):
+    """Hard-delete comments (with their replies) soft-deleted before the given time"""
+    purged = 0
+    while True:
+        ids = list(
+            Comment.all_objects.filter(deleted_at__lt=before)
+            .order_by('deleted_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        # Replies are soft-deleted together with their parent, but a reply
+        # added afterwards would still point at it
+        ids = set(ids)
+        frontier = ids
+        while frontier:
+            frontier = set(
+                Comment.all_objects.filter(parent_id__in=frontier).values_list('pk', flat=True)
+            ) - ids
+            ids |= frontier
+        for session in UploadSession.objects.filter(comment_id__in=ids):
+            discard_upload(session)
+        with transaction.atomic():
+            if not _database_cascades():
+                _raw_delete(Attachment.objects.filter(comment_id__in=ids))
+            _raw_delete(Comment.all_objects.filter(pk__in=ids))
+        purged += len(ids)
+
+def purge_orphan_blobs(batch_size=500):
+    """Delete stored attachment content no attachment refers to anymore"""
+    storage = attachment_storage()
+    purged = 0
+    for blob in AttachmentBlob.objects.filter(attachments=None).iterator(chunk_size=batch_size):
+        # Re-check in the delete itself: an upload may have just reused it
+        deleted, _ = AttachmentBlob.objects.filter(pk=blob.pk, attachments=None).delete()
+        if deleted:
+            storage.delete(blob.file.name)
+            purged += 1
+    return purged
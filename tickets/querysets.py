@@ -0,0 +1,68 @@
+"""
+Ticket list filtering and queryset shaping shared by the API, the HTML
+views and saved queues
+"""
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Substr
+from .models import Comment
+
+def filter_tickets(queryset, params, user):
+    """
+    Apply the ticket list filters (search, status, priority, assigned_to)
+    from a query-parameter-like mapping
+    """
+    # Search functionality
+    search = params.get('search')
+    if search:
+        queryset = queryset.filter(
+            Q(title__icontains=search) |
+            Q(description__icontains=search) |
+            Q(comments__content__icontains=search, comments__deleted_at__isnull=True)
+        ).distinct()
+    
+    # Filter by status
+    status = params.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    # Filter by priority
+    priority = params.get('priority')
+    if priority:
+        queryset = queryset.filter(priority=priority)
+    
+    # Filter by assigned user: a user id, "me" or "none"
+    assigned_to = params.get('assigned_to')
+    if assigned_to == 'none':
+        queryset = queryset.filter(assigned_to__isnull=True)
+    elif assigned_to == 'me':
+        queryset = queryset.filter(assigned_to=user)
+    elif assigned_to:
+        # Not an id: matches nothing rather than failing the whole list
+        if not str(assigned_to).isdigit():
+            return queryset.none()
+        queryset = queryset.filter(assigned_to_id=assigned_to)
+    
+    return queryset
+
+def shape_ticket_queryset(queryset, fields):
+    """Only join, load and annotate what the requested serializer fields need"""
+    related = [name for name in ('created_by', 'assigned_to') if name in fields]
+    if related:
+        queryset = queryset.select_related(*related)
+    if 'description' not in fields:
+        queryset = queryset.defer('description')
+    
+    comments = Comment.objects.filter(ticket=OuterRef('pk')).order_by()
+    if 'comments_count' in fields:
+        queryset = queryset.annotate(num_comments=Coalesce(
+            Subquery(comments.values('ticket').annotate(total=Count('id')).values('total')),
+            0
+        ))
+    if 'latest_comment' in fields:
+        latest = comments.order_by('-created_at')
+        queryset = queryset.annotate(
+            latest_comment_content=Subquery(latest.values(snippet=Substr('content', 1, 101))[:1]),
+            latest_comment_author=Subquery(latest.values('author__username')[:1]),
+            latest_comment_at=Subquery(latest.values('created_at')[:1]),
+        )
+    return queryset
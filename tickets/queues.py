@@ -0,0 +1,64 @@
+"""
+Saved queue results, cached per viewer.
+
+Entries are keyed by the queue's generation counter, which
+SavedQueueManager.invalidate_for_ticket() bumps whenever a ticket enters
+or leaves the queue, so only the affected queues are recomputed. Queues
+with a search filter also match on text, so the receivers below bump them
+when a ticket's title or description or any comment changes. The cached
+list of an organization's queue definitions is dropped when a queue owner
+moves to another organization.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from accounts.models import User
+from accounts.signals import organizations_changed
+from .models import Comment, SavedQueue, Ticket
+from .querysets import filter_tickets
+
+def queue_queryset(queue, user):
+    """Live queryset for a queue as seen by user"""
+    queryset = filter_tickets(Ticket.objects.visible_to(user), queue.filters, user)
+    return queryset.order_by('-created_at')
+
+def get_membership(queue, user):
+    """
+    {'count': total, 'ids': [ticket ids in list order]} for the queue as
+    seen by user. ids is None for queues larger than QUEUE_MEMBERSHIP_LIMIT,
+    which are paged from the live queryset instead.
+    """
+    generation = cache.get(SavedQueue.generation_key(queue.pk), 0)
+    key = f'queue:{queue.pk}:{generation}:{user.organization_id}:{user.pk}:{user.role}'
+    membership = cache.get(key)
+    if membership is None:
+        limit = settings.QUEUE_MEMBERSHIP_LIMIT
+        ids = list(queue_queryset(queue, user).values_list('pk', flat=True)[:limit + 1])
+        if len(ids) > limit:
+            membership = {'count': queue_queryset(queue, user).count(), 'ids': None}
+        else:
+            membership = {'count': len(ids), 'ids': ids}
+        cache.set(key, membership, settings.QUEUE_CACHE_TIMEOUT)
+    return membership
+
+@receiver(post_save, sender=Ticket)
+def invalidate_search_on_ticket_text(sender, instance, created, raw, **kwargs):
+    # New tickets already invalidate every queue they may match
+    if raw or created or not instance.text_changed:
+        return
+    SavedQueue.objects.invalidate_search(instance.organization_id)
+
+@receiver(post_save, sender=Comment)
+def invalidate_search_on_comment(sender, instance, raw, **kwargs):
+    # Comment.soft_delete()/restore() invalidate for themselves; hard deletes
+    # only purge comments that were already hidden
+    if raw:
+        return
+    SavedQueue.objects.invalidate_search(instance.ticket.organization_id)
+
+@receiver(organizations_changed, sender=User)
+def move_queue_definitions(sender, user_ids, organization_ids, **kwargs):
+    # The users' queues now belong to another organization's definitions
+    if SavedQueue.objects.filter(owner_id__in=user_ids).exists():
+        cache.delete_many([SavedQueue.definitions_key(pk) for pk in organization_ids])
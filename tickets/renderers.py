@@ -0,0 +1,68 @@
+import csv
+import io
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer backed by orjson when it is installed, falling back to
+    the stock DRF renderer otherwise or when indented output is requested
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            # Datetimes go through DRF's encoder, so they match serializer fields ('Z', not '+00:00')
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line. Streaming views yield the
+    lines themselves; this covers regular responses such as errors.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(FastJSONRenderer().render(row) + b'\n' for row in rows)
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Render a list of flat dicts as CSV, one row per item
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b''
+
+        fieldnames = []
+        for row in rows:
+            for key in row:
+                if key not in fieldnames:
+                    fieldnames.append(key)
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
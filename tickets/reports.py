@@ -0,0 +1,161 @@
+"""
+Time-bucketed ticket metrics.
+
+Reports read only from the DailyTicketStats/DailyAgentStats rollup tables;
+rollup_stats() refreshes those tables from the tickets table and is run
+incrementally by the rollup_ticket_stats management command. Rows are kept
+per organization and reports only read the viewer's, except for
+superusers, who get totals across all of them.
+"""
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Ticket, DailyTicketStats, DailyAgentStats
+
+def _day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+def _seconds(duration):
+    return int(duration.total_seconds()) if duration else 0
+
+def rollup_stats(start, end):
+    """
+    Recompute the rollup rows for every day in [start, end] with one
+    grouped query per metric, replacing whatever was stored for those days.
+    """
+    start_dt, end_dt = _day_bounds(start, end)
+    resolution_time = ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())
+
+    ticket_rows = {}
+
+    def row(organization_id, day, priority):
+        key = (organization_id, day, priority)
+        if key not in ticket_rows:
+            ticket_rows[key] = DailyTicketStats(organization_id=organization_id, date=day, priority=priority)
+        return ticket_rows[key]
+
+    created = (
+        Ticket.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt)
+        .annotate(day=TruncDate('created_at'))
+        .values('organization', 'day', 'priority')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for item in created:
+        row(item['organization'], item['day'], item['priority']).created_count = item['total']
+
+    resolved_tickets = Ticket.objects.filter(resolved_at__gte=start_dt, resolved_at__lt=end_dt)
+    resolved = (
+        resolved_tickets.annotate(day=TruncDate('resolved_at'))
+        .values('organization', 'day', 'priority')
+        .annotate(
+            total=Count('id'),
+            breached=Count('id', filter=Q(sla_due_date__lt=F('resolved_at'))),
+            duration=Sum(resolution_time),
+        )
+        .order_by()
+    )
+    for item in resolved:
+        stats = row(item['organization'], item['day'], item['priority'])
+        stats.resolved_count = item['total']
+        stats.breached_count = item['breached']
+        stats.resolution_seconds = _seconds(item['duration'])
+
+    agent_rows = [
+        DailyAgentStats(
+            organization_id=item['organization'],
+            date=item['day'],
+            agent_id=item['assigned_to'],
+            resolved_count=item['total'],
+            resolution_seconds=_seconds(item['duration']),
+        )
+        for item in resolved_tickets.exclude(assigned_to=None)
+        .annotate(day=TruncDate('resolved_at'))
+        .values('organization', 'day', 'assigned_to')
+        .annotate(total=Count('id'), duration=Sum(resolution_time))
+        .order_by()
+    ]
+
+    with transaction.atomic():
+        DailyTicketStats.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyAgentStats.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyTicketStats.objects.bulk_create(ticket_rows.values())
+        DailyAgentStats.objects.bulk_create(agent_rows)
+
+    return len(ticket_rows), len(agent_rows)
+
+def _stats_for(model, user, start, end):
+    stats = model.objects.filter(date__gte=start, date__lte=end)
+    if not user.is_superuser:
+        stats = stats.filter(organization_id=user.organization_id)
+    return stats
+
+def _hours(seconds, count):
+    return round(seconds / count / 3600, 2) if count else None
+
+def volume_report(user, start, end):
+    """Tickets created and resolved per day"""
+    rows = (
+        _stats_for(DailyTicketStats, user, start, end)
+        .values('date')
+        .annotate(created=Sum('created_count'), resolved=Sum('resolved_count'))
+        .order_by('date')
+    )
+    return [
+        {'date': item['date'].isoformat(), 'created': item['created'], 'resolved': item['resolved']}
+        for item in rows
+    ]
+
+def resolution_report(user, start, end):
+    """Mean time to resolve and SLA breach rate per priority"""
+    rows = (
+        _stats_for(DailyTicketStats, user, start, end)
+        .values('priority')
+        .annotate(
+            resolved=Sum('resolved_count'),
+            breached=Sum('breached_count'),
+            seconds=Sum('resolution_seconds'),
+        )
+    )
+    by_priority = {item['priority']: item for item in rows}
+    report = []
+    for priority, _ in Ticket.PRIORITY_CHOICES:
+        item = by_priority.get(priority, {'resolved': 0, 'breached': 0, 'seconds': 0})
+        report.append({
+            'priority': priority,
+            'resolved': item['resolved'],
+            'mttr_hours': _hours(item['seconds'], item['resolved']),
+            'breached': item['breached'],
+            'breach_rate': round(item['breached'] / item['resolved'], 4) if item['resolved'] else None,
+        })
+    return report
+
+def agent_report(user, start, end):
+    """Resolved tickets and mean time to resolve per agent"""
+    rows = (
+        _stats_for(DailyAgentStats, user, start, end)
+        .values('agent_id', 'agent__username')
+        .annotate(resolved=Sum('resolved_count'), seconds=Sum('resolution_seconds'))
+        .order_by('-resolved', 'agent__username')
+    )
+    return [
+        {
+            'agent_id': item['agent_id'],
+            'agent': item['agent__username'],
+            'resolved': item['resolved'],
+            'mttr_hours': _hours(item['seconds'], item['resolved']),
+        }
+        for item in rows
+    ]
+
+REPORTS = {
+    'volume': volume_report,
+    'resolution': resolution_report,
+    'agents': agent_report,
+}
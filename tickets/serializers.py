@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Ticket, Comment, Timeline
+from .models import Ticket, Comment, Timeline, SavedQueue, Attachment, UploadSession
+from .queues import get_membership
 from accounts.models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -37,31 +40,57 @@ class TicketSerializer(serializers.ModelSerializer):
     comments_count = serializers.SerializerMethodField()
     latest_comment = serializers.SerializerMethodField()
     
+    # Default representation for list responses; the remaining fields are
+    # only serialized (and queried) when requested with ?fields= or ?expand=
+    LIST_FIELDS = [
+        'id', 'title', 'status', 'priority', 'created_at', 'updated_at',
+        'sla_due_date', 'is_sla_breached', 'version', 'comments_count'
+    ]
+    
     class Meta:
         model = Ticket
         fields = [
             'id', 'title', 'description', 'status', 'priority',
             'created_by', 'assigned_to', 'assigned_to_id',
             'created_at', 'updated_at', 'sla_due_date', 'is_sla_breached',
-            'version', 'comments_count', 'latest_comment'
+            'version', 'comments_count', 'latest_comment', 'merged_into'
         ]
         read_only_fields = [
             'id', 'created_by', 'created_at', 'updated_at', 
-            'is_sla_breached', 'comments_count', 'latest_comment'
+            'is_sla_breached', 'comments_count', 'latest_comment', 'merged_into'
         ]
     
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset: only keep the named fields
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
     def get_comments_count(self, obj):
+        if hasattr(obj, 'num_comments'):
+            return obj.num_comments
         return obj.comments.count()
     
     def get_latest_comment(self, obj):
-        latest = obj.comments.order_by('-created_at').first()
-        if latest:
-            return {
-                'content': latest.content[:100] + '...' if len(latest.content) > 100 else latest.content,
-                'author': latest.author.username,
-                'created_at': latest.created_at
-            }
-        return None
+        if hasattr(obj, 'latest_comment_at'):
+            # Annotated by TicketViewSet.get_queryset
+            if obj.latest_comment_at is None:
+                return None
+            content, author, created_at = (
+                obj.latest_comment_content, obj.latest_comment_author, obj.latest_comment_at
+            )
+        else:
+            latest = obj.comments.select_related('author').order_by('-created_at').first()
+            if not latest:
+                return None
+            content, author, created_at = latest.content, latest.author.username, latest.created_at
+        return {
+            'content': content[:100] + '...' if len(content) > 100 else content,
+            'author': author,
+            'created_at': created_at
+        }
     
     def update(self, instance, validated_data):
         # Handle assigned_to_id
@@ -71,9 +100,74 @@ class TicketSerializer(serializers.ModelSerializer):
                 validated_data['assigned_to'] = None
             else:
                 try:
-                    assigned_user = User.objects.get(id=assigned_to_id)
+                    assigned_user = User.objects.get(id=assigned_to_id, organization_id=instance.organization_id)
                     validated_data['assigned_to'] = assigned_user
                 except User.DoesNotExist:
                     raise serializers.ValidationError({'assigned_to_id': 'User not found'})
         
-        return super().update(instance, validated_data)
\ No newline at end of file
+        return super().update(instance, validated_data)
+
+class SavedQueueSerializer(serializers.ModelSerializer):
+    owner = UserSerializer(read_only=True)
+    count = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = SavedQueue
+        fields = ['id', 'name', 'owner', 'shared', 'filters', 'count', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'owner', 'count', 'created_at', 'updated_at']
+    
+    def get_count(self, obj):
+        return get_membership(obj, self.context['request'].user)['count']
+    
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Filters must be an object')
+        unknown = set(value) - set(SavedQueue.FILTER_KEYS)
+        if unknown:
+            raise serializers.ValidationError(f'Unknown filters: {", ".join(sorted(unknown))}')
+        if not all(isinstance(item, (str, int)) for item in value.values()):
+            raise serializers.ValidationError('Filter values must be strings or ids')
+        assigned_to = value.get('assigned_to')
+        if assigned_to not in (None, '', 'me', 'none'):
+            owner = self.instance.owner if self.instance else self.context['request'].user
+            if not str(assigned_to).isdigit() or not User.objects.filter(
+                pk=int(assigned_to), organization_id=owner.organization_id
+            ).exists():
+                raise serializers.ValidationError(
+                    'assigned_to must be "me", "none" or the id of a user in your organization'
+                )
+        return value
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    uploaded_by = UserSerializer(read_only=True)
+    size = serializers.IntegerField(source='blob.size', read_only=True)
+    sha256 = serializers.CharField(source='blob.sha256', read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Attachment
+        fields = ['id', 'filename', 'content_type', 'size', 'sha256', 'comment', 'uploaded_by', 'download_url', 'created_at']
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        url = reverse('attachment-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'content_type', 'size', 'offset', 'comment', 'created_at']
+        read_only_fields = ['id', 'offset', 'created_at']
+    
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Size must be positive')
+        if value > settings.ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(f'Attachments may be at most {settings.ATTACHMENT_MAX_SIZE} bytes')
+        return value
+    
+    def validate_comment(self, value):
+        if value is not None and value.ticket_id != self.context['ticket'].pk:
+            raise serializers.ValidationError('Comment belongs to another ticket')
+        return value
@@ -0,0 +1,211 @@
+"""
+Near-duplicate ticket detection with MinHash and locality-sensitive hashing.
+
+Each ticket's title and description are reduced to word-bigram shingles.
+A SIGNATURE_SIZE-value MinHash signature is computed from them and split
+into BANDS bands. Each band is hashed into a bucket stored in
+TicketSimilarityBand. Similar tickets almost always share at least one
+bucket, so candidates come from one indexed bucket__in lookup. They are then
+ranked by the Jaccard similarity estimated from their signatures, and no
+pairwise scan over the tickets table is needed.
+"""
+import hashlib
+import random
+import re
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import (
+    Attachment, Comment, SavedQueue, Ticket, TicketChange, TicketFingerprint, TicketSimilarityBand, Timeline,
+    UploadSession
+)
+
+SIGNATURE_SIZE = 64
+BANDS = 16
+ROWS_PER_BAND = SIGNATURE_SIZE // BANDS
+
+# Estimated Jaccard similarity below which candidates are not reported
+MIN_SIMILARITY = 0.3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures must stay comparable across processes and deploys
+_rng = random.Random(20251005)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(SIGNATURE_SIZE)
+]
+
+re_word = re.compile(r'[a-z0-9]+')
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+def shingles(title, description):
+    words = re_word.findall(f'{title} {description}'.lower())
+    if len(words) < 2:
+        return set(words)
+    return {f'{first} {second}' for first, second in zip(words, words[1:])}
+
+def signature(title, description):
+    """MinHash signature of the ticket text, or None when there is no text"""
+    hashes = [_hash64(shingle) for shingle in shingles(title, description)]
+    if not hashes:
+        return None
+    return [
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+def buckets(sig):
+    """One LSH bucket id per band (signed 64-bit, to fit a BigIntegerField)"""
+    result = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(f'{band}:{rows}'.encode(), digest_size=8).digest()
+        result.append(int.from_bytes(digest, 'big', signed=True))
+    return result
+
+def estimate_similarity(first, second):
+    return sum(1 for a, b in zip(first, second) if a == b) / SIGNATURE_SIZE
+
+def index_ticket(ticket):
+    """(Re)index one ticket; runs on save whenever its text changes"""
+    sig = signature(ticket.title, ticket.description)
+    with transaction.atomic():
+        TicketSimilarityBand.objects.filter(ticket=ticket).delete()
+        if sig is None:
+            TicketFingerprint.objects.filter(ticket=ticket).delete()
+            return
+        TicketFingerprint.objects.update_or_create(ticket=ticket, defaults={'signature': sig})
+        TicketSimilarityBand.objects.bulk_create([
+            TicketSimilarityBand(ticket=ticket, bucket=bucket) for bucket in buckets(sig)
+        ])
+
+def index_new_tickets(tickets):
+    """Index bulk-created tickets, which have no fingerprint yet, with one insert per table"""
+    fingerprints, bands = [], []
+    for ticket in tickets:
+        sig = signature(ticket.title, ticket.description)
+        if sig is None:
+            continue
+        fingerprints.append(TicketFingerprint(ticket=ticket, signature=sig))
+        bands += [TicketSimilarityBand(ticket=ticket, bucket=bucket) for bucket in buckets(sig)]
+    TicketFingerprint.objects.bulk_create(fingerprints)
+    TicketSimilarityBand.objects.bulk_create(bands)
+
+def unindex_ticket(ticket):
+    TicketSimilarityBand.objects.filter(ticket=ticket).delete()
+    TicketFingerprint.objects.filter(ticket=ticket).delete()
+
+def find_similar(title, description, queryset=None, exclude=None, limit=10, max_candidates=200):
+    """
+    Tickets similar to the given text as [(ticket, score)], best first.
+    queryset restricts the results (e.g. to what the user may see); it is
+    applied to the candidates too, so other tenants' tickets can't crowd
+    them out.
+    """
+    sig = signature(title, description)
+    if sig is None:
+        return []
+
+    candidates = TicketSimilarityBand.objects.filter(bucket__in=buckets(sig))
+    if exclude is not None:
+        candidates = candidates.exclude(ticket=exclude)
+    if queryset is not None:
+        candidates = candidates.filter(ticket__in=queryset.values('pk'))
+    candidate_ids = list(
+        candidates.values('ticket')
+        .annotate(shared=Count('id'))
+        .order_by('-shared')
+        .values_list('ticket', flat=True)[:max_candidates]
+    )
+    if not candidate_ids:
+        return []
+
+    scores = {}
+    for ticket_id, other in TicketFingerprint.objects.filter(ticket_id__in=candidate_ids).values_list('ticket_id', 'signature'):
+        score = estimate_similarity(sig, other)
+        if score >= MIN_SIMILARITY:
+            scores[ticket_id] = score
+    if not scores:
+        return []
+
+    tickets = (queryset if queryset is not None else Ticket.objects.all()).filter(pk__in=scores)
+    ranked = sorted(tickets, key=lambda ticket: scores[ticket.pk], reverse=True)[:limit]
+    return [(ticket, round(scores[ticket.pk], 3)) for ticket in ranked]
+
+@receiver(post_save, sender=Ticket)
+def reindex_on_save(sender, instance, created, update_fields, raw, **kwargs):
+    if raw:
+        return
+    # Merged and deleted tickets are never suggested
+    if instance.merged_into_id or instance.deleted_at:
+        unindex_ticket(instance)
+        return
+    if not created:
+        if update_fields is not None and not {'title', 'description', 'deleted_at'} & set(update_fields):
+            return
+        if not instance.text_changed and not (update_fields and 'deleted_at' in update_fields):
+            return
+    index_ticket(instance)
+
+def merge_tickets(duplicate, canonical, user):
+    """
+    Fold a duplicate ticket into the canonical one: comments (soft-deleted
+    ones included), timeline, attachments and unfinished uploads are moved
+    with bulk updates and recorded in the change feed, the canonical ticket
+    is saved so its updated_at and cached queues reflect them, and the
+    duplicate is closed and removed from the similarity index
+    """
+    with transaction.atomic():
+        # Locked in pk order, so nothing is added to the duplicate while its rows move
+        versions = dict(
+            Ticket.all_objects.select_for_update().filter(pk__in=[duplicate.pk, canonical.pk])
+            .order_by('pk').values_list('pk', 'version')
+        )
+        moved = {}
+        for name, manager in (
+            ('comment_ids', Comment.all_objects), ('timeline_ids', Timeline.objects), ('attachment_ids', Attachment.objects)
+        ):
+            rows = manager.filter(ticket=duplicate)
+            moved[name] = list(rows.values_list('pk', flat=True))
+            rows.update(ticket=canonical)
+        UploadSession.objects.filter(ticket=duplicate).update(ticket=canonical)
+        
+        duplicate.merged_into = canonical
+        duplicate.status = 'closed'
+        duplicate.version = versions[duplicate.pk] + 1
+        duplicate.changed_by = user
+        duplicate.save()
+        unindex_ticket(duplicate)
+        canonical.version = versions[canonical.pk] + 1
+        canonical.changed_by = user
+        canonical.save(update_fields=['version', 'updated_at'])
+        if moved['comment_ids']:
+            # Search queues also match comment text
+            SavedQueue.objects.invalidate_search(canonical.organization_id)
+        
+        # The bulk updates bypass the feed receivers; both tickets get the list of moved rows
+        payload = {'duplicate_id': duplicate.pk, 'canonical_id': canonical.pk, **moved}
+        TicketChange.objects.bulk_create([
+            TicketChange(ticket_id=ticket.pk, organization_id=ticket.organization_id, event='ticket_merged', payload=payload)
+            for ticket in (duplicate, canonical)
+        ])
+        Timeline.objects.create(
+            ticket=canonical,
+            user=user,
+            action='merged',
+            description=f'Merged duplicate "{duplicate.title}" into this ticket',
+            metadata={'duplicate': str(duplicate.pk), 'comments_moved': len(moved['comment_ids'])}
+        )
+        Timeline.objects.create(
+            ticket=duplicate,
+            user=user,
+            action='merged',
+            description=f'Merged into "{canonical.title}"',
+            metadata={'canonical': str(canonical.pk)}
+        )
+    return canonical
@@ -1,3 +1,1654 @@
-from django.test import TestCase
+import json
+import mailbox
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from email.message import EmailMessage
+from io import StringIO
+from zoneinfo import ZoneInfo
+from types import SimpleNamespace
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from accounts.models import Organization, User
+from HelpDesk.middleware import CompressionMiddleware, ConcurrencyLimitMiddleware, accepts_encoding
+from .assignment import auto_assign, create_ticket
+from .attachments import store_chunk
+from .calendars import DAYS_AFTER, CompiledCalendar, NoBusinessHours
+from .changefeed import ndjson_lines, serialize_change
+from .checks import check_assets_in_manifest, check_unhashed_asset_references
+from .email_intake import ingest_mailbox
+from .models import (
+    AgentWorkload, Attachment, AttachmentBlob, BusinessCalendar, BusinessHours, Comment, DailyAgentStats,
+    DailyTicketStats, SavedQueue, SLAConfiguration, Ticket, TicketChange, TicketFingerprint, TicketTransition,
+    Timeline, UploadSession, _compiled_calendars, attachment_storage, uuid7
+)
+from .renderers import FastJSONRenderer, NDJSONRenderer
+from .reports import rollup_stats
+from .serializers import TicketSerializer
+from .throttling import UserTokenBucketThrottle
+from .similarity import find_similar, merge_tickets, signature
 
-# Create your tests here.
+# Sessions and users read from the cache, as configured with REDIS_URL
+SHARED_CACHE_AUTH = {
+    'SHARED_CACHE': True,
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['accounts.backends.CachedModelBackend'],
+}
+
+
+class TicketVisibilityTests(TestCase):
+    """Role-based ticket scoping in the API and the HTML list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer', password='pass', role='user')
+        cls.other_user = User.objects.create_user('other', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.other_agent = User.objects.create_user('agent2', password='pass', role='agent')
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+
+        cls.own = Ticket.objects.create(title='Own', description='d', created_by=cls.user, assigned_to=cls.agent)
+        cls.unassigned = Ticket.objects.create(title='Unassigned', description='d', created_by=cls.other_user)
+        cls.elsewhere = Ticket.objects.create(
+            title='Elsewhere', description='d', created_by=cls.other_user, assigned_to=cls.other_agent
+        )
+
+    def setUp(self):
+        # Throttle buckets and cached users live in the cache
+        cache.clear()
+
+    def api_titles(self, user):
+        self.client.force_login(user)
+        response = self.client.get(reverse('ticket-list'))
+        self.assertEqual(response.status_code, 200)
+        return {ticket['title'] for ticket in response.json()['results']}
+
+    def test_user_sees_only_own_tickets(self):
+        self.assertEqual(self.api_titles(self.user), {'Own'})
+
+    def test_agent_sees_assigned_and_unassigned(self):
+        self.assertEqual(self.api_titles(self.agent), {'Own', 'Unassigned'})
+
+    def test_admin_sees_all(self):
+        self.assertEqual(self.api_titles(self.admin), {'Own', 'Unassigned', 'Elsewhere'})
+
+    def test_merged_duplicates_only_on_request(self):
+        duplicate = Ticket.objects.create(title='Own again', description='d', created_by=self.user)
+        merge_tickets(duplicate, self.own, self.admin)
+        self.assertEqual(self.api_titles(self.user), {'Own'})
+        response = self.client.get(reverse('ticket-list'), {'search': 'Own'})
+        self.assertEqual([ticket['title'] for ticket in response.json()['results']], ['Own'])
+        response = self.client.get(reverse('ticket-list'), {'merged': 'true'})
+        self.assertEqual({ticket['title'] for ticket in response.json()['results']}, {'Own', 'Own again'})
+        # Still reachable directly, pointing at the canonical ticket
+        response = self.client.get(reverse('ticket-detail', args=[duplicate.pk]))
+        self.assertEqual(response.json()['merged_into'], str(self.own.pk))
+
+    def test_hidden_ticket_detail_is_not_found(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ticket-detail', args=[self.elsewhere.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('ticket_detail', args=[self.elsewhere.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_html_list_is_scoped(self):
+        self.client.force_login(self.agent)
+        response = self.client.get(reverse('ticket_list'))
+        self.assertEqual(
+            {ticket.title for ticket in response.context['page_obj']},
+            {'Own', 'Unassigned'}
+        )
+
+    @override_settings(**SHARED_CACHE_AUTH)
+    def test_api_list_query_count_per_role(self):
+        for user in (self.user, self.agent, self.admin):
+            with self.subTest(role=user.role):
+                self.client.force_login(user)
+                self.client.get(reverse('ticket-list'))
+                # Session and user come from the cache: count + page
+                with self.assertNumQueries(2):
+                    self.client.get(reverse('ticket-list'))
+                with self.assertNumQueries(2):
+                    self.client.get(reverse('ticket-list'), {'expand': 'created_by,assigned_to,latest_comment'})
+
+    @override_settings(**SHARED_CACHE_AUTH)
+    def test_html_list_query_count_per_role(self):
+        for user in (self.user, self.agent, self.admin):
+            with self.subTest(role=user.role):
+                self.client.force_login(user)
+                self.client.get(reverse('ticket_list'))
+                with self.assertNumQueries(2):
+                    self.client.get(reverse('ticket_list'))
+
+
+@override_settings(TICKET_AUTO_ASSIGN=True)
+class AutoAssignmentTests(TestCase):
+    """Agent selection strategies and the workload counters they read"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.other_agent = User.objects.create_user('agent2', password='pass', role='agent')
+        User.objects.create_user('inactive', password='pass', role='agent', is_active=False)
+        elsewhere = Organization.objects.create(name='Elsewhere', slug='elsewhere')
+        User.objects.create_user('foreign', password='pass', role='agent', organization=elsewhere)
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, title='Printer'):
+        return create_ticket(Ticket(title=title, description='d', created_by=self.customer), self.customer)
+
+    def open_tickets(self, agent):
+        return AgentWorkload.objects.get(agent=agent).open_tickets
+
+    @override_settings(TICKET_AUTO_ASSIGN=False)
+    def test_disabled_leaves_tickets_unassigned(self):
+        self.assertIsNone(self.create().assigned_to)
+
+    def test_least_open_tickets_balances_agents(self):
+        first, second, third = self.create('1'), self.create('2'), self.create('3')
+        self.assertEqual({first.assigned_to, second.assigned_to}, {self.agent, self.other_agent})
+        self.assertEqual(self.open_tickets(self.agent) + self.open_tickets(self.other_agent), 3)
+        # The third went to the agent idle the longest; closing both of their tickets
+        # leaves them with fewer open tickets, so they get the next one
+        self.assertEqual(third.assigned_to, first.assigned_to)
+        for ticket in (first, third):
+            ticket.status = 'closed'
+            ticket.save()
+        self.assertEqual(self.open_tickets(first.assigned_to), 0)
+        self.assertEqual(self.create('4').assigned_to, first.assigned_to)
+
+    @override_settings(TICKET_ASSIGNMENT_STRATEGY='tickets.assignment.RoundRobinStrategy')
+    def test_round_robin_takes_turns(self):
+        agents = [self.create(str(i)).assigned_to for i in range(4)]
+        self.assertEqual(agents[:2], agents[2:])
+        self.assertEqual(set(agents), {self.agent, self.other_agent})
+
+    def test_only_active_agents_of_the_organization(self):
+        for i in range(4):
+            self.assertIn(self.create(str(i)).assigned_to, {self.agent, self.other_agent})
+
+    def test_new_ticket_is_saved_once(self):
+        ticket = self.create()
+        self.assertEqual(TicketChange.objects.filter(ticket_id=ticket.pk, event='ticket_saved').count(), 1)
+        self.assertEqual(
+            list(Timeline.objects.filter(ticket=ticket).order_by('created_at').values_list('action', flat=True)),
+            ['created', 'assigned']
+        )
+
+    def test_auto_assign_existing_ticket(self):
+        with self.settings(TICKET_AUTO_ASSIGN=False):
+            ticket = self.create()
+        agent = auto_assign(ticket, self.customer)
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).assigned_to, agent)
+        self.assertEqual(self.open_tickets(agent), 1)
+
+    def test_api_create_assigns(self):
+        self.client.force_login(self.customer)
+        response = self.client.post(
+            reverse('ticket-list'), {'title': 'API', 'description': 'd'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIsNotNone(Ticket.objects.get(title='API').assigned_to)
+
+    def test_merge_keeps_counters(self):
+        canonical, duplicate = self.create('1'), self.create('2')
+        merge_tickets(duplicate, canonical, self.customer)
+        self.assertEqual(self.open_tickets(duplicate.assigned_to), 1 if canonical.assigned_to == duplicate.assigned_to else 0)
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_selected_agent_row_is_locked(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.create()
+        self.assertTrue(any('SKIP LOCKED' in query['sql'] for query in queries.captured_queries))
+
+
+class ReportTests(TestCase):
+    """Daily rollups and the reports served from them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.today = timezone.localdate()
+        for priority in ('high', 'high', 'low'):
+            Ticket.objects.create(title=priority, description='d', priority=priority, created_by=cls.customer)
+        resolved = Ticket.objects.create(
+            title='Resolved', description='d', priority='high', created_by=cls.customer, assigned_to=cls.agent
+        )
+        resolved.status = 'resolved'
+        resolved.save()
+        # Resolved two hours after creation, past its SLA
+        Ticket.objects.filter(pk=resolved.pk).update(
+            created_at=resolved.resolved_at - timedelta(hours=2),
+            sla_due_date=resolved.resolved_at - timedelta(hours=1)
+        )
+        # Shortly after midnight it was created yesterday
+        rollup_stats(cls.today - timedelta(days=1), cls.today)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.agent)
+
+    def report(self, name, **params):
+        return self.client.get(reverse('ticket-reports', args=[name]), params)
+
+    def test_volume(self):
+        response = self.report('volume')
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()
+        self.assertEqual(rows[-1]['date'], self.today.isoformat())
+        self.assertEqual(sum(row['created'] for row in rows), 4)
+        self.assertEqual(rows[-1]['resolved'], 1)
+
+    def test_resolution(self):
+        rows = {row['priority']: row for row in self.report('resolution').json()}
+        self.assertEqual(list(rows), ['low', 'medium', 'high', 'critical'])
+        self.assertEqual(rows['high'], {
+            'priority': 'high', 'resolved': 1, 'mttr_hours': 2.0, 'breached': 1, 'breach_rate': 1.0
+        })
+        self.assertIsNone(rows['low']['mttr_hours'])
+
+    def test_agents(self):
+        self.assertEqual(self.report('agents').json(), [
+            {'agent_id': self.agent.pk, 'agent': 'agent', 'resolved': 1, 'mttr_hours': 2.0}
+        ])
+
+    def test_csv(self):
+        response = self.report('volume', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="volume-', response['Content-Disposition'])
+        self.assertEqual(response.content.decode().splitlines()[0], 'date,created,resolved')
+
+    def test_rollup_replaces_rows(self):
+        call_command('rollup_ticket_stats', since=str(self.today - timedelta(days=1)), stdout=StringIO())
+        self.assertEqual(
+            sum(DailyTicketStats.objects.filter(priority='high').values_list('created_count', flat=True)), 3
+        )
+        self.assertEqual(DailyAgentStats.objects.count(), 1)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.report('unknown').status_code, 404)
+        self.assertEqual(self.report('volume', start='yesterday').status_code, 400)
+        self.assertEqual(self.report('volume', start=self.today + timedelta(days=1)).status_code, 400)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.report('volume').status_code, 403)
+
+
+class TicketRowRefreshTests(TestCase):
+    """The HTML list's fragment and changed-rows endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.other_agent = User.objects.create_user('agent2', password='pass', role='agent')
+        cls.ticket = Ticket.objects.create(
+            title='Printer', description='Jammed', created_by=cls.customer, assigned_to=cls.agent
+        )
+        cls.other = Ticket.objects.create(title='VPN', description='Down', created_by=cls.customer)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.agent)
+        self.since = timezone.now().isoformat()
+
+    def rows(self, **params):
+        params = {'changed_since': self.since, 'shown': [str(self.ticket.pk), str(self.other.pk)], **params}
+        response = self.client.get(reverse('ticket_rows'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Refreshed-At', response)
+        html = response.content.decode()
+        pks = (self.ticket.pk, self.other.pk)
+        return (
+            {pk for pk in pks if f'id="ticket-{pk}" class="ticket-row">' in html},
+            {pk for pk in pks if f'id="ticket-{pk}" class="ticket-row" data-removed' in html},
+        )
+
+    def test_fragment(self):
+        response = self.client.get(reverse('ticket_list'), HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(response, 'tickets/partials/ticket_results.html')
+        self.assertTemplateNotUsed(response, 'tickets/ticket_list.html')
+        self.assertIn('HX-Request', response['Vary'])
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.rows(), (set(), set()))
+
+    def test_changed_row(self):
+        self.ticket.status = 'in_progress'
+        self.ticket.save()
+        self.assertEqual(self.rows(), ({self.ticket.pk}, set()))
+        self.assertEqual(self.rows(status='open'), (set(), {self.ticket.pk}))
+
+    def test_new_comment(self):
+        Comment.objects.create(ticket=self.other, author=self.customer, content='Still down')
+        self.assertEqual(self.rows(), ({self.other.pk}, set()))
+
+    def test_reassigned_away(self):
+        self.ticket.assigned_to = self.other_agent
+        self.ticket.save()
+        self.assertEqual(self.rows(), (set(), {self.ticket.pk}))
+
+    def test_soft_deleted(self):
+        self.ticket.soft_delete()
+        self.assertEqual(self.rows(), (set(), {self.ticket.pk}))
+
+    def test_merged(self):
+        merge_tickets(self.other, self.ticket, self.agent)
+        self.assertEqual(self.rows(), ({self.ticket.pk}, {self.other.pk}))
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(reverse('ticket_rows')).status_code, 400)
+        response = self.client.get(reverse('ticket_rows'), {'changed_since': self.since, 'shown': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TicketFieldSelectionTests(TestCase):
+    """Lean list representation, ?fields= and ?expand="""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer', password='pass', role='user')
+        cls.ticket = Ticket.objects.create(title='Printer', description='Jammed', created_by=cls.user)
+        Comment.objects.create(ticket=cls.ticket, author=cls.user, content='First')
+        Comment.objects.create(ticket=cls.ticket, author=cls.user, content='Second')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def list_item(self, **params):
+        response = self.client.get(reverse('ticket-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def test_list_defaults_to_lean_fields(self):
+        item = self.list_item()
+        self.assertEqual(list(item), TicketSerializer.LIST_FIELDS)
+        self.assertEqual(item['comments_count'], 2)
+
+    def test_list_does_not_read_description(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.list_item()
+        self.assertFalse(any('"description"' in query['sql'] for query in queries.captured_queries))
+
+    def test_fields_replaces_the_default(self):
+        self.assertEqual(self.list_item(fields='title, status, unknown'), {'title': 'Printer', 'status': 'open'})
+
+    def test_expand_adds_fields(self):
+        item = self.list_item(expand='description,created_by,latest_comment')
+        self.assertEqual(item['description'], 'Jammed')
+        self.assertEqual(item['created_by']['username'], 'customer')
+        self.assertEqual(item['latest_comment']['content'], 'Second')
+        self.assertIn('comments_count', item)
+
+    def test_detail_has_every_field(self):
+        response = self.client.get(reverse('ticket-detail', args=[self.ticket.pk]))
+        item = response.json()
+        self.assertIn('description', item)
+        self.assertEqual(item['latest_comment']['content'], 'Second')
+        self.assertEqual(item['comments_count'], 2)
+
+
+class StartupTests(SimpleTestCase):
+    """URLconf warmup in wsgi.py and the gunicorn preload settings"""
+
+    def run_python(self, code):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='HelpDesk.settings')
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.split()
+
+    def test_wsgi_loads_urlconf_without_database(self):
+        loaded = self.run_python(
+            'import sys\n'
+            'import HelpDesk.wsgi\n'
+            'from django.db import connection\n'
+            'from django.urls import get_resolver\n'
+            "print('url_patterns' in vars(get_resolver()), 'tickets.views' in sys.modules)\n"
+            'print(connection.connection is None)'
+        )
+        self.assertEqual(loaded, ['True', 'True', 'True'])
+
+    def test_gunicorn_config(self):
+        path = settings.BASE_DIR / 'gunicorn.conf.py'
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '3', 'PORT': '9000'}):
+            config = runpy.run_path(path)
+        self.assertEqual((config['bind'], config['workers'], config['preload_app']), ('0.0.0.0:9000', 3, True))
+        with mock.patch.dict(os.environ, {'GUNICORN_PRELOAD': 'False'}):
+            self.assertFalse(runpy.run_path(path)['preload_app'])
+
+        with mock.patch('django.db.connections.close_all') as close_all:
+            config['post_fork'](None, None)
+        close_all.assert_called_once_with()
+
+    def test_profile_startup(self):
+        output = StringIO()
+        call_command('profile_startup', top=3, stdout=output)
+        self.assertIn('URLconf', output.getvalue())
+        self.assertIn('tickets', output.getvalue())
+
+
+class StaticAssetCheckTests(SimpleTestCase):
+    """helpdesk.E001-E003: assets go through {% static %} and are in the manifest"""
+
+    def template_errors(self, source):
+        path = settings.BASE_DIR / 'templates' / 'example.html'
+        with mock.patch('tickets.checks.project_templates', return_value=[(path, source)]):
+            return [error.id for error in check_unhashed_asset_references(None)]
+
+    def test_project_templates_pass(self):
+        self.assertEqual(check_unhashed_asset_references(None), [])
+
+    def test_literal_and_cdn_references(self):
+        self.assertEqual(self.template_errors('<script src="/static/js/app.js"></script>'), ['helpdesk.E001'])
+        self.assertEqual(self.template_errors('<script src="https://cdn.tailwindcss.com"></script>'), ['helpdesk.E001'])
+        self.assertEqual(self.template_errors('<link href="//cdn.example.com/a.css">'), ['helpdesk.E001'])
+        self.assertEqual(self.template_errors('''<link rel="stylesheet" href="{% static 'css/app.css' %}">'''), [])
+        self.assertEqual(self.template_errors('<a href="https://example.com">docs</a>'), [])
+
+    def manifest_errors(self, paths):
+        with tempfile.TemporaryDirectory() as static_root:
+            if paths is not None:
+                with open(os.path.join(static_root, 'staticfiles.json'), 'w') as manifest:
+                    json.dump({'paths': paths, 'version': '1.1'}, manifest)
+            storages = {**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage',
+            }}
+            with override_settings(STATIC_ROOT=static_root, STORAGES=storages):
+                return [error.id for error in check_assets_in_manifest(None)]
+
+    def test_manifest(self):
+        self.assertEqual(self.manifest_errors(None), ['helpdesk.E002'])
+        self.assertEqual(self.manifest_errors({'css/app.css': 'css/app.0123abcd.css'}), ['helpdesk.E003'])
+        self.assertEqual(self.manifest_errors({
+            'css/app.css': 'css/app.0123abcd.css', 'js/ticket_list.js': 'js/ticket_list.4567ef01.js'
+        }), [])
+
+    def test_deploy_builds_css(self):
+        # static/css/ is not committed, so the slug build has to produce it before collectstatic
+        with open(settings.BASE_DIR / 'app.json') as app:
+            buildpacks = [buildpack['url'] for buildpack in json.load(app)['buildpacks']]
+        self.assertLess(buildpacks.index('heroku/nodejs'), buildpacks.index('heroku/python'))
+        with open(settings.BASE_DIR / 'package.json') as package:
+            scripts = json.load(package)['scripts']
+        self.assertEqual(scripts['heroku-postbuild'], 'npm run build')
+        self.assertIn('-o ./static/css/app.css', scripts['build'])
+
+    @override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    }})
+    def test_manifest_check_needs_manifest_storage(self):
+        self.assertEqual(check_assets_in_manifest(None), [])
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_PATH_PREFIXES=['/api/'])
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Content-coding negotiation and the size and path rules"""
+    body = b'{"title": "Printer on fire"}' * 100
+
+    def compress(self, path='/api/tickets/', accept_encoding='gzip, br', body=body):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type='application/json'))
+        return middleware(request)
+
+    def test_accepts_encoding(self):
+        cases = [
+            ('br', True), ('gzip, br', True), ('br;q=0.5', True), ('BR ; Q=1', True),
+            ('br;q=0', False), ('br;q=0.0, gzip', False), ('gzip', False), ('*', True),
+            ('*, br;q=0', False), ('*;q=0', False), ('', False), ('brotli', False),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertIs(accepts_encoding(header, 'br'), expected)
+
+    def test_prefers_brotli(self):
+        response = self.compress()
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertLess(len(response.content), len(self.body))
+
+    def test_refused_brotli_falls_back_to_gzip(self):
+        self.assertEqual(self.compress(accept_encoding='br;q=0, gzip')['Content-Encoding'], 'gzip')
+
+    def test_refused_gzip_is_not_compressed(self):
+        response = self.compress(accept_encoding='br;q=0, gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+
+    def test_small_responses_are_not_compressed(self):
+        self.assertFalse(self.compress(body=b'{}').has_header('Content-Encoding'))
+
+    @override_settings(COMPRESSION_MIN_SIZE=10)
+    def test_min_size_setting(self):
+        self.assertEqual(self.compress(body=b'{"a": "' + b'x' * 20 + b'"}')['Content-Encoding'], 'br')
+
+    def test_only_prefixed_paths(self):
+        self.assertFalse(self.compress(path='/tickets/').has_header('Content-Encoding'))
+        self.assertFalse(self.compress(path='/apiary/').has_header('Content-Encoding'))
+
+
+class RendererTests(SimpleTestCase):
+    """orjson output matches the stock DRF and Django encoders"""
+    data = {
+        'id': uuid.UUID('01890a5d-ac96-774b-bcce-b302099a8057'),
+        'created_at': datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+        'updated_at': datetime(2026, 1, 1, 12, 30, 15, 123456, tzinfo=ZoneInfo('Europe/Berlin')),
+        'due': date(2026, 1, 2),
+        'opens': dt_time(9, 30),
+        'title': 'Drucker kaputt \u2013 bitte prüfen',
+    }
+
+    def test_matches_stock_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertIn(b'"2026-01-01T00:00:00Z"', FastJSONRenderer().render(self.data))
+        self.assertEqual(
+            NDJSONRenderer().render([self.data]), JSONRenderer().render(self.data) + b'\n'
+        )
+
+    def test_change_export_rows(self):
+        change = TicketChange(
+            id=1, ticket_id=self.data['id'], event='timeline', created_at=self.data['created_at'],
+            payload={'metadata': {}}
+        )
+        changes = SimpleNamespace(iterator=lambda chunk_size: [change])
+        line, = ndjson_lines(changes)
+        self.assertEqual(json.loads(line), json.loads(json.dumps(serialize_change(change), cls=DjangoJSONEncoder)))
+        self.assertEqual(json.loads(line)['created_at'], '2026-01-01T00:00:00Z')
+
+
+class FixedClockThrottle(UserTokenBucketThrottle):
+    rate = '5/min'
+    now = 1000.0
+
+    def timer(self):
+        return FixedClockThrottle.now
+
+
+@override_settings(THROTTLE_PROCESSES=1)
+class ThrottleTests(SimpleTestCase):
+    """Token buckets in a per-process cache"""
+
+    def setUp(self):
+        cache.clear()
+        FixedClockThrottle.now = 1000.0
+        self.request = SimpleNamespace(user=SimpleNamespace(pk=1, is_authenticated=True))
+
+    def allow(self):
+        return FixedClockThrottle().allow_request(self.request, None)
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.allow() for _ in range(6)], [True] * 5 + [False])
+        throttle = FixedClockThrottle()
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertAlmostEqual(throttle.wait(), 12.0)
+        # One token every 12 seconds
+        FixedClockThrottle.now += 12
+        self.assertEqual([self.allow(), self.allow()], [True, False])
+
+    def test_concurrent_requests_take_distinct_tokens(self):
+        results = []
+        barrier = threading.Barrier(20)
+
+        def request():
+            barrier.wait()
+            results.append(self.allow())
+
+        threads = [threading.Thread(target=request) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 5)
+
+    @override_settings(THROTTLE_PROCESSES=2)
+    def test_per_process_share_of_the_rate(self):
+        self.assertEqual([self.allow() for _ in range(3)], [True, True, False])
+
+
+@override_settings(SHARED_CACHE=True, API_MAX_CONCURRENT_REQUESTS=2, API_MAX_CONCURRENT_REQUESTS_PER_CLIENT=1)
+class ConcurrencyLimitTests(SimpleTestCase):
+    """Admission control counted in the cache across workers"""
+
+    def setUp(self):
+        cache.clear()
+        self.inner = []
+        self.middleware = ConcurrencyLimitMiddleware(self.handle)
+
+    def handle(self, request):
+        # Requests issued while this one is in flight
+        statuses = [self.middleware(self.request(address)).status_code for address in self.inner]
+        self.inner = []
+        return HttpResponse(','.join(map(str, statuses)))
+
+    def request(self, address, path='/api/tickets/'):
+        return RequestFactory().get(path, REMOTE_ADDR=address)
+
+    def test_limits(self):
+        self.inner = ['10.0.0.1', '10.0.0.2']
+        response = self.middleware(self.request('10.0.0.1'))
+        # Same client: 429; another client: fills the second slot
+        self.assertEqual(response.content, b'429,200')
+        self.assertEqual(cache.get('inflight_total'), 0)
+        self.assertEqual(cache.get('inflight_10.0.0.1'), 0)
+
+    @override_settings(API_MAX_CONCURRENT_REQUESTS=1)
+    def test_busy(self):
+        self.inner = ['10.0.0.2']
+        response = self.middleware(self.request('10.0.0.1'))
+        self.assertEqual(response.content, b'503')
+
+    def test_other_paths_are_not_limited(self):
+        cache.set('inflight_total', 5)
+        self.assertEqual(self.middleware(self.request('10.0.0.1', path='/tickets/')).status_code, 200)
+        self.assertEqual(self.middleware(self.request('10.0.0.1')).status_code, 503)
+
+    def test_counter_does_not_go_negative(self):
+        self.middleware.leave('inflight_total')
+        cache.set('inflight_total', 0)
+        self.middleware.leave('inflight_total')
+        self.assertEqual(cache.get('inflight_total'), 0)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_not_used_without_shared_cache(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ConcurrencyLimitMiddleware(self.handle)
+
+
+class SavedQueueTests(TestCase):
+    """Queue filters, cached counts and their invalidation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.colleague = User.objects.create_user('colleague', password='pass', role='agent')
+        elsewhere = Organization.objects.create(name='Elsewhere', slug='elsewhere')
+        cls.outsider = User.objects.create_user('outsider', password='pass', role='agent', organization=elsewhere)
+        cls.printer = Ticket.objects.create(title='Printer jammed', description='d', created_by=cls.customer)
+        cls.laptop = Ticket.objects.create(
+            title='Laptop', description='d', created_by=cls.customer, assigned_to=cls.agent, priority='high'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.agent)
+
+    def create_queue(self, filters, **data):
+        return self.client.post(
+            reverse('queue-list'), {'name': 'Queue', 'filters': filters, **data}, content_type='application/json'
+        )
+
+    def count(self, queue_id):
+        return self.client.get(reverse('queue-detail', args=[queue_id])).json()['count']
+
+    def test_count_and_tickets(self):
+        response = self.create_queue({'assigned_to': 'me'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['count'], 1)
+        response = self.client.get(reverse('queue-tickets', args=[response.json()['id']]))
+        self.assertEqual([ticket['title'] for ticket in response.json()['results']], ['Laptop'])
+
+    def test_assigned_to_validation(self):
+        for value in ('bob', self.outsider.pk, str(self.customer.pk + 1000)):
+            with self.subTest(assigned_to=value):
+                response = self.create_queue({'assigned_to': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('filters', response.json())
+        for value in ('me', 'none', self.colleague.pk, str(self.colleague.pk)):
+            with self.subTest(assigned_to=value):
+                self.assertEqual(self.create_queue({'assigned_to': value}).status_code, 201)
+
+    def test_unknown_filter_rejected(self):
+        self.assertEqual(self.create_queue({'colour': 'red'}).status_code, 400)
+
+    def test_invalid_stored_filter_matches_nothing(self):
+        queue = SavedQueue.objects.create(name='Old', owner=self.agent, filters={'assigned_to': 'bob'})
+        self.assertEqual(self.client.get(reverse('queue-list')).status_code, 200)
+        self.assertEqual(self.count(queue.pk), 0)
+        response = self.client.get(reverse('ticket-list'), {'assigned_to': 'bob'})
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_status_change_invalidates(self):
+        queue_id = self.create_queue({'status': 'open'}).json()['id']
+        self.assertEqual(self.count(queue_id), 2)
+        self.printer.status = 'closed'
+        self.printer.save()
+        self.assertEqual(self.count(queue_id), 1)
+
+    def test_unrelated_change_keeps_cache(self):
+        queue_id = self.create_queue({'priority': 'high'}).json()['id']
+        self.count(queue_id)
+        generation = cache.get(SavedQueue.generation_key(queue_id))
+        self.printer.status = 'in_progress'
+        self.printer.save()
+        self.assertEqual(cache.get(SavedQueue.generation_key(queue_id)), generation)
+
+    def test_text_changes_invalidate_search_queues(self):
+        queue_id = self.create_queue({'search': 'toner'}).json()['id']
+        self.assertEqual(self.count(queue_id), 0)
+        self.printer.title = 'Printer out of toner'
+        self.printer.save()
+        self.assertEqual(self.count(queue_id), 1)
+        comment = Comment.objects.create(ticket=self.laptop, author=self.agent, content='Needs toner too?')
+        self.assertEqual(self.count(queue_id), 2)
+        comment.soft_delete()
+        self.assertEqual(self.count(queue_id), 1)
+
+    def test_sharing_and_ownership(self):
+        private_id = self.create_queue({'status': 'open'}).json()['id']
+        shared_id = self.create_queue({'status': 'open'}, shared=True).json()['id']
+        self.client.force_login(self.colleague)
+        ids = {queue['id'] for queue in self.client.get(reverse('queue-list')).json()['results']}
+        self.assertEqual(ids, {shared_id})
+        self.assertEqual(self.client.delete(reverse('queue-detail', args=[shared_id])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('queue-detail', args=[private_id])).status_code, 404)
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(reverse('queue-list')).json()['results'], [])
+
+
+@override_settings(
+    STORAGES={**settings.STORAGES, 'attachments': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}},
+    ATTACHMENT_CHUNK_SIZE=8,
+)
+class AttachmentUploadTests(TestCase):
+    """Chunked uploads, their finalization and ranged downloads"""
+    content = b'0123456789abcdef!'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer', password='pass', role='user')
+        cls.ticket = Ticket.objects.create(title='Printer', description='d', created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def start(self, content=content):
+        response = self.client.post(
+            reverse('ticket-uploads', args=[self.ticket.pk]),
+            {'filename': 'log.txt', 'size': len(content), 'content_type': 'text/plain'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return UploadSession.objects.get(pk=response.json()['id'])
+
+    def put(self, session, start, data, total=None):
+        total = len(self.content) if total is None else total
+        return self.client.put(
+            reverse('upload-session', args=[session.pk]), data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}'
+        )
+
+    def upload(self, content=content):
+        session = self.start(content)
+        for start in range(0, len(content), 8):
+            response = self.put(session, start, content[start:start + 8], len(content))
+        self.assertEqual(response.status_code, 201, response.content)
+        return Attachment.objects.get(pk=response.json()['id'])
+
+    def read(self, attachment):
+        with attachment_storage().open(attachment.blob.file.name) as file:
+            return file.read()
+
+    def test_chunked_upload(self):
+        attachment = self.upload()
+        self.assertEqual(self.read(attachment), self.content)
+        self.assertEqual(attachment.blob.size, len(self.content))
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertTrue(Timeline.objects.filter(ticket=self.ticket, action='attached').exists())
+
+    def test_resume_and_out_of_order(self):
+        session = self.start()
+        self.assertEqual(self.put(session, 0, self.content[:8]).status_code, 200)
+        response = self.put(session, 0, self.content[:8])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 8))
+        self.assertEqual(self.put(session, 16, self.content[16:]).status_code, 409)
+        self.assertEqual(self.client.get(reverse('upload-session', args=[session.pk])).json()['offset'], 8)
+        self.assertEqual(self.put(session, 8, self.content[8:16]).status_code, 200)
+        self.assertEqual(self.put(session, 16, self.content[16:]).status_code, 201)
+
+    def test_leftover_chunk_file_is_not_used(self):
+        session = self.start()
+        # Left behind by an attempt that crashed before advancing the offset
+        attachment_storage().save(session.chunk_name(0), ContentFile(b'XXXXXXXX'))
+        self.put(session, 0, self.content[:8])
+        session.refresh_from_db()
+        self.assertNotEqual(session.chunks[0], session.chunk_name(0))
+        for start in (8, 16):
+            response = self.put(session, start, self.content[start:start + 8])
+        self.assertEqual(self.read(Attachment.objects.get(pk=response.json()['id'])), self.content)
+
+    def test_failed_finalization_can_be_retried(self):
+        session = self.start(b'short')
+        with mock.patch.object(Attachment.objects, 'create', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                store_chunk(session, ContentFile(b'short'), 0, 5)
+        session.refresh_from_db()
+        self.assertEqual(session.offset, 5)
+        response = self.client.put(reverse('upload-session', args=[session.pk]), b'', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.read(Attachment.objects.get()), b'short')
+        self.assertFalse(attachment_storage().exists(session.chunks[0]))
+
+    def test_identical_content_stored_once(self):
+        self.upload()
+        self.upload()
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+        self.assertEqual(Attachment.objects.count(), 2)
+
+    def test_range_downloads(self):
+        url = reverse('attachment-download', args=[self.upload().pk])
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], f'bytes 2-5/{len(self.content)}')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'ef!')
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:])
+        response = self.client.get(url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_hidden_ticket(self):
+        other = User.objects.create_user('other', password='pass', role='user')
+        url = reverse('attachment-download', args=[self.upload().pk])
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class SimilarityTests(TestCase):
+    """MinHash/LSH duplicate suggestions and merging"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        text = 'The office printer on the third floor keeps jamming when printing double sided pages'
+        cls.canonical = Ticket.objects.create(title='Printer jamming', description=text, created_by=cls.customer)
+        cls.duplicate = Ticket.objects.create(
+            title='Printer jamming again', description=text + ' today', created_by=cls.customer
+        )
+        cls.unrelated = Ticket.objects.create(
+            title='VPN password reset', description='Cannot log in to the VPN after changing my password',
+            created_by=cls.customer
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_signature_is_deterministic(self):
+        self.assertEqual(signature('Printer jamming', 'paper'), signature('printer  JAMMING', 'paper!'))
+        self.assertIsNone(signature('', ''))
+
+    def test_find_similar(self):
+        matches = find_similar(self.duplicate.title, self.duplicate.description, exclude=self.duplicate)
+        self.assertEqual([ticket for ticket, _ in matches], [self.canonical])
+        self.assertGreater(matches[0][1], 0.5)
+        self.assertEqual(find_similar('Completely different words', 'about lunch menus'), [])
+
+    def test_find_similar_respects_queryset(self):
+        matches = find_similar(
+            self.duplicate.title, self.duplicate.description,
+            queryset=Ticket.objects.exclude(pk=self.canonical.pk), exclude=self.duplicate
+        )
+        self.assertEqual(matches, [])
+
+    def test_text_change_reindexes(self):
+        self.unrelated.description = self.canonical.description
+        self.unrelated.save()
+        matches = find_similar(self.canonical.title, self.canonical.description, exclude=self.canonical)
+        self.assertIn(self.unrelated, [ticket for ticket, _ in matches])
+
+    def test_merge(self):
+        kept = Comment.objects.create(ticket=self.duplicate, author=self.customer, content='Still jammed')
+        hidden = Comment.objects.create(ticket=self.duplicate, author=self.customer, content='Toner too')
+        hidden.soft_delete()
+        updated_at = Ticket.objects.get(pk=self.canonical.pk).updated_at
+
+        merge_tickets(Ticket.objects.get(pk=self.duplicate.pk), Ticket.objects.get(pk=self.canonical.pk), self.agent)
+
+        duplicate = Ticket.objects.get(pk=self.duplicate.pk)
+        canonical = Ticket.objects.get(pk=self.canonical.pk)
+        self.assertEqual((duplicate.merged_into, duplicate.status), (canonical, 'closed'))
+        self.assertEqual(canonical.version, self.canonical.version + 1)
+        self.assertGreater(canonical.updated_at, updated_at)
+        self.assertFalse(Comment.all_objects.filter(ticket=duplicate).exists())
+        self.assertEqual(Comment.all_objects.filter(ticket=canonical).count(), 2)
+        self.assertFalse(TicketFingerprint.objects.filter(ticket=duplicate).exists())
+
+        changes = TicketChange.objects.filter(event='ticket_merged')
+        self.assertEqual({change.ticket_id for change in changes}, {duplicate.pk, canonical.pk})
+        self.assertEqual(set(changes[0].payload['comment_ids']), {str(kept.pk), str(hidden.pk)})
+        self.assertEqual(changes[0].payload['canonical_id'], str(canonical.pk))
+        self.assertTrue(TicketChange.objects.filter(ticket_id=canonical.pk, event='ticket_saved').exists())
+
+    def test_merge_refreshes_search_queues(self):
+        Comment.objects.create(ticket=self.duplicate, author=self.customer, content='Out of toner')
+        queue = SavedQueue.objects.create(name='Toner', owner=self.agent, filters={'search': 'toner'})
+        self.client.force_login(self.agent)
+        url = reverse('queue-tickets', args=[queue.pk])
+        self.assertEqual([ticket['id'] for ticket in self.client.get(url).json()['results']], [str(self.duplicate.pk)])
+        merge_tickets(self.duplicate, self.canonical, self.agent)
+        self.assertEqual([ticket['id'] for ticket in self.client.get(url).json()['results']], [str(self.canonical.pk)])
+
+    def test_merge_endpoint(self):
+        self.client.force_login(self.agent)
+        url = reverse('ticket-merge', args=[self.duplicate.pk])
+        self.assertEqual(self.client.post(url, {}, content_type='application/json').status_code, 400)
+        self.assertEqual(
+            self.client.post(url, {'into': str(self.duplicate.pk)}, content_type='application/json').status_code, 400
+        )
+        response = self.client.post(url, {'into': str(self.canonical.pk)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['id'], str(self.canonical.pk))
+        self.assertEqual(
+            self.client.post(url, {'into': str(self.unrelated.pk)}, content_type='application/json').status_code, 400
+        )
+        self.client.force_login(self.customer)
+        url = reverse('ticket-merge', args=[self.unrelated.pk])
+        self.assertEqual(
+            self.client.post(url, {'into': str(self.canonical.pk)}, content_type='application/json').status_code, 403
+        )
+
+
+class ChangeFeedTests(TestCase):
+    """Cursor paging, visibility and the NDJSON export of the change feed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.other_agent = User.objects.create_user('agent2', password='pass', role='agent')
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin')
+        elsewhere = Organization.objects.create(name='Elsewhere', slug='elsewhere')
+        cls.outsider = User.objects.create_user('outsider', password='pass', role='user', organization=elsewhere)
+
+        cls.assigned = Ticket.objects.create(
+            title='Assigned', description='d', created_by=cls.customer, assigned_to=cls.agent
+        )
+        cls.unassigned = Ticket.objects.create(title='Unassigned', description='d', created_by=cls.customer)
+        cls.hidden = Ticket.objects.create(
+            title='Hidden', description='d', created_by=cls.customer, assigned_to=cls.other_agent
+        )
+        cls.foreign = Ticket.objects.create(title='Foreign', description='d', created_by=cls.outsider)
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('change-feed'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def all_changes(self, user, limit):
+        changes, cursor = [], '0'
+        while True:
+            page = self.feed(user, after=cursor, limit=limit)
+            changes += page['results']
+            cursor = page['next_cursor']
+            if not page['has_more']:
+                return changes, cursor
+
+    def test_paging(self):
+        everything = self.feed(self.admin, limit=1000)
+        self.assertFalse(everything['has_more'])
+        changes, cursor = self.all_changes(self.admin, limit=2)
+        self.assertEqual(changes, everything['results'])
+        self.assertEqual(cursor, everything['next_cursor'])
+        ids = [change['id'] for change in changes]
+        self.assertEqual(ids, sorted(set(ids)))
+
+        # Nothing new: the cursor stays put
+        page = self.feed(self.admin, after=cursor)
+        self.assertEqual((page['results'], page['next_cursor']), ([], cursor))
+
+    def test_new_changes_show_up_at_once(self):
+        cursor = self.feed(self.admin)['next_cursor']
+        self.unassigned.status = 'in_progress'
+        self.unassigned.save()
+        page = self.feed(self.admin, after=cursor)
+        self.assertEqual({change['ticket_id'] for change in page['results']}, {str(self.unassigned.pk)})
+        self.assertIn('ticket_saved', {change['event'] for change in page['results']})
+
+    def test_visibility(self):
+        tickets = lambda user: {change['ticket_id'] for change in self.feed(user)['results']}
+        self.assertEqual(tickets(self.agent), {str(self.assigned.pk), str(self.unassigned.pk)})
+        self.assertEqual(
+            tickets(self.admin), {str(self.assigned.pk), str(self.unassigned.pk), str(self.hidden.pk)}
+        )
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('change-feed')).status_code, 403)
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(reverse('change-export')).status_code, 403)
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.admin)
+        for cursor in ('abc', '-1', '1.-2', '1.2.3'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(reverse('change-feed'), {'after': cursor}).status_code, 400)
+
+    def test_export(self):
+        page = self.feed(self.agent, limit=1000)
+        for accept in ('application/json', 'application/x-ndjson', '*/*'):
+            with self.subTest(accept=accept):
+                response = self.client.get(reverse('change-export'), HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+                lines = b''.join(response.streaming_content).decode().splitlines()
+                self.assertEqual(len(lines), len(page['results']))
+                self.assertEqual(response['X-Next-Cursor'], page['next_cursor'])
+
+        # Changes committed after the export started are left for the next one
+        response = self.client.get(reverse('change-export'), {'after': page['results'][0]['id']})
+        Timeline.objects.create(ticket=self.unassigned, user=self.agent, action='commented', description='Late')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(page['results']) - 1)
+        self.assertEqual(response['X-Next-Cursor'], page['next_cursor'])
+
+
+@override_settings(
+    STORAGES={**settings.STORAGES, 'attachments': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}}
+)
+class SoftDeleteTests(TestCase):
+    """Soft deletion of tickets and comments and the batch purge"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+
+    def setUp(self):
+        cache.clear()
+        self.ticket = Ticket.objects.create(
+            title='Printer', description='Jammed', created_by=self.customer, assigned_to=self.agent
+        )
+        self.comment = Comment.objects.create(ticket=self.ticket, author=self.customer, content='Still jammed')
+        self.reply = Comment.objects.create(
+            ticket=self.ticket, author=self.agent, content='On my way', parent=self.comment
+        )
+
+    def attach(self, content=b'log'):
+        blob = AttachmentBlob.objects.create(
+            sha256=content.hex(), size=len(content), file=attachment_storage().save('blob', ContentFile(content))
+        )
+        return Attachment.objects.create(
+            ticket=self.ticket, comment=self.comment, uploaded_by=self.customer, blob=blob, filename='log.txt'
+        )
+
+    def test_api_delete_is_soft(self):
+        self.client.force_login(self.agent)
+        response = self.client.delete(reverse('ticket-detail', args=[self.ticket.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Ticket.objects.filter(pk=self.ticket.pk).exists())
+        self.assertIsNotNone(Ticket.all_objects.get(pk=self.ticket.pk).deleted_at)
+        self.assertEqual(AgentWorkload.objects.get(agent=self.agent).open_tickets, 0)
+        self.assertEqual(self.client.get(reverse('ticket-detail', args=[self.ticket.pk])).status_code, 404)
+
+        ticket = Ticket.all_objects.get(pk=self.ticket.pk)
+        ticket.restore()
+        self.assertTrue(Ticket.objects.filter(pk=self.ticket.pk).exists())
+        self.assertEqual(AgentWorkload.objects.get(agent=self.agent).open_tickets, 1)
+
+    def test_comment_thread(self):
+        self.comment.soft_delete()
+        self.assertFalse(Comment.objects.filter(ticket=self.ticket).exists())
+        self.assertEqual(Comment.all_objects.filter(ticket=self.ticket).count(), 2)
+        self.comment.restore()
+        self.assertEqual(Comment.objects.filter(ticket=self.ticket).count(), 2)
+
+    def test_purge_tickets(self):
+        attachment = self.attach()
+        kept = Ticket.objects.create(title='VPN', description='Down', created_by=self.customer)
+        self.ticket.soft_delete()
+        kept.soft_delete()
+        Ticket.all_objects.filter(pk=self.ticket.pk).update(deleted_at=timezone.now() - timedelta(days=40))
+
+        output = StringIO()
+        call_command('purge_deleted_tickets', days=30, batch_size=1, stdout=output)
+        self.assertIn('Purged 1 ticket(s), 0 comment(s) and 1 unused attachment file(s)', output.getvalue())
+        self.assertEqual(list(Ticket.all_objects.all()), [kept])
+        for model in (Timeline, TicketTransition, TicketFingerprint, Attachment):
+            self.assertFalse(model.objects.filter(ticket_id=self.ticket.pk).exists(), model.__name__)
+        self.assertFalse(Comment.all_objects.filter(ticket_id=self.ticket.pk).exists())
+        self.assertFalse(attachment_storage().exists(attachment.blob.file.name))
+        self.assertTrue(TicketChange.objects.filter(ticket_id=self.ticket.pk, event='ticket_deleted').exists())
+
+    def test_purge_comments(self):
+        self.attach()
+        self.comment.soft_delete()
+        # A reply added to the thread after it was deleted goes with it
+        late = Comment.objects.create(ticket=self.ticket, author=self.agent, content='Late', parent=self.comment)
+        Comment.all_objects.filter(deleted_at__isnull=False).update(deleted_at=timezone.now() - timedelta(days=40))
+
+        call_command('purge_deleted_tickets', days=30, stdout=StringIO())
+        self.assertFalse(Comment.all_objects.filter(pk__in=[self.comment.pk, self.reply.pk, late.pk]).exists())
+        self.assertFalse(Attachment.objects.exists())
+        self.assertTrue(Ticket.objects.filter(pk=self.ticket.pk).exists())
+
+
+class AdminChangelistTests(TestCase):
+    """Indexed search, autocomplete filters and soft deletes in the admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser('root', 'root@example.com', 'pass')
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.printer = Ticket.objects.create(
+            title='Printer jammed', description='d', created_by=cls.customer, assigned_to=cls.agent
+        )
+        cls.vpn = Ticket.objects.create(title='VPN down', description='d', created_by=cls.agent)
+        Comment.objects.create(ticket=cls.printer, author=cls.customer, content='Still jammed')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.superuser)
+
+    def changelist(self, model, **params):
+        response = self.client.get(reverse(f'admin:tickets_{model}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_changelists(self):
+        for model in ('ticket', 'comment', 'timeline', 'tickettransition'):
+            with self.subTest(model=model):
+                self.changelist(model)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.changelist('comment')
+        with CaptureQueriesContext(connection) as few:
+            self.changelist('comment')
+        for _ in range(5):
+            Comment.objects.create(ticket=self.vpn, author=self.agent, content='More')
+        with CaptureQueriesContext(connection) as many:
+            self.changelist('comment')
+        self.assertEqual(len(many), len(few))
+
+    def test_search(self):
+        self.assertEqual(self.changelist('ticket', q=str(self.vpn.pk)), [self.vpn])
+        self.assertEqual(self.changelist('ticket', q='customer'), [self.printer])
+        self.assertEqual(self.changelist('ticket', q='Printer'), [self.printer])
+        # A prefix, so an index can answer it
+        self.assertEqual(self.changelist('ticket', q='jammed'), [])
+        self.assertEqual(len(self.changelist('comment', q=str(self.printer.pk))), 1)
+
+    def test_autocomplete_filter(self):
+        self.assertEqual(self.changelist('ticket', assigned_to__id__exact=self.agent.pk), [self.printer])
+        response = self.client.get(reverse('admin:tickets_ticket_changelist'))
+        self.assertContains(response, 'admin_autocomplete_filter.js')
+
+    def test_delete_is_soft(self):
+        response = self.client.post(reverse('admin:tickets_ticket_delete', args=[self.vpn.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNotNone(Ticket.all_objects.get(pk=self.vpn.pk).deleted_at)
+        # Still listed, so it can be restored
+        self.assertIn(Ticket.all_objects.get(pk=self.vpn.pk), self.changelist('ticket'))
+
+        self.client.post(reverse('admin:tickets_ticket_changelist'), {
+            'action': 'restore_selected', '_selected_action': [str(self.vpn.pk)],
+        })
+        self.assertIsNone(Ticket.all_objects.get(pk=self.vpn.pk).deleted_at)
+
+    def test_tenant_scope(self):
+        elsewhere = Organization.objects.create(name='Elsewhere', slug='elsewhere')
+        staff = User.objects.create_user('staff', password='pass', role='admin', is_staff=True, organization=elsewhere)
+        staff.user_permissions.add(*Permission.objects.filter(codename='view_ticket'))
+        self.client.force_login(staff)
+        self.assertEqual(self.changelist('ticket'), [])
+
+
+class UUID7Tests(TransactionTestCase):
+    """Time-ordered primary keys"""
+
+    def test_layout(self):
+        before = time.time_ns() // 1_000_000
+        key = uuid7()
+        after = time.time_ns() // 1_000_000
+        self.assertEqual((key.version, key.variant), (7, uuid.RFC_4122))
+        self.assertTrue(before <= key.int >> 80 <= after)
+
+    def test_keys_sort_by_creation_time(self):
+        keys = []
+        for _ in range(3):
+            keys.append(uuid7())
+            time.sleep(0.002)
+        self.assertEqual(sorted(keys), keys)
+        self.assertEqual(len({uuid7() for _ in range(1000)}), 1000)
+
+    def test_models_use_uuid7(self):
+        user = User.objects.create_user('customer', password='pass', role='user')
+        ticket = Ticket.objects.create(title='Printer', description='d', created_by=user)
+        comment = Comment.objects.create(ticket=ticket, author=user, content='Jammed')
+        entry = Timeline.objects.create(ticket=ticket, user=user, action='commented', description='Jammed')
+        self.assertEqual({ticket.pk.version, comment.pk.version, entry.pk.version}, {7})
+
+    def test_benchmark(self):
+        output = StringIO()
+        call_command('benchmark_uuid_keys', rows=20, batch_size=10, stdout=output)
+        self.assertIn('uuid4', output.getvalue())
+        self.assertIn('uuid7', output.getvalue())
+
+
+class BusinessCalendarTests(TestCase):
+    """Business-time arithmetic for SLA due dates"""
+    weekdays = {day: [(dt_time(9), dt_time(17))] for day in range(5)}
+
+    def setUp(self):
+        cache.clear()
+        _compiled_calendars.clear()
+
+    def at(self, *args, tz='Europe/London'):
+        return datetime(*args, tzinfo=ZoneInfo(tz))
+
+    def test_hours_and_weekends(self):
+        calendar = CompiledCalendar('Europe/London', self.weekdays)
+        # Friday 2026-01-09 16:00 -> Monday 10:00
+        self.assertEqual(calendar.add(self.at(2026, 1, 9, 16), timedelta(hours=2)), self.at(2026, 1, 12, 10))
+        # Outside hours the clock starts at the next opening
+        self.assertEqual(calendar.add(self.at(2026, 1, 10, 12), timedelta(hours=1)), self.at(2026, 1, 12, 10))
+        # A target on the closing time stays there
+        self.assertEqual(calendar.add(self.at(2026, 1, 9, 15), timedelta(hours=2)), self.at(2026, 1, 9, 17))
+
+    def test_split_days(self):
+        calendar = CompiledCalendar('UTC', {0: [(dt_time(13), dt_time(17)), (dt_time(9), dt_time(12))]})
+        self.assertEqual(
+            calendar.add(self.at(2026, 1, 5, 11, tz='UTC'), timedelta(hours=2)), self.at(2026, 1, 5, 14, tz='UTC')
+        )
+
+    def test_holidays(self):
+        calendar = CompiledCalendar('Europe/London', self.weekdays, [date(2026, 1, 12)])
+        self.assertEqual(calendar.add(self.at(2026, 1, 9, 16), timedelta(hours=2)), self.at(2026, 1, 13, 10))
+
+    def test_daylight_saving(self):
+        calendar = CompiledCalendar('Europe/London', self.weekdays)
+        # Clocks go forward on Sunday 2026-03-29: Monday 10:00 BST is 09:00 UTC
+        due = calendar.add(self.at(2026, 3, 27, 16), timedelta(hours=2))
+        self.assertEqual(due, self.at(2026, 3, 30, 10))
+        self.assertEqual(due, self.at(2026, 3, 30, 9, tz='UTC'))
+        # That Sunday only has 23 hours
+        sundays = CompiledCalendar('Europe/London', {6: [(dt_time(0), dt_time(0))]})
+        self.assertEqual(sundays.add(self.at(2026, 3, 28, 12), timedelta(hours=23)), self.at(2026, 3, 30))
+        self.assertEqual(sundays.add(self.at(2026, 3, 28, 12), timedelta(hours=24)), self.at(2026, 4, 5, 1))
+
+    def test_beyond_the_compiled_window(self):
+        calendar = CompiledCalendar('UTC', self.weekdays)
+        # 4000 business hours are exactly 100 weeks of 5 days
+        due = calendar.add(self.at(2026, 1, 5, 9, tz='UTC'), timedelta(hours=4000))
+        self.assertEqual(due, self.at(2026, 1, 5, 17, tz='UTC') + timedelta(weeks=99, days=4))
+
+    def test_no_hours(self):
+        for weekly_hours in ({}, {0: [(dt_time(9), dt_time(9))]}):
+            with self.subTest(weekly_hours=weekly_hours):
+                calendar = CompiledCalendar('UTC', weekly_hours)
+                start = self.at(2026, 1, 5, 9, tz='UTC')
+                self.assertEqual(calendar.add(start, timedelta(hours=30)), start + timedelta(hours=30))
+
+    def test_only_holidays_ahead(self):
+        first = date(2026, 1, 5)
+        holidays = [first + timedelta(days=days) for days in range(0, 3 * DAYS_AFTER, 7)]
+        calendar = CompiledCalendar('UTC', {0: [(dt_time(9), dt_time(17))]}, holidays)
+        with self.assertRaises(NoBusinessHours):
+            calendar.add(self.at(2026, 1, 5, 9, tz='UTC'), timedelta(hours=1))
+
+    def test_ticket_creation_with_a_closed_calendar(self):
+        user = User.objects.create_user('customer', password='pass', role='user')
+        calendar = BusinessCalendar.objects.create(name='Closed', timezone='UTC')
+        # Saved without validation, as a fixture or a script could
+        BusinessHours.objects.create(calendar=calendar, weekday=0, start_time=dt_time(9), end_time=dt_time(9))
+        SLAConfiguration.objects.create(priority='high', response_hours=1, resolution_hours=8, calendar=calendar)
+        self.client.force_login(user)
+        before = timezone.now()
+        response = self.client.post(
+            reverse('ticket-list'), {'title': 'Down', 'description': 'd', 'priority': 'high'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        due = Ticket.objects.get(pk=response.json()['id']).sla_due_date
+        self.assertTrue(before + timedelta(hours=8) <= due <= timezone.now() + timedelta(hours=8))
+
+        with self.assertRaises(ValidationError):
+            BusinessHours(calendar=calendar, weekday=1, start_time=dt_time(9), end_time=dt_time(9)).full_clean()
+
+
+class TenancyTests(TestCase):
+    """Rows, caches and indexes stay per organization"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = Organization.objects.create(name='First', slug='first')
+        cls.second = Organization.objects.create(name='Second', slug='second')
+        cls.customer = User.objects.create_user('customer', password='pass', role='user', organization=cls.first)
+        cls.other_customer = User.objects.create_user(
+            'customer2', password='pass', role='user', organization=cls.second
+        )
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin', organization=cls.first)
+        cls.other_admin = User.objects.create_user('admin2', password='pass', role='admin', organization=cls.second)
+        cls.ticket = Ticket.objects.create(title='Printer', description='d', created_by=cls.customer)
+        cls.other_ticket = Ticket.objects.create(title='Printer too', description='d', created_by=cls.other_customer)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tickets_stay_in_their_organization(self):
+        self.assertEqual(self.ticket.organization, self.first)
+        self.client.force_login(self.other_admin)
+        self.assertEqual(self.client.get(reverse('ticket-detail', args=[self.ticket.pk])).status_code, 404)
+        ids = [ticket['id'] for ticket in self.client.get(reverse('ticket-list')).json()['results']]
+        self.assertEqual(ids, [str(self.other_ticket.pk)])
+        changes = self.client.get(reverse('change-feed')).json()['results']
+        self.assertEqual({change['ticket_id'] for change in changes}, {str(self.other_ticket.pk)})
+
+    def test_cross_tenant_indexes(self):
+        # Superuser polls and title search don't filter by organization
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Ticket._meta.db_table)
+        indexed = {tuple(constraint['columns']) for constraint in constraints.values() if constraint['index']}
+        self.assertIn(('updated_at',), indexed)
+        self.assertIn(('title',), indexed)
+        self.assertIn(('organization_id', 'updated_at'), indexed)
+
+    def test_agent_stats_after_changing_organization(self):
+        agent = User.objects.create_user('agent', password='pass', role='agent', organization=self.first)
+        for creator in (self.customer, self.other_customer):
+            agent.organization = creator.organization
+            agent.save()
+            ticket = Ticket.objects.create(title='Resolved', description='d', created_by=creator, assigned_to=agent)
+            ticket.status = 'resolved'
+            ticket.save()
+        today = timezone.localdate()
+        rollup_stats(today - timedelta(days=1), today)
+        self.assertEqual(
+            set(DailyAgentStats.objects.values_list('organization_id', 'agent_id')),
+            {(self.first.pk, agent.pk), (self.second.pk, agent.pk)}
+        )
+        for admin in (self.admin, self.other_admin):
+            self.client.force_login(admin)
+            rows = self.client.get(reverse('ticket-reports', args=['agents'])).json()
+            self.assertEqual([(row['agent_id'], row['resolved']) for row in rows], [(agent.pk, 1)])
+
+    def assertQueueFollowsOwner(self, move):
+        agent = User.objects.create_user('agent', password='pass', role='agent', organization=self.first)
+        queue = SavedQueue.objects.create(name='Open', owner=agent, filters={'status': 'open'})
+        # Both organizations' definitions are cached
+        SavedQueue.objects.definitions(self.first.pk)
+        SavedQueue.objects.definitions(self.second.pk)
+        move(agent)
+        self.assertNotIn(queue.pk, dict(SavedQueue.objects.definitions(self.first.pk)))
+        self.assertIn(queue.pk, dict(SavedQueue.objects.definitions(self.second.pk)))
+
+        agent = User.objects.get(pk=agent.pk)
+        self.client.force_login(agent)
+        url = reverse('queue-tickets', args=[queue.pk])
+        ids = [ticket['id'] for ticket in self.client.get(url).json()['results']]
+        self.assertEqual(ids, [str(self.other_ticket.pk)])
+        new = Ticket.objects.create(title='New', description='d', created_by=self.other_customer)
+        self.assertEqual(
+            [ticket['id'] for ticket in self.client.get(url).json()['results']],
+            [str(new.pk), str(self.other_ticket.pk)]
+        )
+
+    def test_queue_owner_saved_into_another_organization(self):
+        def move(agent):
+            agent = User.objects.get(pk=agent.pk)
+            agent.organization = self.second
+            agent.save()
+        self.assertQueueFollowsOwner(move)
+
+    def test_queue_owner_updated_into_another_organization(self):
+        self.assertQueueFollowsOwner(lambda agent: User.objects.filter(pk=agent.pk).update(organization=self.second))
+
+    def test_superuser_title_search_spans_organizations(self):
+        superuser = User.objects.create_superuser('root', 'root@example.com', 'pass')
+        self.client.force_login(superuser)
+        response = self.client.get(reverse('admin:tickets_ticket_changelist'), {'q': 'Printer'})
+        self.assertEqual(set(response.context['cl'].result_list), {self.ticket, self.other_ticket})
+
+
+class TicketTransitionTests(TestCase):
+    """Structured status/priority/assignee history and its backfill"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', password='pass', role='user')
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+        cls.other_agent = User.objects.create_user('agent2', password='pass', role='agent')
+
+    def setUp(self):
+        cache.clear()
+        self.ticket = Ticket.objects.create(title='Printer', description='d', created_by=self.customer)
+
+    def change(self, **values):
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        for field, value in values.items():
+            setattr(ticket, field, value)
+        ticket.changed_by = self.agent
+        ticket.save()
+        return ticket
+
+    def test_recorded_on_save(self):
+        self.assertFalse(TicketTransition.objects.exists())
+        self.change(title='Printer jammed')
+        self.assertFalse(TicketTransition.objects.exists())
+
+        self.change(status='in_progress', priority='high')
+        self.change(status='resolved')
+        status = list(TicketTransition.objects.filter(field='status'))
+        self.assertEqual(
+            [(t.from_value, t.to_value) for t in status], [('open', 'in_progress'), ('in_progress', 'resolved')]
+        )
+        self.assertEqual(status[0].entered_at, self.ticket.created_at)
+        self.assertEqual(status[1].entered_at, status[0].changed_at)
+        self.assertEqual(status[1].duration, status[1].changed_at - status[0].changed_at)
+        self.assertEqual(status[0].changed_by, self.agent)
+        priority = TicketTransition.objects.get(field='priority')
+        self.assertEqual((priority.from_value, priority.to_value), ('medium', 'high'))
+
+        now = timezone.now()
+        left = TicketTransition.objects.left(None, 'status', 'in_progress', now - timedelta(hours=1), now)
+        self.assertEqual(list(left), [status[1]])
+
+    def test_assignments(self):
+        start = timezone.now()
+        self.change(assigned_to=self.agent)
+        self.change(assigned_to=self.other_agent)
+        transitions = TicketTransition.objects.filter(field='assigned_to')
+        self.assertEqual(
+            [(t.from_user_id, t.to_user_id) for t in transitions],
+            [(None, self.agent.pk), (self.agent.pk, self.other_agent.pk)]
+        )
+        end = timezone.now()
+        self.assertEqual(list(Ticket.objects.held_by(self.agent, start, end)), [self.ticket])
+        self.assertEqual(list(Ticket.objects.held_by(self.other_agent, start, end)), [self.ticket])
+        # Assigned to the other agent only after this window
+        self.assertEqual(list(Ticket.objects.held_by(self.other_agent, start - timedelta(hours=1), start)), [])
+
+    def add_entry(self, action, metadata, hours_ago):
+        entry = Timeline.objects.create(
+            ticket=self.ticket, user=self.agent, action=action, description=action, metadata=metadata
+        )
+        Timeline.objects.filter(pk=entry.pk).update(created_at=self.now - timedelta(hours=hours_ago))
+
+    def backfill(self):
+        output = StringIO()
+        call_command('backfill_transitions', batch_size=1, stdout=output)
+        return output.getvalue()
+
+    def test_backfill(self):
+        self.now = timezone.now()
+        Ticket.objects.filter(pk=self.ticket.pk).update(created_at=self.now - timedelta(hours=10))
+        self.add_entry('status_changed', {'from': 'open', 'to': 'in_progress'}, 8)
+        # Entries from before assignments carried user ids
+        self.add_entry('assigned', {'from': 'Unassigned', 'to': 'agent'}, 6)
+        self.add_entry('assigned', {'from': 'deleted-user', 'to': 'Unassigned'}, 5)
+        # Recorded since the upgrade, as if it began when the ticket was created
+        self.change(status='resolved')
+        Timeline.objects.create(
+            ticket=self.ticket, user=self.agent, action='status_changed', description='status_changed',
+            metadata={'from': 'in_progress', 'to': 'resolved'}
+        )
+        self.assertIn('created 2 transition(s), skipped 1 timeline entries', self.backfill())
+
+        converted, recorded = TicketTransition.objects.filter(field='status')
+        self.assertEqual((converted.from_value, converted.to_value), ('open', 'in_progress'))
+        self.assertEqual(converted.duration, timedelta(hours=2))
+        self.assertEqual(recorded.entered_at, converted.changed_at)
+        self.assertEqual(recorded.duration, recorded.changed_at - converted.changed_at)
+        assigned = TicketTransition.objects.get(field='assigned_to')
+        self.assertEqual((assigned.from_user_id, assigned.to_user_id), (None, self.agent.pk))
+
+        self.assertIn('created 0 transition(s)', self.backfill())
+        self.assertEqual(TicketTransition.objects.count(), 3)
+
+
+class EmailIntakeTests(TestCase):
+    """Tickets and replies from a mailbox"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            'customer', email='Customer@Example.com', password='pass', role='user'
+        )
+        cls.agent = User.objects.create_user('agent', password='pass', role='agent')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'inbox.mbox')
+
+    def message(self, message_id, subject='Printer jammed', body='The printer is jammed.',
+                sender='customer@example.com', **headers):
+        message = EmailMessage()
+        message['From'] = f'Customer <{sender}>'
+        message['To'] = 'support@example.com'
+        message['Subject'] = subject
+        message['Message-ID'] = message_id
+        for name, value in headers.items():
+            message[name.replace('_', '-')] = value
+        message.set_content(body)
+        return message
+
+    def ingest(self, *messages, **options):
+        box = mailbox.mbox(self.path)
+        for message in messages:
+            box.add(message)
+        box.flush()
+        skipped = []
+        counts = ingest_mailbox(
+            mailbox.mbox(self.path), workers=1, on_skip=lambda key, reason: skipped.append(reason), **options
+        )
+        return counts, skipped
+
+    def test_new_ticket_and_replies(self):
+        counts, _ = self.ingest(self.message('<1@example.com>'))
+        self.assertEqual((counts['tickets'], counts['comments']), (1, 0))
+        ticket = Ticket.objects.get()
+        self.assertEqual((ticket.title, ticket.created_by), ('Printer jammed', self.customer))
+        updated_at = ticket.updated_at
+
+        counts, _ = self.ingest(
+            self.message(
+                '<2@example.com>', 'Re: Printer jammed', 'Still jammed.\n\n> The printer is jammed.',
+                In_Reply_To='<1@example.com>'
+            ),
+            # Threads through the reply, which only References names
+            self.message(
+                '<3@example.com>', 'Re: Re: Printer jammed', 'Now it works.',
+                References='<unknown@example.com> <2@example.com>'
+            ),
+        )
+        self.assertEqual((counts['tickets'], counts['comments']), (0, 2))
+        self.assertEqual(
+            list(Comment.objects.filter(ticket=ticket).values_list('content', flat=True)),
+            ['Still jammed.', 'Now it works.']
+        )
+        self.assertGreater(Ticket.objects.get(pk=ticket.pk).updated_at, updated_at)
+        self.assertEqual(len(mailbox.mbox(self.path)), 0)
+
+    def test_reply_to_merged_duplicate(self):
+        self.ingest(self.message('<1@example.com>'), self.message('<2@example.com>', 'Printer broken'))
+        duplicate, canonical = Ticket.objects.order_by('title')
+        merge_tickets(duplicate, canonical, self.agent)
+        self.ingest(
+            self.message('<3@example.com>', 'Re: Printer broken', 'Any news?', In_Reply_To='<2@example.com>')
+        )
+        self.assertEqual(Comment.objects.get(content='Any news?').ticket, canonical)
+
+    def test_duplicates(self):
+        counts, _ = self.ingest(self.message('<1@example.com>'), self.message('<1@example.com>'))
+        self.assertEqual((counts['tickets'], counts['duplicates']), (1, 1))
+        counts, _ = self.ingest(self.message('<1@example.com>'))
+        self.assertEqual((counts['tickets'], counts['duplicates']), (0, 1))
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_unknown_senders(self):
+        counts, skipped = self.ingest(
+            self.message('<1@example.com>', sender='stranger@example.com'),
+            self.message('<2@example.com>', Auto_Submitted='auto-replied'),
+        )
+        self.assertEqual((counts['tickets'], counts['skipped']), (0, 2))
+        self.assertEqual(skipped, ['automatic reply', 'unknown sender stranger@example.com'])
+        self.assertFalse(User.objects.filter(email='stranger@example.com').exists())
+        # Skipped messages are left in the mailbox, so they can be ingested later
+        self.assertEqual(len(mailbox.mbox(self.path)), 2)
+
+        counts, _ = self.ingest(create_users=True)
+        self.assertEqual((counts['tickets'], counts['skipped']), (1, 1))
+        stranger = User.objects.get(email='stranger@example.com')
+        self.assertEqual((stranger.role, stranger.has_usable_password()), ('user', False))
+        self.assertEqual([message['Message-ID'] for message in mailbox.mbox(self.path)], ['<2@example.com>'])
+
+    @override_settings(TICKET_AUTO_ASSIGN=True)
+    def test_assigned_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.ingest(self.message('<1@example.com>'))
+            self.assertIsNone(Ticket.objects.get().assigned_to)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(Ticket.objects.get().assigned_to, self.agent)
+
+    def test_command(self):
+        box = mailbox.mbox(self.path)
+        box.add(self.message('<1@example.com>', sender='stranger@example.com'))
+        box.flush()
+        output, errors = StringIO(), StringIO()
+        call_command('ingest_email', self.path, workers=1, stdout=output, stderr=errors)
+        self.assertIn('Created 0 ticket(s)', output.getvalue())
+        self.assertIn('unknown sender', errors.getvalue())
+        self.assertEqual(len(mailbox.mbox(self.path)), 1)
+        call_command('ingest_email', self.path, workers=1, create_users=True, stdout=output, stderr=errors)
+        self.assertIn('Created 1 ticket(s)', output.getvalue())
+        self.assertEqual(len(mailbox.mbox(self.path)), 0)
@@ -0,0 +1,131 @@
+"""
+Cache-backed token bucket throttles.
+
+Rates use DRF's "<requests>/<period>" format from DEFAULT_THROTTLE_RATES:
+the bucket holds <requests> tokens and refills continuously over <period>,
+so clients can burst up to the full budget and then proceed at the
+sustained rate.
+
+Each check reads and updates its bucket in one step: a Lua script on
+Redis, or under a lock with per-process caches. Those keep a bucket per
+worker, so without a shared cache (SHARED_CACHE) every worker allows
+1/THROTTLE_PROCESSES of the rate.
+"""
+import threading
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import SimpleRateThrottle
+
+# Refill the bucket and take a token if there is one; returns {allowed, tokens}
+TOKEN_BUCKET_SCRIPT = """
+local capacity, rate, now, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+if tokens < 1 then
+    return {0, tostring(tokens)}
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {1, tostring(tokens)}
+"""
+
+# Per-process caches are only shared between this process's threads
+bucket_lock = threading.Lock()
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Base token bucket throttle. Subclasses define scope and get_cache_key().
+    """
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        if isinstance(self.cache, RedisCache):
+            allowed, self.tokens = self.take_token_redis()
+        else:
+            with bucket_lock:
+                allowed, self.tokens = self.take_token()
+        return allowed
+
+    def take_token(self):
+        """(allowed, tokens left) for a cache without atomic scripts"""
+        tokens, updated_at = self.cache.get(self.key, (self.capacity, self.now))
+        tokens = min(self.capacity, tokens + max(0, self.now - updated_at) * self.refill_rate)
+        if tokens < 1:
+            return False, tokens
+        self.cache.set(self.key, (tokens - 1, self.now), self.duration)
+        return True, tokens - 1
+
+    def take_token_redis(self):
+        key = self.cache.make_and_validate_key(self.key)
+        client = self.cache._cache.get_client(key, write=True)
+        allowed, tokens = client.eval(
+            TOKEN_BUCKET_SCRIPT, 1, key, self.capacity, self.refill_rate, self.now, int(self.duration)
+        )
+        return bool(allowed), float(tokens)
+
+    @property
+    def capacity(self):
+        """Burst size of this process's bucket"""
+        return max(1, self.num_requests // getattr(settings, 'THROTTLE_PROCESSES', 1))
+
+    @property
+    def refill_rate(self):
+        """Tokens added per second"""
+        return self.capacity / self.duration
+
+    def wait(self):
+        return max(0.0, (1 - self.tokens) / self.refill_rate)
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'anon-{self.get_ident(request)}'
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Overall budget per user (per IP for anonymous requests)"""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident_for(request)}
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-endpoint budget for views that set throttle_scope, tracked
+    separately for each user
+    """
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        # The scope comes from the view, so defer rate lookup to allow_request
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident_for(request)}
+
+class SearchTokenBucketThrottle(TokenBucketThrottle):
+    """Stricter budget for requests that run a full-text search"""
+    scope = 'search'
+
+    def get_cache_key(self, request, view):
+        if not request.query_params.get('search'):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident_for(request)}
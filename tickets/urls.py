@@ -8,6 +8,7 @@ def redirect_to_tickets(request):
 urlpatterns = [
     path('', redirect_to_tickets, name='home'),
     path('tickets/', views.ticket_list, name='ticket_list'),
+    path('tickets/rows/', views.ticket_rows, name='ticket_rows'),
     path('tickets/new/', views.ticket_create, name='ticket_create'),
     path('tickets/<uuid:pk>/', views.ticket_detail, name='ticket_detail'),
 ]
\ No newline at end of file
@@ -1,33 +1,38 @@
+import uuid
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Ticket, Comment, Timeline
+from django.http import HttpResponseBadRequest
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from .models import Ticket, Comment
+from .assignment import create_ticket
+from .querysets import filter_tickets
+
+# Beyond this many changed rows the client reloads the whole page of results
+CHANGED_ROWS_LIMIT = 100
+
+def _visible_tickets(request):
+    # Merged duplicates live on as their canonical ticket
+    return (
+        Ticket.objects.visible_to(request.user).filter(merged_into=None)
+        .select_related('created_by', 'assigned_to')
+    )
 
 @login_required
 def ticket_list(request):
-    """List all tickets with filtering and pagination"""
-    tickets = Ticket.objects.all()
-    
-    # Search functionality
+    """
+    List all tickets with filtering and pagination. Requests sent with an
+    HX-Request header (filter changes, page flips) get only the results
+    fragment.
+    """
+    refreshed_at = timezone.now()
+    tickets = filter_tickets(_visible_tickets(request), request.GET, request.user)
     search = request.GET.get('search')
-    if search:
-        tickets = tickets.filter(
-            Q(title__icontains=search) |
-            Q(description__icontains=search) |
-            Q(comments__content__icontains=search)
-        ).distinct()
-    
-    # Filter by status
     status = request.GET.get('status')
-    if status:
-        tickets = tickets.filter(status=status)
-    
-    # Filter by priority
     priority = request.GET.get('priority')
-    if priority:
-        tickets = tickets.filter(priority=priority)
     
     # Pagination
     paginator = Paginator(tickets, 20)
@@ -41,13 +46,57 @@ def ticket_list(request):
         'priority': priority,
         'status_choices': Ticket.STATUS_CHOICES,
         'priority_choices': Ticket.PRIORITY_CHOICES,
+        'refreshed_at': refreshed_at,
     }
-    return render(request, 'tickets/ticket_list.html', context)
+    if request.headers.get('HX-Request'):
+        response = render(request, 'tickets/partials/ticket_results.html', context)
+    else:
+        response = render(request, 'tickets/ticket_list.html', context)
+    response['X-Refreshed-At'] = refreshed_at.isoformat()
+    patch_vary_headers(response, ['HX-Request'])
+    return response
+
+@login_required
+def ticket_rows(request):
+    """
+    Rows of the tickets changed since ?changed_since=<ISO timestamp>, so the
+    list can refresh in place. Tickets listed in ?shown= that are gone or no
+    longer match (reassigned, deleted, merged, filtered out) come back as
+    empty rows marked data-removed.
+    """
+    changed_since = parse_datetime(request.GET.get('changed_since') or '')
+    if changed_since is None:
+        return HttpResponseBadRequest('changed_since must be an ISO 8601 timestamp')
+    if timezone.is_naive(changed_since):
+        changed_since = timezone.make_aware(changed_since)
+    try:
+        shown = {uuid.UUID(pk) for pk in request.GET.getlist('shown')[:CHANGED_ROWS_LIMIT]}
+    except ValueError:
+        return HttpResponseBadRequest('shown must be ticket ids')
+    
+    refreshed_at = timezone.now()
+    changed = list(
+        _visible_tickets(request).filter(updated_at__gt=changed_since)
+        .order_by('-updated_at')[:CHANGED_ROWS_LIMIT]
+    )
+    matching = set(filter_tickets(
+        _visible_tickets(request).filter(pk__in=shown | {ticket.pk for ticket in changed}),
+        request.GET, request.user
+    ).values_list('pk', flat=True))
+    
+    response = render(request, 'tickets/partials/ticket_rows.html', {
+        'tickets': [ticket for ticket in changed if ticket.pk in matching],
+        'removed': sorted(shown - matching),
+    })
+    response['X-Refreshed-At'] = refreshed_at.isoformat()
+    if len(changed) == CHANGED_ROWS_LIMIT:
+        response['X-Rows-Truncated'] = 'true'
+    return response
 
 @login_required
 def ticket_detail(request, pk):
     """Display ticket details with comments"""
-    ticket = get_object_or_404(Ticket, pk=pk)
+    ticket = get_object_or_404(Ticket.objects.visible_to(request.user), pk=pk)
     comments = ticket.comments.filter(parent=None).order_by('created_at')
     timeline = ticket.timeline.all()[:10]  # Latest 10 timeline entries
     
@@ -67,19 +116,9 @@ def ticket_create(request):
         priority = request.POST.get('priority', 'medium')
         
         if title and description:
-            ticket = Ticket.objects.create(
-                title=title,
-                description=description,
-                priority=priority,
-                created_by=request.user
-            )
-            
-            # Create timeline entry
-            Timeline.objects.create(
-                ticket=ticket,
-                user=request.user,
-                action='created',
-                description=f'Ticket created with priority {ticket.get_priority_display()}'
+            ticket = create_ticket(
+                Ticket(title=title, description=description, priority=priority, created_by=request.user),
+                request.user
             )
             
             messages.success(request, 'Ticket created successfully!')